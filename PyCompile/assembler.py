@@ -0,0 +1,86 @@
+# Instructions whose operand is a label that the linker resolves
+LABEL_OPERAND_OPS = ('JMP', 'JMP_IF_FALSE', 'CALL', 'TAIL_CALL', 'CMP_LT_JMP_IF_FALSE')
+# `.line N` says the instructions after it come from source line N. Like
+# labels, directives are not instructions and are gone once linked.
+LINE_DIRECTIVE = '.line'
+
+
+def is_directive(instruction):
+    return instruction.startswith('.')
+
+
+class Program:
+    def __init__(self, instructions, symbols, functions, local_names=(), frames=None, lines=None):
+        self.instructions = instructions
+        self.symbols = symbols
+        self.functions = functions
+        # Variable name of each slot of the program's frame, in slot order
+        self.local_names = list(local_names)
+        # Function name -> (parameter count, local names), the layout of its frames
+        self.frames = {name: (frame[0], list(frame[1])) for name, frame in (frames or {}).items()}
+        # Source line of each instruction, 0 where unknown; None when the code
+        # carried no .line directives
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def __iter__(self):
+        return iter(self.instructions)
+
+    def __repr__(self):
+        return (f'Program(instructions={self.instructions}, symbols={self.symbols}, functions={self.functions}, '
+                f'local_names={self.local_names}, frames={self.frames})')
+
+
+class Assembler:
+    def assemble(self, instructions, function_table=None, local_names=(), frames=None):
+        if callable(instructions):
+            instructions = instructions()
+        symbols = self.collect_symbols(instructions)
+        linked, lines = self.resolve(instructions, symbols)
+        functions = {name: symbols[name] for name in (function_table or {})}
+        return Program(linked, symbols, functions, local_names, frames, lines)
+
+    def collect_symbols(self, instructions):
+        # Labels are removed, so each one maps to the index of the next real instruction
+        symbols = {}
+        index = 0
+        for instruction in instructions:
+            if instruction.endswith(':'):
+                label = instruction[:-1]
+                if label in symbols:
+                    raise ValueError(f'Duplicate label {label!r}')
+                symbols[label] = index
+            elif not is_directive(instruction):
+                index += 1
+        return symbols
+
+    def resolve(self, instructions, symbols):
+        linked = []
+        lines = []
+        line = 0
+        has_lines = False
+        for instruction in instructions:
+            if instruction.endswith(':'):
+                continue
+            if is_directive(instruction):
+                parts = instruction.split()
+                if parts[0] != LINE_DIRECTIVE or len(parts) != 2:
+                    raise ValueError(f'Unknown directive {instruction!r}')
+                line = int(parts[1])
+                has_lines = True
+                continue
+            parts = instruction.split()
+            if parts and parts[0] in LABEL_OPERAND_OPS:
+                label = parts[1]
+                if label not in symbols:
+                    raise ValueError(f'Undefined label {label!r} in {instruction!r}')
+                instruction = f'{parts[0]} {symbols[label]}'
+            linked.append(instruction)
+            lines.append(line)
+        return linked, lines if has_lines else None
+
+
+def link(instructions, function_table=None, local_names=(), frames=None):
+    return Assembler().assemble(instructions, function_table, local_names, frames)
@@ -1,70 +1,123 @@
-class AssemblyGenerator:
+from cfg import ControlFlowGraph, build_cfg, lower
+from visitor import Visitor
+
+# Operators as they appear on IR nodes, mapped to the mnemonic names used below
+BINARY_OPS = {'+': 'PLUS', '-': 'MINUS', '*': 'MUL', '/': 'DIV'}
+# Right operand in EBX, left operand and result in EAX
+BINARY_INSTRUCTIONS = {'PLUS': 'ADD EAX, EBX', 'MINUS': 'SUB EAX, EBX', 'MUL': 'IMUL EAX, EBX', 'DIV': 'IDIV EBX'}
+COMPARISON_SETS = {'<': 'SETL', '<=': 'SETLE', '>': 'SETG', '>=': 'SETGE', '==': 'SETE', '!=': 'SETNE'}
+
+class AssemblyGenerator(Visitor):
+    def __init__(self):
+        super().__init__()
+        # Every handler appends to this one buffer, in program order
+        self.code = []
+        self.emit = self.code.append
+
     def generate(self, ir_nodes):
-        assembly_code = []
+        # IR, a list of IR trees, or a ControlFlowGraph already built from IR
+        if not isinstance(ir_nodes, list):
+            ir_nodes = [ir_nodes]
+        self.code.clear()
         for ir_node in ir_nodes:
-            assembly_code.extend(self.visit(ir_node))
-        return '\n'.join(assembly_code)
-    
-    
-    def visit(self, ir_node):
-        method_name = f'visit_{ir_node.type}'
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(ir_node)
-
-    def generic_visit(self, ir_node):
-        raise Exception(f'No visit_{ir_node.type} method')
-
-    def visit_assignment(self, ir_node):
-        identifier = ir_node.value
-        expression_asm = self.visit(ir_node.children[0])
-        return expression_asm + [f'MOV {identifier}, EAX']
-
-    def visit_if(self, ir_node):
-        condition_asm = self.visit(ir_node.children[0])
-        then_asm = self.visit(ir_node.children[1])
-        else_asm = self.visit(ir_node.children[2]) if len(ir_node.children) > 2 else []
-        return condition_asm + ['CMP EAX, 0', 'JE ELSE_LABEL'] + then_asm + ['JMP END_IF_LABEL', 'ELSE_LABEL:'] + else_asm + ['END_IF_LABEL:']
-
-    def visit_while(self, ir_node):
-        condition_asm = self.visit(ir_node.children[0])
-        body_asm = self.visit(ir_node.children[1])
-        return ['WHILE_LABEL:'] + condition_asm + ['CMP EAX, 0', 'JE END_WHILE_LABEL'] + body_asm + ['JMP WHILE_LABEL', 'END_WHILE_LABEL:']
-
-    def visit_print(self, ir_node):
-        expression_asm = self.visit(ir_node.children[0])
-        return expression_asm + ['CALL print_function']
-
-    def visit_function_def(self, ir_node):
-        func_name = ir_node.value
-        parameters_asm = self.visit(ir_node.children[0])
-        body_asm = self.visit(ir_node.children[1])
-        return [f'{func_name}_LABEL:'] + parameters_asm + body_asm + ['RET']
+            cfg = ir_node if isinstance(ir_node, ControlFlowGraph) else build_cfg(ir_node)
+            lower(cfg, self)
+        return '\n'.join(self.code)
+
+    def lower_function(self, graph):
+        # Variables are named memory here, so a body needs no frame set up
+        pass
+
+    def lower_label(self, block):
+        if block.function is not None:
+            self.emit(f'{block.function}_LABEL:')
+        else:
+            self.emit(f'{block.label}:')
+
+    def lower_statement(self, ir_node):
+        self.visit(ir_node)
+
+    def lower_jump(self, block):
+        self.emit(f'JMP {block.label}')
+
+    def lower_branch(self, condition, block):
+        self.visit(condition)
+        self.emit('CMP EAX, 0')
+        self.emit(f'JE {block.label}')
+
+    def lower_return(self, value):
+        # The result is returned in EAX
+        self.visit(value)
+        self.emit('RET')
+
+    def lower_tail_call(self, call):
+        # An ordinary call and return; reusing the frame is left to the VM
+        self.lower_return(call)
+
+    def lower_halt(self):
+        # The program just ends
+        pass
+
+    # Plain handlers run once their children's code is in the buffer; the
+    # generator handlers emit around each child they yield.
+    def visit_assignment(self, ir_node, expression):
+        self.emit(f'MOV {ir_node.value}, EAX')
+
+    def visit_print(self, ir_node, expression):
+        self.emit('CALL print_function')
 
     def visit_function_call(self, ir_node):
-        func_name = ir_node.value
-        arguments_asm = [self.visit(arg) for arg in ir_node.children]
-        flattened_arguments_asm = [item for sublist in arguments_asm for item in sublist]
-        return flattened_arguments_asm + [f'CALL {func_name}']
+        # Arguments go on the stack, and the caller drops them afterwards
+        for argument in ir_node.children:
+            yield argument
+            self.emit('PUSH EAX')
+        self.emit(f'CALL {ir_node.value}')
+        if ir_node.children:
+            self.emit(f'ADD ESP, {4 * len(ir_node.children)}')
+
+    def visit_expression_statement(self, ir_node, expression):
+        pass
+
+    def visit_sequence(self, ir_node, *parts):
+        # An inlined call; the last part left its value in EAX
+        pass
 
     def visit_binary_expression(self, ir_node):
-        left_asm = self.visit(ir_node.children[0])
-        right_asm = self.visit(ir_node.children[1])
-        if ir_node.value == 'PLUS':
-            return left_asm + ['PUSH EAX'] + right_asm + ['POP EBX', 'ADD EAX, EBX']
-        elif ir_node.value == 'MINUS':
-            return left_asm + ['PUSH EAX'] + right_asm + ['POP EBX', 'SUB EAX, EBX']
-        elif ir_node.value == 'MUL':
-            return left_asm + ['PUSH EAX'] + right_asm + ['POP EBX', 'IMUL EAX, EBX']
-        elif ir_node.value == 'DIV':
-            return left_asm + ['PUSH EAX'] + right_asm + ['POP EBX', 'IDIV EBX']
-        else:
+        op = BINARY_OPS.get(ir_node.value, ir_node.value)
+        if op not in BINARY_INSTRUCTIONS:
             raise Exception(f'Unknown binary operator {ir_node.value}')
+        yield ir_node.children[0]
+        self.emit('PUSH EAX')
+        yield ir_node.children[1]
+        self.emit('POP EBX')
+        self.emit(BINARY_INSTRUCTIONS[op])
+
+    def visit_comparison(self, ir_node):
+        if ir_node.value not in COMPARISON_SETS:
+            raise Exception(f'Unknown comparison operator {ir_node.value}')
+        emit = self.emit
+        yield ir_node.children[0]
+        emit('PUSH EAX')
+        yield ir_node.children[1]
+        emit('MOV EBX, EAX')
+        emit('POP EAX')
+        emit('CMP EAX, EBX')
+        emit(f'{COMPARISON_SETS[ir_node.value]} EAX')
+
+    def visit_unary_expression(self, ir_node, operand):
+        self.emit('NEG EAX')
+
+    def visit_string(self, ir_node):
+        self.emit(f'MOV EAX, {ir_node.value}')
+
+    def visit_tuple(self, ir_node, *elements):
+        pass
 
     def visit_number(self, ir_node):
-        return [f'MOV EAX, {ir_node.value}']
+        self.emit(f'MOV EAX, {ir_node.value}')
 
     def visit_identifier(self, ir_node):
-        return [f'MOV EAX, {ir_node.value}']
+        self.emit(f'MOV EAX, {ir_node.value}')
 
 # Example usage:
 # ir_nodes = [...]  # This would be generated by the IRGenerator
@@ -0,0 +1,170 @@
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from module_file import MODULE_SUFFIX, write_module
+from optimizer import DEFAULT_OPT_LEVEL
+from parser import get_parser
+from pipeline import Pipeline
+from version import COMPILER_VERSION
+
+SOURCE_SUFFIX = '.src'
+REPORT_FILE = 'batch_report.json'
+DIAGNOSTICS_FILE = 'diagnostics.txt'
+# Tasks handed to each worker over a batch. Files are small, so sending them
+# in chunks keeps pickling and queue traffic well below the compile work,
+# while several chunks per worker still even out uneven files.
+CHUNKS_PER_WORKER = 4
+
+
+def collect_sources(path, suffix=SOURCE_SUFFIX):
+    # (source path, module name) for every file to compile, in a fixed
+    # order: the files under a directory ending in suffix, sorted by path,
+    # or the entries of a manifest, one path per line relative to the
+    # manifest, in the order listed. Module names keep the sources' layout.
+    if os.path.isdir(path):
+        sources = sorted(os.path.join(directory, name)
+                         for directory, _, files in os.walk(path)
+                         for name in files if name.endswith(suffix))
+        root = path
+    else:
+        base = os.path.dirname(path)
+        with open(path, 'r') as file:
+            entries = [line.strip() for line in file]
+        sources = [os.path.normpath(os.path.join(base, entry))
+                   for entry in entries if entry and not entry.startswith('#')]
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources]) if sources else base
+
+    names = {}
+    for source in sources:
+        name = os.path.splitext(os.path.relpath(os.path.abspath(source), os.path.abspath(root)))[0] + MODULE_SUFFIX
+        if name in names:
+            raise ValueError(f"'{source}' and '{names[name]}' would both be compiled to '{name}'")
+        names[name] = source
+    return [(source, name) for name, source in names.items()]
+
+
+# The optimization level of the worker process, set by start_worker
+worker_opt_level = DEFAULT_OPT_LEVEL
+
+
+def start_worker(opt_level):
+    # Runs once in each worker process. Building the process-wide lexer and
+    # parser here, tables and all, means every file the worker compiles
+    # reuses them rather than paying for them per file.
+    global worker_opt_level
+    worker_opt_level = opt_level
+    get_parser()
+
+
+def compile_file(task):
+    # Compile one source to a module. Anything the compiler prints, such as
+    # the parser's syntax errors, is captured as the file's diagnostics, and
+    # a file with diagnostics gets no module: the parser recovers from
+    # errors, so its program would be missing the statements in error.
+    source, module_path = task
+    pipeline = Pipeline(worker_opt_level)
+    captured = io.StringIO()
+    error = None
+    start = time.perf_counter_ns()
+    try:
+        with open(source, 'r') as file:
+            source_code = file.read()
+        with redirect_stdout(captured):
+            program = pipeline.compile(source_code)
+        if not captured.getvalue():
+            os.makedirs(os.path.dirname(module_path), exist_ok=True)
+            write_module(module_path, program)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    diagnostics = captured.getvalue().splitlines()
+    if error:
+        diagnostics.append(error)
+    return {
+        'source': source,
+        'ok': not diagnostics,
+        'ns': time.perf_counter_ns() - start,
+        'stages': [(record['stage'], record['ns']) for record in pipeline.records],
+        'diagnostics': diagnostics,
+    }
+
+
+class BatchReport:
+    # The outcome of a batch, one result per source in the order collected
+    def __init__(self, sources, results, wall_ns, jobs, opt_level):
+        self.sources = sources
+        self.results = results
+        self.wall_ns = wall_ns
+        self.jobs = jobs
+        self.opt_level = opt_level
+
+    @property
+    def failed(self):
+        return sum(1 for result in self.results if not result['ok'])
+
+    def files_per_second(self):
+        return len(self.results) * 1e9 / max(self.wall_ns, 1)
+
+    def stage_totals(self):
+        # Stage -> time summed over every file. Workers run side by side, so
+        # with several jobs these add up to more than the wall time.
+        totals = {}
+        for result in self.results:
+            for stage, ns in result['stages']:
+                totals[stage] = totals.get(stage, 0) + ns
+        return totals
+
+    def summary(self):
+        lines = [f'{len(self.results)} files, {self.failed} failed, in {self.wall_ns / 1e9:.3f} s '
+                 f'with {self.jobs} job{"s" if self.jobs != 1 else ""}: {self.files_per_second():.1f} files/s']
+        for stage, ns in self.stage_totals().items():
+            lines.append(f'  {stage:<12} {ns / 1e6:10.2f} ms')
+        return lines
+
+    def report(self):
+        return {
+            'compiler_version': COMPILER_VERSION,
+            'opt_level': self.opt_level,
+            'jobs': self.jobs,
+            'files': len(self.results),
+            'failed': self.failed,
+            'wall_ns': self.wall_ns,
+            'files_per_second': self.files_per_second(),
+            'stage_totals_ns': self.stage_totals(),
+            'results': [{'source': result['source'], 'module': name if result['ok'] else None, 'ns': result['ns'],
+                         'diagnostics': result['diagnostics']}
+                        for (_, name), result in zip(self.sources, self.results)],
+        }
+
+    def write(self, output_dir):
+        # The JSON report, and every diagnostic as source: message lines
+        with open(os.path.join(output_dir, REPORT_FILE), 'w') as file:
+            json.dump(self.report(), file, indent=2)
+            file.write('\n')
+        with open(os.path.join(output_dir, DIAGNOSTICS_FILE), 'w') as file:
+            for result in self.results:
+                for message in result['diagnostics']:
+                    file.write(f"{result['source']}: {message}\n")
+
+
+def compile_batch(sources, output_dir, opt_level=DEFAULT_OPT_LEVEL, jobs=None):
+    # Compile sources, as collect_sources returns them, into output_dir
+    # across jobs worker processes, one per core by default. Results come
+    # back in the order of sources whichever worker finishes first, so the
+    # report and diagnostics are the same from run to run.
+    jobs = jobs or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(source, os.path.join(output_dir, name)) for source, name in sources]
+    start = time.perf_counter_ns()
+    if jobs == 1:
+        # No pool to feed, so compile in this process
+        start_worker(opt_level)
+        results = [compile_file(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (jobs * CHUNKS_PER_WORKER))
+        with ProcessPoolExecutor(jobs, initializer=start_worker, initargs=(opt_level,)) as executor:
+            results = list(executor.map(compile_file, tasks, chunksize=chunksize))
+    return BatchReport(sources, results, time.perf_counter_ns() - start, jobs, opt_level)
@@ -0,0 +1,55 @@
+# Batch compilation of many small generated programs with 1, 2, 4, ... worker
+# processes up to the core count, showing files per second and the speedup
+# over a single job. Compiling files shares nothing, so the speedup should
+# stay close to the job count until the cores run out.
+#   python benchmarks/bench_batch.py [files]
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import SOURCE_SUFFIX, collect_sources, compile_batch
+from corpus import WORKLOADS
+
+# Statements in each generated program
+FILE_SIZE = 40
+
+
+def write_sources(directory, count):
+    generators = list(WORKLOADS.values())
+    for index in range(count):
+        source = generators[index % len(generators)](FILE_SIZE + index % 7)
+        with open(os.path.join(directory, f'program_{index:05d}{SOURCE_SUFFIX}'), 'w') as file:
+            file.write(source)
+
+
+def job_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        source_dir = os.path.join(directory, 'src')
+        os.makedirs(source_dir)
+        write_sources(source_dir, count)
+        sources = collect_sources(source_dir)
+        single = None
+        for jobs in job_counts():
+            report = compile_batch(sources, os.path.join(directory, f'out_{jobs}'), jobs=jobs)
+            if report.failed:
+                raise SystemExit(f'{report.failed} files failed to compile with {jobs} jobs')
+            rate = report.files_per_second()
+            single = single or rate
+            print(f'{jobs:3d} jobs {rate:10.1f} files/s {rate / single:6.2f}x')
+
+
+if __name__ == '__main__':
+    main()
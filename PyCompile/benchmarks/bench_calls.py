@@ -0,0 +1,120 @@
+# Call overhead of the VM on recursive functions: naive Fibonacci,
+# Ackermann's function, which nests calls deeply, and a tail-recursive sum
+# deeper than the VM's call depth limit, which only runs as tail calls.
+# Results are checked against Python. The JIT is off: this measures the
+# interpreter's calls, not compiled Python's.
+#   python benchmarks/bench_calls.py [fib n] [ackermann n] [sum n]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from optimizer import LoopInvariantCodeMotion, TailCallEliminator, optimize
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from peephole import PeepholeOptimizer
+from assembler import link
+from vm import VM
+
+REPEAT = 3
+
+FIB_SOURCE = '''
+def fib(n) {
+    if n < 2 { return n }
+    return fib(n - 1) + fib(n - 2)
+}
+result = fib(%d)
+'''
+
+ACKERMANN_SOURCE = '''
+def ack(m, n) {
+    if m == 0 { return n + 1 }
+    if n == 0 { return ack(m - 1, 1) }
+    return ack(m - 1, ack(m, n - 1))
+}
+result = ack(2, %d)
+'''
+
+SUM_SOURCE = '''
+def total(n, acc) {
+    if n == 0 { return acc }
+    return total(n - 1, acc + n)
+}
+result = total(%d, 0)
+'''
+
+
+def fib_calls(n):
+    # Value of fib(n) and how many calls computing it takes
+    if n < 2:
+        return n, 1
+    a, a_calls = fib_calls(n - 1)
+    b, b_calls = fib_calls(n - 2)
+    return a + b, a_calls + b_calls + 1
+
+
+def ackermann_calls(m, n):
+    # As fib_calls, without recursion: ack(2, n) nests about 2n calls deep
+    calls = 0
+    stack = [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            stack.append(m - 1)
+            n = 1
+        else:
+            stack.append(m - 1)
+            stack.append(m)
+            n -= 1
+    return n, calls
+
+
+def compile_program(source):
+    ast = get_parser().parse(source)
+    semantic_analyzer = SemanticAnalyzer()
+    semantic_analyzer.analyze(ast)
+    cfg = build_cfg(optimize(IRGenerator().generate(ast)))
+    LoopInvariantCodeMotion().optimize(cfg)
+    TailCallEliminator().optimize(cfg)
+    code_generator = CodeGenerator(semantic_analyzer.variable_slots())
+    code_generator.generate(cfg)
+    instructions = PeepholeOptimizer().optimize(code_generator.get_instructions(), code_generator.function_table)
+    return link(instructions, code_generator.function_table, code_generator.local_names(), code_generator.frames)
+
+
+def best_of(program):
+    best = None
+    for _ in range(REPEAT):
+        vm = VM(jit_threshold=0)
+        start = time.perf_counter()
+        variables = vm.run(program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, variables['result']
+
+
+def main():
+    fib_n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    ackermann_n = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    sum_n = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    cases = [
+        (f'fib({fib_n})', FIB_SOURCE % fib_n, fib_calls(fib_n)),
+        (f'ack(2, {ackermann_n})', ACKERMANN_SOURCE % ackermann_n, ackermann_calls(2, ackermann_n)),
+        (f'total({sum_n}, 0)', SUM_SOURCE % sum_n, (sum_n * (sum_n + 1) // 2, sum_n + 1)),
+    ]
+    for name, source, (expected, calls) in cases:
+        elapsed, result = best_of(compile_program(source))
+        if result != expected:
+            raise SystemExit(f'{name} returned {result}, expected {expected}')
+        print(f'{name:16} {calls:9} calls {elapsed * 1000:9.2f} ms {calls / elapsed:12,.0f} calls/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Every pass over one deeply nested expression, at the default recursion limit.
+#   python benchmarks/bench_depth.py [depth]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from code_generator import CodeGenerator
+from assembly_generator import AssemblyGenerator
+from assembler import link
+from vm import VM
+
+
+def generate_source(depth):
+    # Right-nested through parentheses, left-nested through a long chain and
+    # nested through unary minus, so each kind of nesting is covered
+    lines = [
+        'x = ' + '(1 + ' * depth + '1' + ')' * depth,
+        'y = ' + '1 + ' * depth + '1',
+        'z = ' + '-' * depth + '5',
+        'print(x)',
+        'print(y)',
+        'print(z)',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def timed(name, function):
+    start = time.perf_counter()
+    result = function()
+    print(f'{name:<18} {(time.perf_counter() - start) * 1000:9.2f} ms')
+    return result
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f'depth {depth}, recursion limit {sys.getrecursionlimit()}')
+    source = generate_source(depth)
+    ast = timed('Parser', lambda: get_parser().parse(source))
+    timed('SemanticAnalyzer', lambda: SemanticAnalyzer().analyze(ast))
+    ir = timed('IRGenerator', lambda: IRGenerator().generate(ast))
+    code_generator = CodeGenerator()
+    timed('CodeGenerator', lambda: code_generator.generate(ir))
+    timed('AssemblyGenerator', lambda: AssemblyGenerator().generate(ir))
+    timed('VM._compile_node', lambda: VM()._compile_node(ir))
+    program = link(code_generator.get_instructions(), code_generator.function_table, code_generator.local_names())
+    timed('VM.run', lambda: VM(jit_threshold=0).run(program))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Per-node cost of each visitor-based pass over a generated program.
+#   python benchmarks/bench_dispatch.py [statements]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from code_generator import CodeGenerator
+from assembly_generator import AssemblyGenerator
+
+REPEAT = 5
+
+
+def generate_source(statements):
+    lines = ['x0 = 1']
+    for i in range(1, statements):
+        lines.append(f'x{i} = (x{i - 1} + {i}) * 2 - {i} / 3')
+    return '\n'.join(lines) + '\n'
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def best_of(function):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ast = get_parser().parse(generate_source(statements))
+    ir = IRGenerator().generate(ast)
+    ast_nodes = count_nodes(ast)
+    ir_nodes = count_nodes(ir)
+
+    passes = [
+        ('SemanticAnalyzer', ast_nodes, lambda: SemanticAnalyzer().analyze(ast)),
+        ('IRGenerator', ast_nodes, lambda: IRGenerator().generate(ast)),
+        ('CodeGenerator', ir_nodes, lambda: CodeGenerator().generate(ir)),
+        ('AssemblyGenerator', ir_nodes, lambda: AssemblyGenerator().generate(ir)),
+    ]
+    print(f'{statements} statements, {ast_nodes} AST nodes, {ir_nodes} IR nodes')
+    for name, nodes, function in passes:
+        elapsed = best_of(function)
+        print(f'{name:<18} {elapsed * 1000:9.2f} ms {elapsed / nodes * 1e9:9.1f} ns/node')
+
+
+if __name__ == '__main__':
+    main()
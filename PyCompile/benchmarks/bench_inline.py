@@ -0,0 +1,97 @@
+# Calls to small leaf functions in a loop, compiled with -O1, where each one
+# is a CALL, and -O2, where the inliner replaces them with the function body.
+# Results are checked against Python. The VM runs without its JIT, which
+# would compile the calls away at both levels.
+#   python benchmarks/bench_inline.py [iterations]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from optimizer import Inliner, LoopInvariantCodeMotion, TailCallEliminator, optimize
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from peephole import PeepholeOptimizer
+from assembler import link
+from vm import VM
+
+REPEAT = 3
+OPT_LEVELS = (1, 2)
+
+ADD_SOURCE = '''
+def add(x, y) {
+    return x + y
+}
+i = 0
+result = 0
+while i < %d {
+    result = add(result, i)
+    i = add(i, 1)
+}
+'''
+
+POLYNOMIAL_SOURCE = '''
+def square(v) {
+    return v * v
+}
+def poly(x) {
+    s = square(x)
+    return s * 3 + x * 2 + 1
+}
+i = 0
+result = 0
+while i < %d {
+    result = result + poly(i) - square(i)
+    i = i + 1
+}
+'''
+
+
+def compile_program(source, opt_level):
+    ast = get_parser().parse(source)
+    semantic_analyzer = SemanticAnalyzer()
+    semantic_analyzer.analyze(ast)
+    cfg = build_cfg(optimize(IRGenerator().generate(ast), opt_level))
+    if opt_level >= 2:
+        LoopInvariantCodeMotion().optimize(cfg)
+    TailCallEliminator().optimize(cfg)
+    code_generator = CodeGenerator(semantic_analyzer.variable_slots())
+    code_generator.generate(cfg)
+    instructions = PeepholeOptimizer().optimize(code_generator.get_instructions(), code_generator.function_table)
+    return link(instructions, code_generator.function_table, code_generator.local_names(), code_generator.frames)
+
+
+def best_of(program):
+    best = None
+    for _ in range(REPEAT):
+        vm = VM(jit_threshold=0)
+        start = time.perf_counter()
+        variables = vm.run(program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, variables['result']
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cases = [
+        ('add', ADD_SOURCE % n, sum(range(n)), 2 * n),
+        ('poly', POLYNOMIAL_SOURCE % n, sum(2 * i * i + 2 * i + 1 for i in range(n)), 3 * n),
+    ]
+    for name, source, expected, calls in cases:
+        inlined = Inliner()
+        inlined.inline(IRGenerator().generate(get_parser().parse(source)))
+        print(f'{name}: {calls} calls, {inlined.inlined} call sites inlined at -O2')
+        for opt_level in OPT_LEVELS:
+            elapsed, result = best_of(compile_program(source, opt_level))
+            if result != expected:
+                raise SystemExit(f'{name} at -O{opt_level} returned {result}, expected {expected}')
+            print(f'  -O{opt_level} {elapsed * 1000:9.2f} ms {calls / elapsed:12,.0f} calls/s')
+
+
+if __name__ == '__main__':
+    main()
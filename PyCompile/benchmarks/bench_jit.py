@@ -0,0 +1,145 @@
+# Numeric loops run by the interpreter alone, with the JIT, which compiles
+# hot loops and leaf functions to Python, and as the same loop written by hand
+# in Python. Results are checked against the Python version.
+#   python benchmarks/bench_jit.py [iterations]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from optimizer import TailCallEliminator, optimize
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from peephole import PeepholeOptimizer
+from assembler import link
+from jit import DEFAULT_JIT_THRESHOLD
+from vm import VM
+
+REPEAT = 3
+
+NESTED_SOURCE = '''
+i = 0
+result = 0
+while i < %d {
+    j = 0
+    while j < 10 {
+        result = result + i * j
+        j = j + 1
+    }
+    i = i + 1
+}
+'''
+
+
+def nested(n):
+    i = 0
+    result = 0
+    while i < n:
+        j = 0
+        while j < 10:
+            result = result + i * j
+            j = j + 1
+        i = i + 1
+    return result
+
+
+BRANCH_SOURCE = '''
+i = 0
+result = 0
+while i < %d {
+    if i < 100 {
+        result = result + i * 3
+    } else {
+        result = result - i / 4
+    }
+    i = i + 1
+}
+'''
+
+
+def branch(n):
+    i = 0
+    result = 0
+    while i < n:
+        if i < 100:
+            result = result + i * 3
+        else:
+            result = result - i / 4
+        i = i + 1
+    return result
+
+
+CALL_SOURCE = '''
+def square(v) {
+    return v * v
+}
+i = 0
+result = 0
+while i < %d {
+    result = result + square(i) - i
+    i = i + 1
+}
+'''
+
+
+def square(v):
+    return v * v
+
+
+def call(n):
+    i = 0
+    result = 0
+    while i < n:
+        result = result + square(i) - i
+        i = i + 1
+    return result
+
+
+def compile_program(source):
+    # -O1, so the call stays a call rather than being inlined
+    ast = get_parser().parse(source)
+    semantic_analyzer = SemanticAnalyzer()
+    semantic_analyzer.analyze(ast)
+    cfg = build_cfg(optimize(IRGenerator().generate(ast), 1))
+    TailCallEliminator().optimize(cfg)
+    code_generator = CodeGenerator(semantic_analyzer.variable_slots())
+    code_generator.generate(cfg)
+    instructions = PeepholeOptimizer().optimize(code_generator.get_instructions(), code_generator.function_table)
+    return link(instructions, code_generator.function_table, code_generator.local_names(), code_generator.frames)
+
+
+def best_of(run):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cases = [
+        ('nested', NESTED_SOURCE % n, nested),
+        ('branch', BRANCH_SOURCE % n, branch),
+        ('call', CALL_SOURCE % n, call),
+    ]
+    for name, source, python in cases:
+        program = compile_program(source)
+        python_time, expected = best_of(lambda: python(n))
+        print(f'{name}:')
+        for label, threshold in (('interpreter', 0), ('jit', DEFAULT_JIT_THRESHOLD)):
+            elapsed, result = best_of(lambda: VM(jit_threshold=threshold).run(program)['result'])
+            if result != expected:
+                raise SystemExit(f'{name} with {label} returned {result}, expected {expected}')
+            print(f'  {label:<12} {elapsed * 1000:9.2f} ms {elapsed / python_time:6.2f}x Python')
+        print(f'  {"python":<12} {python_time * 1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
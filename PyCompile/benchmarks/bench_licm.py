@@ -0,0 +1,108 @@
+# VM time of a while loop with invariant arithmetic in its body, compiled at
+# -O1 and at -O2, which adds loop-invariant code motion. Both must leave the
+# program's variables the same. The VM interprets throughout, with the JIT
+# off. Then the time code motion itself takes on programs of many loops, which
+# must grow about linearly with the number of loops.
+#   python benchmarks/bench_licm.py [iterations]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from ir_generator import IRGenerator
+from optimizer import LoopInvariantCodeMotion, TEMPORARY_PREFIX, optimize
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from peephole import PeepholeOptimizer
+from assembler import link
+from pipeline import Pipeline
+from vm import VM
+
+REPEAT = 3
+# Loop counts of the scaling check. Time linear in the loops grows by the
+# ratio between them; more than twice that fails the check.
+SCALING_LOOPS = (250, 1000)
+
+
+def generate_source(iterations):
+    # a and b change between runs of the inner loop, so constant folding
+    # cannot remove the arithmetic; loop bodies run to the end of the file
+    lines = [
+        't = 0',
+        'a = 0',
+        'while a < 4:',
+        '    a = a + 1',
+        '    b = a * 2 + 1',
+        '    i = 0',
+        f'    while i < {iterations} / 4:',
+        '        t = t + (a * b + a) * (b - a) - i',
+        '        i = i + 1',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def generate_loops(count):
+    # count loops one after another, each with an expression to hoist
+    lines = ['a = 0', 'while a < 3 {', '    a = a + 1', '}', 't = 0']
+    for k in range(count):
+        lines += [f'i{k} = 0', f'while i{k} < 3 {{', f'    t = t + a * {k + 2} - i{k}', f'    i{k} = i{k} + 1', '}']
+    return '\n'.join(lines) + '\n'
+
+
+def licm_time(source):
+    # Best time of the licm stage over REPEAT compiles, in seconds
+    best = None
+    for _ in range(REPEAT):
+        pipeline = Pipeline(2)
+        pipeline.compile(source)
+        record = next(record for record in pipeline.records if record['stage'] == 'licm')
+        best = record['ns'] if best is None else min(best, record['ns'])
+    return best / 1e9
+
+
+def compile_program(ir, opt_level):
+    cfg = build_cfg(optimize(ir, opt_level))
+    if opt_level >= 2:
+        LoopInvariantCodeMotion().optimize(cfg)
+    code_generator = CodeGenerator()
+    code_generator.generate(cfg)
+    instructions = PeepholeOptimizer().optimize(code_generator.get_instructions(), code_generator.function_table)
+    return link(instructions, code_generator.function_table, code_generator.local_names())
+
+
+def best_of(program):
+    best = None
+    for _ in range(REPEAT):
+        vm = VM(jit_threshold=0)
+        start = time.perf_counter()
+        variables = vm.run(program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, {name: value for name, value in variables.items() if not name.startswith(TEMPORARY_PREFIX)}
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    ir = IRGenerator().generate(get_parser().parse(generate_source(iterations)))
+    results = {}
+    for opt_level in (1, 2):
+        program = compile_program(ir, opt_level)
+        elapsed, variables = best_of(program)
+        results[opt_level] = variables
+        print(f'-O{opt_level} {len(program):4} instructions {elapsed * 1000:9.2f} ms')
+    if results[1] != results[2]:
+        raise SystemExit(f'Variables differ: {results[1]} != {results[2]}')
+    print('variables match')
+
+    times = [licm_time(generate_loops(count)) for count in SCALING_LOOPS]
+    for count, elapsed in zip(SCALING_LOOPS, times):
+        print(f'licm on {count:5} loops {elapsed * 1000:9.2f} ms')
+    allowed = 2 * SCALING_LOOPS[1] / SCALING_LOOPS[0]
+    if times[1] > allowed * times[0]:
+        raise SystemExit(f'licm grew {times[1] / times[0]:.1f}x for {SCALING_LOOPS[1] / SCALING_LOOPS[0]:.0f}x the loops')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# The same programs on the stack VM and the register VM: instructions
+# dispatched and wall time. Dispatches are counted on a separate run, through
+# a list that counts the VM's reads of the opcode at each step. The stack VM
+# runs with its JIT off, so both sides are interpreters.
+#   python benchmarks/bench_register.py [scale]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from optimizer import LoopInvariantCodeMotion, TailCallEliminator, optimize
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from peephole import PeepholeOptimizer
+from assembler import link
+from bytecode import encode
+from vm import VM
+from register_generator import RegisterGenerator
+from register_vm import RegisterVM
+
+REPEAT = 3
+
+LOOP_SOURCE = '''
+i = 0
+total = 0
+while i < %d {
+    j = 0
+    while j < 10 {
+        total = total + i * j - (i - j) * 2
+        j = j + 1
+    }
+    i = i + 1
+}
+result = total
+'''
+
+FIB_SOURCE = '''
+def fib(n) {
+    if n < 2 { return n }
+    return fib(n - 1) + fib(n - 2)
+}
+result = fib(%d)
+'''
+
+COLLATZ_SOURCE = '''
+def steps(n) {
+    count = 0
+    while n != 1 {
+        half = n / 2
+        if half * 2 == n { n = half } else { n = 3 * n + 1 }
+        count = count + 1
+    }
+    return count
+}
+i = 1
+result = 0
+while i < %d {
+    result = result + steps(i)
+    i = i + 1
+}
+'''
+
+
+class CountingList(list):
+    # Counts each read of an item, which the VMs do once per instruction
+    def __init__(self, items):
+        super().__init__(items)
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return list.__getitem__(self, index)
+
+
+def compile_cfg(source):
+    ast = get_parser().parse(source)
+    semantic_analyzer = SemanticAnalyzer()
+    semantic_analyzer.analyze(ast)
+    cfg = build_cfg(optimize(IRGenerator().generate(ast)))
+    LoopInvariantCodeMotion().optimize(cfg)
+    TailCallEliminator().optimize(cfg)
+    return cfg, semantic_analyzer.variable_slots()
+
+
+def compile_stack(source):
+    cfg, slots = compile_cfg(source)
+    code_generator = CodeGenerator(slots)
+    code_generator.generate(cfg)
+    instructions = PeepholeOptimizer().optimize(code_generator.get_instructions(), code_generator.function_table)
+    return encode(link(instructions, code_generator.function_table, code_generator.local_names(), code_generator.frames))
+
+
+def compile_register(source):
+    cfg, _ = compile_cfg(source)
+    return RegisterGenerator().generate(cfg)
+
+
+def best_of(run):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        variables = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, variables['result']
+
+
+def stack_dispatches(code):
+    ops = code.ops
+    code.ops = CountingList(ops)
+    VM(jit_threshold=0).run(code)
+    count = code.ops.reads
+    code.ops = ops
+    return count
+
+
+def register_dispatches(program):
+    code = program.code
+    program.code = CountingList(code)
+    RegisterVM().run(program)
+    count = program.code.reads
+    program.code = code
+    return count
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    cases = [
+        ('nested loops', LOOP_SOURCE % (2000 * scale)),
+        ('fib(20)', FIB_SOURCE % (20 + scale - 1)),
+        ('collatz', COLLATZ_SOURCE % (300 * scale)),
+    ]
+    print(f'{"":14} {"machine":9} {"instructions":>12} {"dispatched":>12} {"time":>11}')
+    for name, source in cases:
+        stack_code = compile_stack(source)
+        register_program = compile_register(source)
+        stack_time, stack_result = best_of(lambda: VM(jit_threshold=0).run(stack_code))
+        register_time, register_result = best_of(lambda: RegisterVM().run(register_program))
+        if stack_result != register_result:
+            raise SystemExit(f'{name}: stack VM gave {stack_result}, register VM {register_result}')
+        stack_count = stack_dispatches(stack_code)
+        register_count = register_dispatches(register_program)
+        print(f'{name:14} {"stack":9} {len(stack_code):12} {stack_count:12,} {stack_time * 1000:8.2f} ms')
+        print(f'{"":14} {"register":9} {len(register_program):12} {register_count:12,} {register_time * 1000:8.2f} ms'
+              f'  ({register_count / stack_count:.2f}x dispatches, {stack_time / register_time:.2f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
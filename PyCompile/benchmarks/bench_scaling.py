@@ -0,0 +1,65 @@
+# Time per statement of each stage as programs grow; flat columns mean linear time.
+# Stages run with the cyclic GC paused, as Pipeline.compile runs them.
+#   python benchmarks/bench_scaling.py [largest]      (default 1000000)
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import get_parser
+from semantic_analyzer import SemanticAnalyzer
+from ir_generator import IRGenerator
+from code_generator import CodeGenerator
+from assembly_generator import AssemblyGenerator
+from pipeline import paused_gc
+
+STAGES = ('Parser', 'SemanticAnalyzer', 'IRGenerator', 'CodeGenerator', 'AssemblyGenerator')
+
+
+def generate_source(statements):
+    # A long statement list, plus one tuple whose element list grows with it
+    lines = ['x0 = 1']
+    for i in range(1, statements):
+        lines.append(f'x{i} = x{i - 1} + {i}')
+    lines.append('(' + ', '.join(f'x{i}' for i in range(0, statements, 10)) + ')')
+    return '\n'.join(lines) + '\n'
+
+
+def measure(statements):
+    source = generate_source(statements)
+    times = {}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        result = function()
+        times[stage] = time.perf_counter() - start
+        return result
+
+    ast = timed('Parser', lambda: get_parser().parse(source))
+    timed('SemanticAnalyzer', lambda: SemanticAnalyzer().analyze(ast))
+    ir = timed('IRGenerator', lambda: IRGenerator().generate(ast))
+    timed('CodeGenerator', lambda: CodeGenerator().generate(ir))
+    timed('AssemblyGenerator', lambda: AssemblyGenerator().generate(ir))
+    return times
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    sizes = []
+    size = 1000
+    while size <= largest:
+        sizes.append(size)
+        size *= 10
+
+    print('us/statement' + ''.join(f'{stage:>19}' for stage in STAGES))
+    for statements in sizes:
+        with paused_gc():
+            times = measure(statements)
+        gc.collect()
+        print(f'{statements:>12}' + ''.join(f'{times[stage] / statements * 1e6:19.2f}' for stage in STAGES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# The benchmark suite: every corpus.py workload at several sizes, timing each
+# compiler stage (as Pipeline records them) and each execution engine on its
+# own. Throughput is source lines per second. Results can be saved as a JSON
+# baseline, and a later run compared against one fails, with exit status 1,
+# when any measurement's throughput drops by more than the threshold.
+#   python benchmarks/bench_suite.py [--sizes 100,1000] [--save baseline.json]
+#   python benchmarks/bench_suite.py --baseline baseline.json [--threshold 0.1]
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import WORKLOADS
+from interpreter import Interpreter
+from optimizer import DEFAULT_OPT_LEVEL
+from pipeline import Pipeline, paused_gc
+from register_vm import RegisterVM
+from version import COMPILER_VERSION
+from vm import VM
+
+REPEAT = 5
+SIZES = (100, 1000)
+DEFAULT_THRESHOLD = 0.10
+# Below this a measurement is mostly timer and scheduler noise, so it is
+# reported but never fails a comparison
+MIN_GATED_NS = 500_000
+
+ENGINES = ('vm', 'jit', 'interpreter', 'register')
+# Stack VM mnemonics that compute, counted to make sure the optimizer left
+# the corpus' arithmetic for the engines to run
+ARITHMETIC = ('ADD', 'SUB', 'MUL', 'DIV', 'LOAD_LOAD_ADD')
+
+
+def compile_stages(source, opt_level, repeat):
+    # Best time of each stage over repeat compiles, plus the programs for
+    # both back ends. The register back end shares every stage but its own
+    # code generator, so only that one is taken from its pipeline.
+    best = {}
+    for _ in range(repeat):
+        stack = Pipeline(opt_level)
+        program = stack.compile(source)
+        register = Pipeline(opt_level, backend='register')
+        register_program = register.compile(source)
+        records = stack.records + [record for record in register.records if record['stage'] == 'register_codegen']
+        for record in records:
+            name = record['stage']
+            best[name] = min(best.get(name, record['ns']), record['ns'])
+    best['total'] = sum(best.values()) - best['register_codegen']
+    return best, program, register_program
+
+
+def count_arithmetic(program):
+    return sum(1 for instruction in program.instructions if instruction.split()[0] in ARITHMETIC)
+
+
+def run_engine(engine, program, register_program):
+    if engine == 'vm':
+        return VM(jit_threshold=0).run(program)
+    if engine == 'jit':
+        return VM().run(program)
+    if engine == 'interpreter':
+        return Interpreter(program).run()
+    return RegisterVM().run(register_program)
+
+
+def time_engine(engine, program, register_program, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        with paused_gc():
+            start = time.perf_counter_ns()
+            result = run_engine(engine, program, register_program)
+            elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure(workloads, sizes, opt_level, engines, repeat=REPEAT, out=print):
+    # workload/size/compile/<stage> and workload/size/run/<engine> -> the
+    # best time and the source lines it covered
+    results = {}
+    for workload in workloads:
+        for size in sizes:
+            source = WORKLOADS[workload](size)
+            lines = source.count('\n')
+            stages, program, register_program = compile_stages(source, opt_level, repeat)
+            # Every workload has an operation in most of its lines; a program
+            # folded down to constants would leave the engines nothing to do
+            if count_arithmetic(program) < lines // 4:
+                raise SystemExit(f'{workload} at size {size}: only {count_arithmetic(program)} arithmetic '
+                                 f'instructions are left for {lines} lines')
+            for stage, ns in stages.items():
+                results[f'{workload}/{size}/compile/{stage}'] = {'ns': ns, 'lines': lines}
+            expected = None
+            for engine in engines:
+                ns, result = time_engine(engine, program, register_program, repeat)
+                # The two stack VM tiers must agree
+                if engine in ('vm', 'jit'):
+                    if expected is not None and result != expected:
+                        raise SystemExit(f'{workload} at size {size}: {engine} disagrees with the other stack VM tier')
+                    expected = result
+                results[f'{workload}/{size}/run/{engine}'] = {'ns': ns, 'lines': lines}
+            out(f'{workload} {size}: compile {stages["total"] / 1e6:.2f} ms, '
+                + ', '.join(f'{engine} {results[f"{workload}/{size}/run/{engine}"]["ns"] / 1e6:.2f} ms'
+                            for engine in engines))
+    return results
+
+
+def throughput(measurement):
+    # Source lines per second
+    return measurement['lines'] * 1e9 / max(measurement['ns'], 1)
+
+
+def compare(results, baseline, threshold, min_ns=MIN_GATED_NS):
+    # (key, baseline throughput, throughput, change) for every measurement
+    # in both, and the keys among them that regressed past threshold
+    rows = []
+    regressions = []
+    for key, measurement in results.items():
+        previous = baseline.get(key)
+        if previous is None or previous['lines'] != measurement['lines']:
+            continue
+        before = throughput(previous)
+        after = throughput(measurement)
+        change = after / before - 1
+        rows.append((key, before, after, change))
+        gated = previous['ns'] >= min_ns and measurement['ns'] >= min_ns
+        if gated and change < -threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def load_baseline(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_results(path, results, opt_level, repeat):
+    document = {
+        'compiler_version': COMPILER_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'opt_level': opt_level,
+        'repeat': repeat,
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the compiler stages and execution engines.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help="Comma separated program sizes, in statements")
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help="Comma separated workloads to run")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="Comma separated engines to run")
+    parser.add_argument('-O', '--opt-level', type=int, default=DEFAULT_OPT_LEVEL, help="Optimization level")
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help="Runs of every measurement; the best is kept, so more runs mean less noise")
+    parser.add_argument('--save', help="Write the results to this JSON file, to use as a baseline")
+    parser.add_argument('--baseline', help="Compare against the results in this JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Largest throughput drop allowed against the baseline, as a fraction")
+    parser.add_argument('--min-time', type=float, default=MIN_GATED_NS / 1e6,
+                        help="Measurements shorter than this, in milliseconds, never fail a comparison")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    workloads = args.workloads.split(',')
+    engines = args.engines.split(',')
+    for name in workloads:
+        if name not in WORKLOADS:
+            raise SystemExit(f"Unknown workload '{name}', expected one of {', '.join(WORKLOADS)}")
+    for name in engines:
+        if name not in ENGINES:
+            raise SystemExit(f"Unknown engine '{name}', expected one of {', '.join(ENGINES)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = measure(workloads, sizes, args.opt_level, engines, args.repeat)
+    if args.save:
+        save_results(args.save, results, args.opt_level, args.repeat)
+        print(f"Results written to '{args.save}'.")
+    if not args.baseline:
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline.get('opt_level') != args.opt_level:
+        print(f"Warning: the baseline was measured at -O{baseline.get('opt_level')}")
+    rows, regressions = compare(results, baseline['results'], args.threshold, args.min_time * 1e6)
+    print(f"{'measurement':<48} {'baseline':>12} {'now':>12} {'change':>8}  lines/s")
+    for key, before, after, change in rows:
+        flag = '  REGRESSION' if key in regressions else ''
+        print(f'{key:<48} {before:12.0f} {after:12.0f} {change:+8.1%}{flag}')
+    if regressions:
+        print(f'{len(regressions)} of {len(rows)} measurements regressed by more than {args.threshold:.0%}')
+        sys.exit(1)
+    print(f'No regressions beyond {args.threshold:.0%} in {len(rows)} measurements.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Generated programs for bench_suite.py. Each generator takes a size, about
+# the number of statements to produce, and returns source text whose compile
+# time and run time both grow with it. Nothing is printed, so runs measure
+# the engine rather than the terminal.
+
+
+def opaque(name, value):
+    # Lines setting name to value by counting up to it in a loop. Constant
+    # propagation forgets whatever a loop assigns, so expressions over name
+    # stay in the program for the engines to compute.
+    return [f'{name} = 0', f'while {name} < {value} {{', f'    {name} = {name} + 1', '}']
+
+
+def arithmetic_loops(size):
+    # Loops of 20 trips updating accumulators, five statements each
+    lines = ['total = 0']
+    for k in range(max(1, size // 5)):
+        lines += [
+            f'i{k} = 0',
+            f'a{k} = {k + 1}',
+            f'while i{k} < 20 {{',
+            f'    a{k} = a{k} * 3 + i{k} - a{k} / 2',
+            f'    total = total + a{k} - i{k} * 2',
+            f'    i{k} = i{k} + 1',
+            '}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def nested_ifs(size):
+    # A loop of 10 trips per unit around ifs nested three deep
+    lines = ['y = 0']
+    for k in range(max(1, size // 10)):
+        j = f'j{k}'
+        lines += [
+            f'{j} = 0',
+            f'while {j} < 10 {{',
+            f'    if {j} < 5 {{',
+            f'        if {j} < 2 {{ y = y + {j} }} else {{ y = y - 1 }}',
+            '    } else {',
+            f'        if {j} == 7 {{',
+            f'            if y > {k} {{ y = y - {j} }} else {{ y = y + 2 }}',
+            f'        }} else {{ y = y + {k % 3} }}',
+            '    }',
+            f'    {j} = {j} + 1',
+            '}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def recursion(size):
+    # Doubly recursive functions, each called once with a small argument
+    lines = ['s = 0']
+    for k in range(max(1, size // 5)):
+        lines += [
+            f'def r{k}(n) {{',
+            '    if n < 2 { return n }',
+            f'    return r{k}(n - 1) + r{k}(n - 2)',
+            '}',
+            f's = s + r{k}({8 + k % 3})',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def straight_line(size):
+    # One long run of assignments, each reading the one before
+    lines = opaque('v0', 1)
+    for i in range(1, size):
+        lines.append(f'v{i} = v{i - 1} + {i} * 2 - {i % 7}')
+    return '\n'.join(lines) + '\n'
+
+
+# Operators and operands deep expressions cycle through, around a variable
+DEEP_OPERATORS = ('+', '-', '*', '+')
+DEEP_DEPTH = 32
+
+
+def deep_expressions(size):
+    # Assignments of expressions nested DEEP_DEPTH levels
+    lines = opaque('x', 3)
+    for k in range(max(1, size // DEEP_DEPTH)):
+        expression = 'x'
+        for depth in range(DEEP_DEPTH):
+            expression = f'({expression} {DEEP_OPERATORS[depth % len(DEEP_OPERATORS)]} {(depth + k) % 3 + 1})'
+        lines.append(f'e{k} = {expression}')
+    return '\n'.join(lines) + '\n'
+
+
+WORKLOADS = {
+    'arithmetic_loops': arithmetic_loops,
+    'nested_ifs': nested_ifs,
+    'recursion': recursion,
+    'straight_line': straight_line,
+    'deep_expressions': deep_expressions,
+}
@@ -0,0 +1,245 @@
+from array import array
+
+# Integer opcodes understood by the VM dispatch loop
+PUSH = 0
+LOAD = 1
+STORE = 2
+ADD = 3
+SUB = 4
+MUL = 5
+DIV = 6
+PRINT = 7
+JMP_IF_FALSE = 8
+JMP = 9
+CALL = 10
+RETURN = 11
+HALT = 12
+CMP_GT = 13
+CMP_LT = 14
+CMP_EQ = 15
+CMP_NE = 16
+PUSH_STRING = 17
+CMP_LE = 18
+CMP_GE = 19
+CREATE_TUPLE = 20
+# Superinstructions formed by the peephole optimizer
+STORE_LOAD = 21
+LOAD_LOAD_ADD = 22
+CMP_LT_JMP_IF_FALSE = 23
+# Variables resolved to a frame slot at code generation time
+LOAD_SLOT = 24
+STORE_SLOT = 25
+# A slot of the program's frame, read from inside a function
+LOAD_GLOBAL = 26
+POP = 27
+# CALL that replaces the running frame instead of pushing one
+TAIL_CALL = 28
+
+OPCODES = {
+    'PUSH': PUSH,
+    'LOAD': LOAD,
+    'STORE': STORE,
+    'ADD': ADD,
+    'SUB': SUB,
+    'MUL': MUL,
+    'DIV': DIV,
+    'PRINT': PRINT,
+    'JMP_IF_FALSE': JMP_IF_FALSE,
+    'JMP': JMP,
+    'CALL': CALL,
+    'RETURN': RETURN,
+    'HALT': HALT,
+    'CMP_GT': CMP_GT,
+    'CMP_LT': CMP_LT,
+    'CMP_EQ': CMP_EQ,
+    'CMP_NE': CMP_NE,
+    'PUSH_STRING': PUSH_STRING,
+    'CMP_LE': CMP_LE,
+    'CMP_GE': CMP_GE,
+    'CREATE_TUPLE': CREATE_TUPLE,
+    'STORE_LOAD': STORE_LOAD,
+    'LOAD_LOAD_ADD': LOAD_LOAD_ADD,
+    'CMP_LT_JMP_IF_FALSE': CMP_LT_JMP_IF_FALSE,
+    'LOAD_SLOT': LOAD_SLOT,
+    'STORE_SLOT': STORE_SLOT,
+    'LOAD_GLOBAL': LOAD_GLOBAL,
+    'POP': POP,
+    'TAIL_CALL': TAIL_CALL,
+}
+OPNAMES = {code: name for name, code in OPCODES.items()}
+
+# Opcodes whose operand is an index into the constant pool, the name table,
+# a slot of the current frame, two such slots packed as
+# (first << SLOT_PAIR_SHIFT) | second, a slot of the program's frame, an
+# absolute instruction index resolved by the linker, an index into the
+# call-target table, or a plain count
+CONST_OPS = (PUSH, PUSH_STRING)
+NAME_OPS = (LOAD, STORE)
+SLOT_OPS = (LOAD_SLOT, STORE_SLOT, STORE_LOAD)
+SLOT_PAIR_OPS = (LOAD_LOAD_ADD,)
+GLOBAL_OPS = (LOAD_GLOBAL,)
+JUMP_OPS = (JMP_IF_FALSE, JMP, CMP_LT_JMP_IF_FALSE)
+CALL_OPS = (CALL, TAIL_CALL)
+COUNT_OPS = (CREATE_TUPLE,)
+
+# Operands are stored as signed 32-bit ints, which bounds both halves
+SLOT_PAIR_SHIFT = 16
+SLOT_PAIR_MASK = (1 << SLOT_PAIR_SHIFT) - 1
+
+
+# The name table starts with the name of each slot of the program's frame,
+# in slot order, so a slot is also the index of its variable's name; names
+# only used by the name-keyed LOAD and STORE follow. The VM only reads the
+# names for slots to report variables by name.
+#
+# functions is the call-target table CALL operands index, one
+# (name, entry, parameter count, local names) tuple per function. A call's
+# frame has a slot per local name, the parameters first, and the function's
+# code runs from entry up to the next function's.
+class CodeObject:
+    __slots__ = ('ops', 'args', 'consts', 'names', 'functions', 'lines')
+
+    def __init__(self, ops, args, consts, names, functions=(), lines=None):
+        self.ops = ops
+        self.args = args
+        self.consts = consts
+        self.names = names
+        self.functions = list(functions)
+        # Source line of each instruction, as in Program.lines; modules do
+        # not keep them
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __repr__(self):
+        return (f'CodeObject(instructions={len(self.ops)}, consts={self.consts}, names={self.names}, '
+                f'functions={[function[0] for function in self.functions]})')
+
+    def disassemble(self):
+        # Slots name the locals of whichever frame the code runs in
+        frames = {function[1]: function[3] for function in self.functions}
+        slot_names = self.names
+        lines = []
+        for pc in range(len(self.ops)):
+            slot_names = frames.get(pc, slot_names)
+            op = self.ops[pc]
+            arg = self.args[pc]
+            name = OPNAMES[op]
+            if op in CONST_OPS:
+                lines.append(f'{pc:4} {name} {self.consts[arg]!r}')
+            elif op in NAME_OPS:
+                lines.append(f'{pc:4} {name} {self.names[arg]}')
+            elif op in SLOT_OPS:
+                lines.append(f'{pc:4} {name} {arg} ({slot_names[arg]})')
+            elif op in SLOT_PAIR_OPS:
+                first = arg >> SLOT_PAIR_SHIFT
+                second = arg & SLOT_PAIR_MASK
+                lines.append(f'{pc:4} {name} {first} {second} ({slot_names[first]}, {slot_names[second]})')
+            elif op in GLOBAL_OPS:
+                lines.append(f'{pc:4} {name} {arg} ({self.names[arg]})')
+            elif op in CALL_OPS:
+                lines.append(f'{pc:4} {name} {arg} ({self.functions[arg][0]})')
+            elif op in JUMP_OPS or op in COUNT_OPS:
+                lines.append(f'{pc:4} {name} {arg}')
+            else:
+                lines.append(f'{pc:4} {name}')
+        return lines
+
+
+def encode(program):
+    # Decode a linked Program once into parallel opcode/operand arrays.
+    # Constants and names become indexes into their pools, call targets
+    # indexes into the call-target table; jump targets are already absolute
+    # instruction indexes.
+    ops = array('i')
+    args = array('i')
+    consts = []
+    names = list(program.local_names)
+    const_index = {}
+    name_index = {name: i for i, name in enumerate(names)}
+
+    functions = []
+    call_index = {}
+    for name, entry in program.functions.items():
+        if name not in program.frames:
+            raise ValueError(f'No frame layout for function {name!r}')
+        parameter_count, local_names = program.frames[name]
+        call_index[entry] = len(functions)
+        functions.append((name, entry, parameter_count, list(local_names)))
+    # Size of the frame each instruction runs in, changing at function entries
+    frame_sizes = {entry: len(function[3]) for entry, function in zip(call_index, functions)}
+    frame_size = len(program.local_names)
+
+    def intern(name):
+        if name not in name_index:
+            name_index[name] = len(names)
+            names.append(name)
+        return name_index[name]
+
+    def slot(text, instruction, pc, size):
+        slot = int(text)
+        if not 0 <= slot < size:
+            raise ValueError(f'No frame slot {slot} in {instruction!r} at {pc}')
+        return slot
+
+    for pc, instruction in enumerate(program.instructions):
+        frame_size = frame_sizes.get(pc, frame_size)
+        parts = instruction.split(None, 1)
+        if not parts:
+            raise ValueError(f'Empty instruction at {pc}')
+        mnemonic = parts[0]
+        if mnemonic not in OPCODES:
+            raise ValueError(f'Unknown opcode {mnemonic!r} at {pc}')
+        op = OPCODES[mnemonic]
+
+        if op in CONST_OPS:
+            value = parse_constant(parts[1])
+            # repr keeps 0.0 and -0.0 apart, which compare equal
+            key = (type(value), repr(value))
+            if key not in const_index:
+                const_index[key] = len(consts)
+                consts.append(value)
+            arg = const_index[key]
+        elif op in NAME_OPS:
+            arg = intern(parts[1])
+        elif op in SLOT_OPS:
+            arg = slot(parts[1], instruction, pc, frame_size)
+        elif op in SLOT_PAIR_OPS:
+            first, second = parts[1].split()
+            first = slot(first, instruction, pc, frame_size)
+            second = slot(second, instruction, pc, frame_size)
+            if first > SLOT_PAIR_MASK >> 1 or second > SLOT_PAIR_MASK:
+                raise ValueError(f'Too many slots to encode {instruction!r} at {pc}')
+            arg = (first << SLOT_PAIR_SHIFT) | second
+        elif op in GLOBAL_OPS:
+            arg = slot(parts[1], instruction, pc, len(program.local_names))
+        elif op in CALL_OPS:
+            entry = int(parts[1])
+            if entry not in call_index:
+                raise ValueError(f'No function starts at {entry} in {instruction!r} at {pc}')
+            arg = call_index[entry]
+        elif op in JUMP_OPS or op in COUNT_OPS:
+            arg = int(parts[1])
+        else:
+            arg = 0
+
+        ops.append(op)
+        args.append(arg)
+
+    lines = None if program.lines is None else array('i', program.lines)
+    return CodeObject(ops, args, consts, names, functions, lines)
+
+
+def parse_constant(text):
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+        # The lexer keeps a literal's own quotes as part of the token value
+        if len(text) >= 2 and text.startswith('"') and text.endswith('"'):
+            text = text[1:-1]
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        # Folded divisions leave float literals behind
+        return float(text)
@@ -0,0 +1,451 @@
+from ir_generator import IRNode
+from visitor import Visitor
+
+# A control-flow graph of basic blocks, built from the IR. Every back end
+# lowers control flow through lower() below, so labels, jumps and block
+# layout are decided in one place.
+#
+# A block holds straight-line IR statements and ends in one terminator:
+#   ('jump', target)
+#   ('branch', condition, if_true, if_false)
+#   ('return', value)     back to the caller with the value of an expression
+#   ('tail_call', call)   return what the function_call node call returns,
+#                         running the callee in place of the current frame
+#   ('halt',)
+#
+# Each function body is a graph of its own, kept in the program graph's
+# functions and lowered after the program's code.
+
+
+class BasicBlock:
+    __slots__ = ('label', 'function', 'statements', 'terminator', 'preds', 'succs')
+
+    def __init__(self, label, function=None):
+        self.label = label
+        # Name of the function this block is the entry of, if any
+        self.function = function
+        self.statements = []
+        self.terminator = ('halt',)
+        self.preds = []
+        self.succs = []
+
+    def __repr__(self):
+        return f'<BasicBlock {self.label}>'
+
+
+def successors(terminator):
+    kind = terminator[0]
+    if kind == 'branch':
+        return [terminator[2], terminator[3]]
+    if kind == 'jump':
+        return [terminator[1]]
+    return []
+
+
+class Loop:
+    __slots__ = ('header', 'latches', 'blocks', 'parent', 'depth')
+
+    def __init__(self, header):
+        self.header = header
+        # Blocks with a back edge to the header
+        self.latches = []
+        self.blocks = {header}
+        self.parent = None
+        self.depth = 1
+
+    def exits(self):
+        # Edges leaving the loop, as (inside, outside) pairs
+        return [(block, succ) for block in self.blocks for succ in block.succs if succ not in self.blocks]
+
+    def __repr__(self):
+        return f'<Loop {self.header.label}, {len(self.blocks)} blocks, depth {self.depth}>'
+
+
+class ControlFlowGraph:
+    # name and parameters are those of the function whose body this is, or
+    # None and () for the program
+    def __init__(self, name=None, parameters=()):
+        self.name = name
+        self.parameters = list(parameters)
+        # In layout order, which is source order
+        self.blocks = []
+        # Function name -> graph of its body, on the program's graph
+        self.functions = {}
+        self.entry = BasicBlock(name, name)
+        self.blocks.append(self.entry)
+
+    def new_block(self):
+        # Labelled by link(), once the layout is known
+        return BasicBlock(None)
+
+    def link(self):
+        # Drop the blocks nothing reaches, such as code after a return, number
+        # the rest in layout order and derive the edges from the terminators.
+        # Labels in a function body start with its name, so they are unique
+        # across the program.
+        reachable = {self.entry}
+        pending = [self.entry]
+        while pending:
+            for succ in successors(pending.pop().terminator):
+                if succ not in reachable:
+                    reachable.add(succ)
+                    pending.append(succ)
+        self.blocks = [block for block in self.blocks if block in reachable]
+
+        prefix = 'LABEL' if self.name is None else f'{self.name}.LABEL'
+        count = 0
+        for block in self.blocks:
+            if block.function is None:
+                block.label = f'{prefix}{count}'
+                count += 1
+            block.preds = []
+        for block in self.blocks:
+            block.succs = successors(block.terminator)
+            for succ in block.succs:
+                succ.preds.append(block)
+
+    def reverse_postorder(self):
+        # Blocks reachable from the entry, each before its successors
+        # except along back edges
+        order = []
+        seen = {self.entry}
+        stack = [(self.entry, iter(self.entry.succs))]
+        while stack:
+            block, pending = stack[-1]
+            for succ in pending:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+    def dominators(self):
+        # Immediate dominator of every reachable block, the entry mapping to
+        # itself (Cooper, Harvey and Kennedy's iterative algorithm)
+        order = self.reverse_postorder()
+        position = {block: i for i, block in enumerate(order)}
+        idom = {self.entry: self.entry}
+
+        def intersect(a, b):
+            while a is not b:
+                while position[a] > position[b]:
+                    a = idom[a]
+                while position[b] > position[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new_idom = None
+                for pred in block.preds:
+                    if pred in idom:
+                        new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if idom.get(block) is not new_idom:
+                    idom[block] = new_idom
+                    changed = True
+        return idom
+
+    def dominates(self, a, b, idom=None):
+        if idom is None:
+            idom = self.dominators()
+        if b not in idom:
+            return False
+        while b is not a:
+            if b is self.entry:
+                return False
+            b = idom[b]
+        return True
+
+    def loops(self):
+        # Natural loops, one per header, outermost first in source order
+        idom = self.dominators()
+        # A back edge goes to a block no later in reverse postorder, so only
+        # those edges need the walk up the dominator tree
+        position = {block: i for i, block in enumerate(self.reverse_postorder())}
+        loops = {}
+        for block in idom:
+            for succ in block.succs:
+                if position[succ] > position[block] or not self.dominates(succ, block, idom):
+                    continue
+                # A back edge: the loop is everything reaching the latch
+                # without passing through the header
+                loop = loops.get(succ)
+                if loop is None:
+                    loop = loops[succ] = Loop(succ)
+                loop.latches.append(block)
+                pending = [block]
+                while pending:
+                    member = pending.pop()
+                    if member not in loop.blocks:
+                        loop.blocks.add(member)
+                        pending.extend(member.preds)
+
+        # The parent is the smallest other loop containing the header. Loops
+        # nest, so going from the largest down, the last loop to claim a
+        # block is the smallest containing it so far.
+        innermost = {}
+        for loop in sorted(loops.values(), key=lambda loop: -len(loop.blocks)):
+            loop.parent = innermost.get(loop.header)
+            if loop.parent is not None:
+                loop.depth = loop.parent.depth + 1
+            for block in loop.blocks:
+                innermost[block] = loop
+
+        layout = {block: i for i, block in enumerate(self.blocks)}
+        return sorted(loops.values(), key=lambda loop: (loop.depth, layout[loop.header]))
+
+    def insert_preheaders(self, loops):
+        # A block for each of loops that runs once on the way into it, from
+        # every edge entering it from outside, laid out just before its
+        # header. All are placed in one pass over the layout and linked once.
+        preheaders = {}
+        for loop in loops:
+            header = loop.header
+            preheader = preheaders[header] = BasicBlock(None)
+            preheader.terminator = ('jump', header)
+            for pred in header.preds:
+                if pred not in loop.blocks:
+                    pred.terminator = tuple(preheader if part is header else part for part in pred.terminator)
+        blocks = []
+        for block in self.blocks:
+            if block in preheaders:
+                blocks.append(preheaders[block])
+            blocks.append(block)
+        self.blocks = blocks
+        self.link()
+        return [preheaders[loop.header] for loop in loops]
+
+    def local_names(self):
+        # Frame layout of a function body: the parameters, then each name the
+        # body assigns, in layout order. Inlined calls assign temporaries
+        # from within expressions, so whole trees are searched.
+        names = dict.fromkeys(self.parameters)
+        for block in self.blocks:
+            roots = list(block.statements)
+            if block.terminator[0] in ('branch', 'return', 'tail_call'):
+                roots.append(block.terminator[1])
+            for root in roots:
+                pending = [root]
+                while pending:
+                    node = pending.pop()
+                    if node is None:
+                        continue
+                    if node.type == 'assignment':
+                        names.setdefault(node.value)
+                    # Right to left, so names come out in evaluation order
+                    pending.extend(reversed(node.children))
+        return list(names)
+
+    def reaching_definitions(self):
+        # Which assignments may have produced each name's value at the start
+        # of each block. Definitions are (name, block, index of the statement)
+        # and sets of them are bitmasks over that list. Each name also has a
+        # definition with block None, standing for no assignment at all.
+        # Parameters are assigned by the call, as if at the very start of the
+        # entry block, with negative indexes.
+        definitions = []
+        masks = {}
+        assignments = [(name, self.entry, -1 - i) for i, name in enumerate(self.parameters)]
+        assignments += [(statement.value, block, index)
+                        for block in self.blocks
+                        for index, statement in enumerate(block.statements)
+                        if statement.type == 'assignment']
+        for name, block, index in assignments:
+            if name not in masks:
+                masks[name] = 1 << len(definitions)
+                definitions.append((name, None, None))
+        undefined = (1 << len(definitions)) - 1
+        for definition in assignments:
+            masks[definition[0]] |= 1 << len(definitions)
+            definitions.append(definition)
+
+        # What each block adds and removes, over the definitions reaching it
+        gen = {}
+        kill = {}
+        bit = 1 << len(masks)
+        for block in self.blocks:
+            block_gen = block_kill = 0
+            if block is self.entry:
+                for name in self.parameters:
+                    block_gen |= bit
+                    block_kill |= masks[name]
+                    bit <<= 1
+            for statement in block.statements:
+                if statement.type == 'assignment':
+                    mask = masks[statement.value]
+                    block_gen = (block_gen & ~mask) | bit
+                    block_kill |= mask
+                    bit <<= 1
+            gen[block] = block_gen
+            kill[block] = block_kill
+
+        order = self.reverse_postorder()
+        reach_in = {block: 0 for block in self.blocks}
+        reach_out = {block: gen[block] for block in self.blocks}
+        changed = True
+        while changed:
+            changed = False
+            for block in order:
+                reach = undefined if block is self.entry else 0
+                for pred in block.preds:
+                    reach |= reach_out[pred]
+                reach_in[block] = reach
+                out = gen[block] | (reach & ~kill[block])
+                if out != reach_out[block]:
+                    reach_out[block] = out
+                    changed = True
+        return definitions, masks, reach_in
+
+    def format(self):
+        lines = []
+        for block in self.blocks:
+            preds = ', '.join(pred.label for pred in block.preds)
+            succs = ', '.join(succ.label for succ in block.succs)
+            lines.append(f'{block.label}: {len(block.statements)} statements, '
+                         f'{block.terminator[0]}, preds [{preds}], succs [{succs}]')
+        for loop in self.loops():
+            blocks = ', '.join(block.label for block in self.blocks if block in loop.blocks)
+            lines.append(f'loop {loop.header.label} (depth {loop.depth}): [{blocks}]')
+        for graph in self.functions.values():
+            lines.append(f'function {graph.name}({", ".join(graph.parameters)}):')
+            lines.extend('    ' + line for line in graph.format().split('\n'))
+        return '\n'.join(lines)
+
+
+class CFGBuilder(Visitor):
+    # Control-flow statements drive their own bodies; any other node is a
+    # straight-line statement and lands in the current block unvisited.
+    def build(self, ir):
+        self.program = self.cfg = ControlFlowGraph()
+        self.current = self.cfg.entry
+        self.visit(ir)
+        self.cfg.link()
+        return self.cfg
+
+    def start(self, block):
+        self.cfg.blocks.append(block)
+        self.current = block
+
+    def end(self, *terminator):
+        self.current.terminator = terminator
+
+    def visit_program(self, node):
+        yield from self.collect(node.children)
+
+    def visit_block(self, node):
+        yield from self.collect(node.children)
+
+    def visit_if(self, node):
+        cfg = self.cfg
+        condition, then_node = node.children[0], node.children[1]
+        else_node = node.children[2] if len(node.children) > 2 else None
+        then_block = cfg.new_block()
+        join_block = cfg.new_block()
+        else_block = cfg.new_block() if else_node is not None else join_block
+
+        self.end('branch', condition, then_block, else_block)
+        self.start(then_block)
+        yield then_node
+        self.end('jump', join_block)
+        if else_node is not None:
+            self.start(else_block)
+            yield else_node
+            self.end('jump', join_block)
+        self.start(join_block)
+
+    def visit_while(self, node):
+        cfg = self.cfg
+        condition, body = node.children
+        header = cfg.new_block()
+        body_block = cfg.new_block()
+        exit_block = cfg.new_block()
+
+        self.end('jump', header)
+        self.start(header)
+        self.end('branch', condition, body_block, exit_block)
+        self.start(body_block)
+        yield body
+        self.end('jump', header)
+        self.start(exit_block)
+
+    def visit_function_def(self, node):
+        # The body is built into a graph of its own; the program carries on
+        # in the current block
+        parameters = [parameter.value for parameter in node.children[0].children]
+        graph = ControlFlowGraph(node.value, parameters)
+        self.program.functions[node.value] = graph
+        outer = self.cfg, self.current
+        self.cfg, self.current = graph, graph.entry
+        yield node.children[1]
+        # Falling off the end of the body returns 0
+        self.end('return', IRNode('number', 0, None, node.lineno))
+        graph.link()
+        self.cfg, self.current = outer
+
+    def visit_return(self, node):
+        # The value is lowered with the return; whatever follows in the same
+        # body is unreachable, and link() drops it
+        self.end('return', node.children[0])
+        self.start(self.cfg.new_block())
+        yield from ()
+
+    def generic_visit(self, node):
+        self.current.statements.append(node)
+
+
+def build_cfg(ir):
+    return CFGBuilder().build(ir)
+
+
+def lower(cfg, backend):
+    # Walk the program's blocks in layout order, then each function's, and
+    # call the backend's hooks:
+    #   lower_function(graph)            before the blocks of a function
+    #   lower_label(block), lower_statement(node), lower_jump(block),
+    #   lower_branch(condition, block)   jump to block if condition is false
+    #   lower_return(value), lower_tail_call(call), lower_halt()
+    # A jump to the block laid out next is left out, and only blocks that
+    # something jumps to, or that start a function, get a label.
+    lower_blocks(cfg, backend)
+    for graph in cfg.functions.values():
+        backend.lower_function(graph)
+        lower_blocks(graph, backend)
+
+
+def lower_blocks(cfg, backend):
+    blocks = cfg.blocks
+    targets = {cfg.entry} if cfg.name is not None else set()
+    steps = []
+    for i, block in enumerate(blocks):
+        following = blocks[i + 1] if i + 1 < len(blocks) else None
+        terminator = block.terminator
+        kind = terminator[0]
+        if kind == 'jump':
+            block_steps = [] if terminator[1] is following else [('jump', terminator[1])]
+        elif kind == 'branch':
+            block_steps = [('branch', terminator[1], terminator[3])]
+            if terminator[2] is not following:
+                block_steps.append(('jump', terminator[2]))
+        elif kind in ('return', 'tail_call'):
+            block_steps = [terminator]
+        else:
+            block_steps = [('halt',)]
+        for step in block_steps:
+            if step[0] in ('jump', 'branch'):
+                targets.add(step[-1])
+        steps.append(block_steps)
+
+    lower_statement = backend.lower_statement
+    for block, block_steps in zip(blocks, steps):
+        if block in targets:
+            backend.lower_label(block)
+        for statement in block.statements:
+            lower_statement(statement)
+        for step in block_steps:
+            getattr(backend, 'lower_' + step[0])(*step[1:])
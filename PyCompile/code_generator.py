@@ -1,79 +1,112 @@
-from ir_generator import IRNode
-class CodeGenerator:
-    def __init__(self):
+from assembler import LINE_DIRECTIVE
+from cfg import ControlFlowGraph, build_cfg, lower
+from visitor import Visitor
+
+class CodeGenerator(Visitor):
+    # Straight-line IR node type -> generator method; control flow reaches
+    # this class already lowered to blocks, see lower_* below
+    handler_names = {
+        'assignment': 'generate_ASSIGN',
+        'identifier': 'generate_ID',
+        'number': 'generate_NUMBER',
+        'binary_expression': 'generate_BIN_OP',
+        'unary_expression': 'generate_UNARY_OP',
+        'comparison': 'generate_CMP',
+        'print': 'generate_PRINT',
+        'function_call': 'generate_FUNCTION_CALL',
+        'expression_statement': 'generate_EXPR_STMT',
+        'sequence': 'generate_SEQUENCE',
+        'tuple': 'generate_TUPLE',
+        'string': 'generate_STRING',
+    }
+
+    def __init__(self, slots=None, line_numbers=False):
+        super().__init__()
         self.instructions = []
-        self.label_count = 0
+        # Whether to emit .line directives, for the profiler's line counts,
+        # and the line the last one gave
+        self.line_numbers = line_numbers
+        self.line = None
         self.function_table = {}
+        # Variable name -> frame slot, seeded from the semantic analyzer's
+        # symbols; names it never saw, such as temporaries and variables
+        # only assigned in function bodies, get the next free slot
+        self.slots = dict(slots or {})
+        # Function name -> (parameter count, local names), see Program.frames
+        self.frames = {}
+        # Local name -> slot in the frame of the function being generated;
+        # None while generating the program's own code
+        self.frame_slots = None
 
     def generate(self, node):
-        if node.type == 'PROGRAM':
-            self.generate_PROGRAM(node)
-        elif node.type == 'ASSIGN':
-            self.generate_ASSIGN(node)
-        elif node.type == 'ID':
-            self.generate_ID(node)
-        elif node.type == 'NUMBER':
-            self.generate_NUMBER(node)
-        elif node.type == 'BIN_OP':
-            self.generate_BIN_OP(node)
-        elif node.type == 'CMP':
-            self.generate_CMP(node)
-        elif node.type == 'IF':
-            self.generate_IF(node)
-        elif node.type == 'WHILE':
-            self.generate_WHILE(node)
-        elif node.type == 'PRINT':
-            self.generate_PRINT(node)
-        elif node.type == 'RETURN':
-            self.generate_RETURN(node)
-        elif node.type == 'FUNCTION_DEF':
-            self.generate_FUNCTION_DEF(node)
-        elif node.type == 'FUNCTION_CALL':
-            self.generate_FUNCTION_CALL(node)
-        elif node.type == 'BLOCK':
-            self.generate_BLOCK(node)
-        elif node.type == 'TUPLE':
-            self.generate_TUPLE(node)
-        elif node.type == 'GET_TUPLE':
-            self.generate_GET_TUPLE(node)
-        elif node.type == 'STRING':
-            self.generate_STRING(node)
-            
-        # elif IRNode.type == 'TUPLE':
-        #     self.generate_TUPLE(node)
-        # elif IRNode.type == 'GET_TUPLE':
-        #     self.generate_GET_TUPLE(node)
-        # elif IRNode.type == 'STRING':
-        #     self.generate_STRING(node)
-        else:
-            raise ValueError(f'Unknown node type: {node.type}')
+        # node is IR, or a ControlFlowGraph already built from it
+        cfg = node if isinstance(node, ControlFlowGraph) else build_cfg(node)
+        self.frame_slots = None
+        lower(cfg, self)
+
+    def lower_function(self, graph):
+        local_names = graph.local_names()
+        self.frames[graph.name] = (len(graph.parameters), local_names)
+        self.frame_slots = {name: slot for slot, name in enumerate(local_names)}
+
+    def lower_label(self, block):
+        if block.function is not None:
+            self.function_table[block.function] = len(self.instructions)
+        self.instructions.append(f'{block.label}:')
+
+    def lower_statement(self, node):
+        self.mark_line(node)
+        self.visit(node)
+
+    def lower_jump(self, block):
+        self.instructions.append(f'JMP {block.label}')
+
+    def lower_branch(self, condition, block):
+        self.mark_line(condition)
+        self.visit(condition)
+        self.instructions.append(f'JMP_IF_FALSE {block.label}')
+
+    def lower_return(self, value):
+        self.mark_line(value)
+        self.visit(value)
+        self.instructions.append('RETURN')
 
+    def lower_tail_call(self, call):
+        self.mark_line(call)
+        for argument in call.children:
+            self.visit(argument)
+        self.instructions.append(f'TAIL_CALL {call.value}')
 
-    def generate_PROGRAM(self, node):
-        for child in node.children:
-            self.generate(child)
+    def lower_halt(self):
         self.instructions.append('HALT')
 
-    def generate_ASSIGN(self, node):
-        var_name = node.value
-        expr_node = node.children[0]
-        self.generate(expr_node)
-        self.instructions.append(f'STORE {var_name}')
+    def mark_line(self, node):
+        if self.line_numbers and node.lineno and node.lineno != self.line:
+            self.line = node.lineno
+            self.instructions.append(f'{LINE_DIRECTIVE} {node.lineno}')
+
+    def generic_visit(self, node):
+        raise ValueError(f'Unknown node type: {node.type}')
+
+    # Plain handlers run once their children's code has been emitted; the
+    # generator handlers emit around each child they yield.
+    def generate_ASSIGN(self, node, expression):
+        self.instructions.append(f'STORE_SLOT {self.local_slot(node.value)}')
 
     def generate_ID(self, node):
-        var_name = node.value
-        self.instructions.append(f'LOAD {var_name}')
+        name = node.value
+        if self.frame_slots is not None and name not in self.frame_slots:
+            # A function body reading a variable of the program
+            self.instructions.append(f'LOAD_GLOBAL {self.slot(name)}')
+        else:
+            self.instructions.append(f'LOAD_SLOT {self.local_slot(name)}')
 
     def generate_NUMBER(self, node):
         number = node.value
         self.instructions.append(f'PUSH {number}')
 
-    def generate_BIN_OP(self, node):
+    def generate_BIN_OP(self, node, left, right):
         op = node.value
-        left_node = node.children[0]
-        right_node = node.children[1]
-        self.generate(left_node)
-        self.generate(right_node)
         if op == '+':
             self.instructions.append('ADD')
         elif op == '-':
@@ -83,12 +116,14 @@ class CodeGenerator:
         elif op == '/':
             self.instructions.append('DIV')
 
-    def generate_CMP(self, node):
+    def generate_UNARY_OP(self, node):
+        # Negation is lowered to 0 - operand
+        self.instructions.append('PUSH 0')
+        yield node.children[0]
+        self.instructions.append('SUB')
+
+    def generate_CMP(self, node, left, right):
         cmp = node.value
-        left_node = node.children[0]
-        right_node = node.children[1]
-        self.generate(left_node)
-        self.generate(right_node)
         if cmp == '>':
             self.instructions.append('CMP_GT')
         elif cmp == '<':
@@ -97,84 +132,29 @@ class CodeGenerator:
             self.instructions.append('CMP_EQ')
         elif cmp == '!=':
             self.instructions.append('CMP_NE')
+        elif cmp == '<=':
+            self.instructions.append('CMP_LE')
+        elif cmp == '>=':
+            self.instructions.append('CMP_GE')
 
-    def generate_IF(self, node):
-        condition_node = node.children[0]
-        if_body = node.children[1]
-        else_body = node.children[2] if len(node.children) > 2 else None
-
-        false_label = self.new_label()
-        end_label = self.new_label()
-
-        self.generate(condition_node)
-        self.instructions.append(f'JMP_IF_FALSE {false_label}')
-
-        self.generate(if_body)
-        if else_body:
-            self.instructions.append(f'JMP {end_label}')
-            self.instructions.append(f'{false_label}:')
-            self.generate(else_body)
-        else:
-            self.instructions.append(f'{false_label}:')
-
-        self.instructions.append(f'{end_label}:')
-
-    def generate_WHILE(self, node):
-        condition_node = node.children[0]
-        while_body = node.children[1]
-
-        start_label = self.new_label()
-        end_label = self.new_label()
-
-        self.instructions.append(f'{start_label}:')
-        self.generate(condition_node)
-        self.instructions.append(f'JMP_IF_FALSE {end_label}')
-
-        self.generate(while_body)
-        self.instructions.append(f'JMP {start_label}')
-        self.instructions.append(f'{end_label}:')
-
-    def generate_PRINT(self, node):
-        expr_node = node.children[0]
-        self.generate(expr_node)
+    def generate_PRINT(self, node, expression):
         self.instructions.append('PRINT')
 
-    def generate_RETURN(self, node):
-        expr_node = node.children[0]
-        self.generate(expr_node)
-        self.instructions.append('RETURN')
-
-    def generate_FUNCTION_DEF(self, node):
+    def generate_FUNCTION_CALL(self, node, *args):
+        # Arguments are on the stack, first one deepest
         function_name = node.value
-        self.function_table[function_name] = len(self.instructions)
-        self.instructions.append(f'{function_name}:')
-        for stmt in node.children[1].children:
-            self.generate(stmt)
-        self.instructions.append('RETURN')
-
-    def generate_FUNCTION_CALL(self, node):
-        function_name = node.value
-        for arg in node.children:
-            self.generate(arg)
         self.instructions.append(f'CALL {function_name}')
 
-    def generate_BLOCK(self, node):
-        for stmt in node.children:
-            self.generate(stmt)
+    def generate_EXPR_STMT(self, node, expression):
+        self.instructions.append('POP')
+
+    def generate_SEQUENCE(self, node, *parts):
+        # An inlined call: its parts ran in order, leaving the last one's value
+        pass
 
-    def generate_TUPLE(self, node):
+    def generate_TUPLE(self, node, *elements):
         # Generate code for tuple creation
-        for child in node.children:
-            self.generate(child)
-        self.instructions.append('CREATE_TUPLE')
-
-    def generate_GET_TUPLE(self, node):
-        # Generate code to get an element from a tuple
-        tuple_node = node.children[0]
-        index_node = node.children[1]
-        self.generate(tuple_node)
-        self.generate(index_node)
-        self.instructions.append('GET_TUPLE')
+        self.instructions.append(f'CREATE_TUPLE {len(node.children)}')
 
     def generate_STRING(self, node):
         # Generate code for string literals
@@ -184,7 +164,18 @@ class CodeGenerator:
     def get_instructions(self):
         return self.instructions
 
-    def new_label(self):
-        label = f'LABEL{self.label_count}'
-        self.label_count += 1
-        return label
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.slots)
+        return slot
+
+    def local_slot(self, name):
+        # Slot of a name assigned in the code being generated
+        if self.frame_slots is None:
+            return self.slot(name)
+        return self.frame_slots[name]
+
+    def local_names(self):
+        # Slots are handed out in order, so the dict's order is slot order
+        return list(self.slots)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from assembler import Program
+from version import COMPILER_VERSION
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pycompile')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.json'
+
+
+class CompileCache:
+    # variant names the compiler options in effect, e.g. the optimization
+    # level, so programs compiled differently from one source never collide
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, variant=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.variant = variant
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, source_code):
+        digest = hashlib.sha256()
+        digest.update(COMPILER_VERSION.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(self.variant.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source_code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, source_code):
+        path = self.entry_path(self.key(source_code))
+        try:
+            with open(path, 'r') as file:
+                artifact = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Unreadable or truncated entry, drop it and recompile
+            self.remove(path)
+            return None
+
+        if artifact.get('compiler_version') != COMPILER_VERSION:
+            self.remove(path)
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return Program(artifact['instructions'], artifact['symbols'], artifact['functions'], artifact['local_names'],
+                       artifact['frames'])
+
+    def put(self, source_code, program):
+        artifact = {
+            'compiler_version': COMPILER_VERSION,
+            'instructions': program.instructions,
+            'symbols': program.symbols,
+            'functions': program.functions,
+            'local_names': program.local_names,
+            'frames': program.frames,
+        }
+        path = self.entry_path(self.key(source_code))
+
+        # Write to a temporary file in the same directory and rename it into
+        # place, so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(artifact, file, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            self.remove(tmp_path)
+            raise
+
+        self.evict()
+        return path
+
+    def entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits in max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.remove(path)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,74 @@
+import glob
+import hashlib
+import importlib.util
+import os
+
+import ply.lex as lex
+import ply.yacc as yacc
+
+# Prebuilt lexer and LR tables live here. File names carry a digest of the
+# rules they were generated from, so tables from an older grammar are never
+# picked up. Regenerate after changing lexer.py or parser.py with:
+#   python grammar_tables.py
+TABLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+
+def rules_signature(cls, prefix, *extra):
+    # PLY matches function rules in definition order, so hash them in that order
+    rules = []
+    for name in dir(cls):
+        if not name.startswith(prefix):
+            continue
+        value = getattr(cls, name)
+        if isinstance(value, str):
+            rules.append((0, name, value))
+        elif callable(value):
+            rules.append((value.__code__.co_firstlineno, name, value.__doc__ or ''))
+    rules.sort(key=lambda rule: (rule[0], rule[1]))
+
+    digest = hashlib.sha256()
+    for _, name, text in rules:
+        digest.update(f'{name}={text}\0'.encode('utf-8'))
+    for value in extra:
+        digest.update(repr(value).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def lextab_name(lexer_class):
+    signature = rules_signature(lexer_class, 't_', lexer_class.tokens, lexer_class.reserved)
+    return f'lextab_{signature}'
+
+
+def parsetab_name(parser_class):
+    signature = rules_signature(parser_class, 'p_', parser_class.tokens, parser_class.precedence)
+    return f'parsetab_{signature}'
+
+
+def load_table(name, directory=TABLES_DIR):
+    # Import a table module straight from its file, without touching sys.path
+    path = os.path.join(directory, name + '.py')
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_tables(directory=TABLES_DIR):
+    from lexer import Lexer
+    from parser import Parser
+
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'lextab_*.py')) + glob.glob(os.path.join(directory, 'parsetab_*.py')):
+        os.remove(path)
+
+    lex.lex(module=Lexer(), optimize=True, lextab=lextab_name(Lexer), outputdir=directory)
+    # Skip Parser.__init__, which would try to load the tables being built
+    yacc.yacc(module=Parser.__new__(Parser), tabmodule=parsetab_name(Parser), outputdir=directory,
+              debug=False, write_tables=True, errorlog=yacc.NullLogger())
+    return directory
+
+
+if __name__ == '__main__':
+    print(f"Tables written to '{build_tables()}'.")
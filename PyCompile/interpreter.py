@@ -1,47 +1,116 @@
+from assembler import Program, link
+from bytecode import parse_constant
+from vm import DEFAULT_MAX_CALL_DEPTH, Frame
+
 class Interpreter:
-    def __init__(self, instructions):
-        self.instructions = instructions()
+    def __init__(self, instructions, max_call_depth=DEFAULT_MAX_CALL_DEPTH):
+        if not isinstance(instructions, Program):
+            instructions = link(instructions)
+        self.program = instructions
+        self.instructions = instructions.instructions
         self.stack = []
+        # Locals of the running frame for the *_SLOT instructions, one per
+        # slot; memory holds variables addressed by name
+        self.locals = self.globals = [None] * len(instructions.local_names)
         self.memory = {}
         self.instruction_pointer = 0
-        self.labels = self.find_labels()
-        self.instruction_pointer = self.find_instruction_pointer()
-
-
-    def find_labels(self):
-        labels = {}
-        for i, instruction in enumerate(self.instructions):
-            if instruction.endswith(':'):
-                labels[instruction[:-1]] = i
-        return labels
-    
-    def find_instruction_pointer(self):
-        for i, instruction in enumerate(self.instructions):
-            if instruction.endswith(':'):
-                continue
-            else:
-                return i
-        
+        self.labels = instructions.symbols
+        # Entry point -> (name, parameter count, local names); a frame's
+        # function is its entry point
+        self.targets = {entry: (name,) + tuple(instructions.frames[name])
+                        for name, entry in instructions.functions.items() if name in instructions.frames}
+        self.max_call_depth = max_call_depth
+        self.frame = Frame(None, self.locals, 0)
+        self.frames = [self.frame]
 
     def run(self):
         while self.instruction_pointer < len(self.instructions):
             instruction = self.instructions[self.instruction_pointer]
-            self.execute(instruction)
             self.instruction_pointer += 1
+            self.execute(instruction)
         
 
+    def load_slot(self, slot):
+        value = self.locals[slot]
+        if value is None:
+            function = self.frame.function
+            names = self.program.local_names if function is None else self.targets[function][2]
+            raise NameError(f"Variable '{names[slot]}' is not assigned")
+        return value
+
+    def load_global(self, slot):
+        value = self.globals[slot]
+        if value is None:
+            raise NameError(f"Variable '{self.program.local_names[slot]}' is not assigned")
+        return value
+
+    def call(self, entry):
+        if entry not in self.targets:
+            raise ValueError(f'No function starts at {entry}')
+        name, parameter_count, local_names = self.targets[entry]
+        if len(self.frames) > self.max_call_depth:
+            raise RecursionError(f"Maximum call depth of {self.max_call_depth} exceeded calling '{name}'")
+        # The arguments become the first locals of the new frame
+        base = len(self.stack) - parameter_count
+        self.locals = self.stack[base:] + [None] * (len(local_names) - parameter_count)
+        del self.stack[base:]
+        self.frame = Frame(self.instruction_pointer, self.locals, base, entry)
+        self.frames.append(self.frame)
+        self.instruction_pointer = entry
+
+    def tail_call(self, entry):
+        # As call, but the callee takes over the running frame
+        if entry not in self.targets:
+            raise ValueError(f'No function starts at {entry}')
+        name, parameter_count, local_names = self.targets[entry]
+        base = len(self.stack) - parameter_count
+        self.locals = self.stack[base:] + [None] * (len(local_names) - parameter_count)
+        del self.stack[self.frame.stack_base:]
+        self.frame.locals = self.locals
+        self.frame.function = entry
+        self.instruction_pointer = entry
+
+    def return_from_call(self):
+        if self.frame.function is None:
+            raise RuntimeError('RETURN outside a function')
+        value = self.stack.pop()
+        del self.stack[self.frame.stack_base:]
+        self.instruction_pointer = self.frame.return_pc
+        self.frames.pop()
+        self.frame = self.frames[-1]
+        self.locals = self.frame.locals
+        self.stack.append(value)
+
     def execute(self, instruction):
         parts = instruction.strip().split()
         if not parts:
             return
         command = parts[0]
 
-        if command == 'PUSH':
-            self.stack.append(int(parts[1]))
+        if command == 'LOAD_SLOT':
+            self.stack.append(self.load_slot(int(parts[1])))
+        elif command == 'STORE_SLOT':
+            self.locals[int(parts[1])] = self.stack.pop()
+        elif command == 'PUSH':
+            self.stack.append(parse_constant(parts[1]))
         elif command == 'STORE':
             self.memory[parts[1]] = self.stack.pop()
         elif command == 'LOAD':
             self.stack.append(self.memory[parts[1]])
+        elif command == 'LOAD_GLOBAL':
+            self.stack.append(self.load_global(int(parts[1])))
+        elif command == 'CALL':
+            self.call(int(parts[1]))
+        elif command == 'TAIL_CALL':
+            self.tail_call(int(parts[1]))
+        elif command == 'RETURN':
+            self.return_from_call()
+        elif command == 'POP':
+            self.stack.pop()
+        elif command == 'STORE_LOAD':
+            self.locals[int(parts[1])] = self.stack[-1]
+        elif command == 'LOAD_LOAD_ADD':
+            self.stack.append(self.load_slot(int(parts[1])) + self.load_slot(int(parts[2])))
         elif command == 'CMP_GT':
             b = self.stack.pop()
             a = self.stack.pop()
@@ -50,21 +119,62 @@ class Interpreter:
             b = self.stack.pop()
             a = self.stack.pop()
             self.stack.append(int(a < b))
+        elif command == 'CMP_GE':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(int(a >= b))
+        elif command == 'CMP_LE':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(int(a <= b))
+        elif command == 'CMP_EQ':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(int(a == b))
+        elif command == 'CMP_NE':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(int(a != b))
         elif command == 'JMP_IF_FALSE':
             if not self.stack.pop():
-                self.instruction_pointer = self.labels[parts[1]] - 1
+                self.instruction_pointer = int(parts[1])
         elif command == 'JMP':
-            self.instruction_pointer = self.labels[parts[1]] - 1
+            self.instruction_pointer = int(parts[1])
+        elif command == 'CMP_LT_JMP_IF_FALSE':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not a < b:
+                self.instruction_pointer = int(parts[1])
         elif command == 'PRINT':
             print(self.stack.pop())
         elif command == 'ADD':
             b = self.stack.pop()
             a = self.stack.pop()
             self.stack.append(a + b)
+        elif command == 'SUB':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(a - b)
+        elif command == 'MUL':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(a * b)
+        elif command == 'DIV':
+            b = self.stack.pop()
+            a = self.stack.pop()
+            self.stack.append(a / b)
+        elif command == 'PUSH_STRING':
+            self.stack.append(parse_constant(instruction.split(None, 1)[1]))
+        elif command == 'CREATE_TUPLE':
+            count = int(parts[1])
+            items = tuple(self.stack[len(self.stack) - count:])
+            del self.stack[len(self.stack) - count:]
+            self.stack.append(items)
         elif command == 'HALT':
-            exit(0)
+            # End the run, leaving the caller in control
+            self.instruction_pointer = len(self.instructions)
         else:
-            pass
+            raise ValueError(f'Unknown instruction {instruction!r}')
     
 
 # Example usage
@@ -0,0 +1,410 @@
+import math
+
+from bytecode import (PUSH, PUSH_STRING, LOAD_SLOT, STORE_SLOT, STORE_LOAD, LOAD_LOAD_ADD, LOAD_GLOBAL, ADD, SUB, MUL,
+                      DIV, CMP_LT, CMP_GT, CMP_EQ, CMP_NE, CMP_LE, CMP_GE, CMP_LT_JMP_IF_FALSE, JMP_IF_FALSE, JMP, POP,
+                      PRINT, CALL, RETURN, JUMP_OPS, SLOT_PAIR_SHIFT, SLOT_PAIR_MASK)
+
+# Calls of a function, or trips round a loop, before it is compiled
+DEFAULT_JIT_THRESHOLD = 200
+
+BINARY_OPERATORS = {ADD: '+', SUB: '-', MUL: '*', DIV: '/'}
+COMPARISON_OPERATORS = {CMP_LT: '<', CMP_GT: '>', CMP_EQ: '==', CMP_NE: '!=', CMP_LE: '<=', CMP_GE: '>='}
+SLOT_WRITES = (STORE_SLOT, STORE_LOAD)
+# Blocks of at most this many lines are copied into the jumps to them, up to
+# this many copies deep
+SPLICE_SIZE = 12
+SPLICE_DEPTH = 4
+
+
+class Unsupported(Exception):
+    # Raised while translating code that is left to the interpreter
+    pass
+
+
+class JitCompiler:
+    # The VM's second tier: translates hot bytecode into Python source and
+    # compiles it with compile()/exec into a closure, so each instruction
+    # costs what the Python operation it stands for costs instead of a trip
+    # through the dispatch loop. Two kinds of code are compiled:
+    #   leaf functions, which call nothing, as a Python function taking the
+    #   arguments and returning the result
+    #   loops, from the target of a backward jump to the jump, as a Python
+    #   function over the running frame's slots, returning the pc the loop
+    #   exits to. A loop may call compiled leaf functions.
+    # Anything else, such as a loop that calls a function which is not a
+    # leaf, stays with the interpreter. Natives are cached per function and
+    # per loop for the run of one CodeObject.
+    def __init__(self, code, program_locals, max_call_depth):
+        self.code = code
+        self.program_locals = program_locals
+        self.max_call_depth = max_call_depth
+        # Call-target index -> native, or None if it cannot be compiled
+        self.functions = {}
+        # Loop header -> native, or None likewise
+        self.loops = {}
+        # Name of each compiled function or loop -> its Python source
+        self.sources = {}
+        # Where each function's code ends: the next entry, or the end
+        entries = sorted(function[1] for function in code.functions) + [len(code.ops)]
+        self.ends = {entry: entries[i + 1] for i, entry in enumerate(entries[:-1])}
+
+    def report(self):
+        functions = sum(native is not None for native in self.functions.values())
+        loops = sum(native is not None for native in self.loops.values())
+        rejected = len(self.functions) + len(self.loops) - functions - loops
+        return f'{functions} functions and {loops} loops compiled, {rejected} left to the interpreter'
+
+    def compile_function(self, index):
+        if index not in self.functions:
+            name, entry, parameter_count, local_names = self.code.functions[index]
+            # Set first, so a function calling itself is not compiled twice
+            self.functions[index] = None
+            try:
+                translation = Translation(self, entry, self.ends[entry], local_names, set(range(parameter_count)),
+                                          loop=False)
+                self.functions[index] = translation.build_function(name, parameter_count)
+            except Unsupported:
+                pass
+        return self.functions[index]
+
+    def compile_loop(self, header, end, function, local):
+        # The loop runs from header up to its backward jump at end - 1, in
+        # the frame whose slots are local. Slots assigned now are assumed
+        # assigned on every later entry, which the native checks first.
+        if header not in self.loops:
+            self.loops[header] = None
+            names = self.code.names if function is None else self.code.functions[function][3]
+            assigned = {slot for slot, value in enumerate(local) if value is not None}
+            try:
+                translation = Translation(self, header, end, names, assigned, loop=True,
+                                          program_frame=function is None)
+                self.loops[header] = translation.build_loop()
+            except Unsupported:
+                pass
+        return self.loops[header]
+
+
+class Translation:
+    # Python source for the bytecode from start up to end. Blocks start at
+    # jump targets; within one, a symbolic stack of expressions stands for
+    # the operand stack, so `LOAD_SLOT 0, PUSH 1, ADD, STORE_SLOT 0` becomes
+    # `v0 = (v0 + 1)`. An expression is computed into a temporary before any
+    # statement that could fail or print, so everything happens in the order
+    # the interpreter would do it.
+    def __init__(self, compiler, start, end, names, assigned, loop, program_frame=False):
+        self.compiler = compiler
+        self.code = compiler.code
+        self.start = start
+        self.end = end
+        self.names = names
+        self.loop = loop
+        # Whether the slots are the program's, which callees read as globals
+        self.program_frame = program_frame
+        self.constants = []
+        # Call-target index -> closure variable of a compiled callee
+        self.callees = {}
+        self.temporaries = 0
+        self.lines = []
+        self.stack = []
+        self.assigned = set()
+        ops = self.code.ops
+        args = self.code.args
+        self.read = set()
+        self.written = set()
+        leaders = {start}
+        for pc in range(start, end):
+            op = ops[pc]
+            arg = args[pc]
+            if op == LOAD_LOAD_ADD:
+                self.read.update((arg >> SLOT_PAIR_SHIFT, arg & SLOT_PAIR_MASK))
+            elif op == LOAD_SLOT:
+                self.read.add(arg)
+            elif op in SLOT_WRITES:
+                self.written.add(arg)
+            if op in JUMP_OPS and start <= arg < end:
+                leaders.add(arg)
+            if op in (JMP, RETURN) and pc + 1 < end:
+                leaders.add(pc + 1)
+        self.leaders = sorted(leaders)
+        # Targets of backward jumps, where loops start, with the length of
+        # the shortest loop starting at each
+        self.headers = {start: end - start}
+        for pc in range(start, end):
+            if ops[pc] == JMP and start <= args[pc] <= pc:
+                self.headers[args[pc]] = min(self.headers.get(args[pc], end), pc - args[pc])
+        # Slots assigned on entry, as far as the code reads them
+        self.entry_assigned = assigned & self.read
+        self.block_assigned = self.assigned_at_blocks(self.entry_assigned)
+
+    def block_end(self, leader):
+        i = self.leaders.index(leader)
+        return self.leaders[i + 1] if i + 1 < len(self.leaders) else self.end
+
+    def assigned_at_blocks(self, entry):
+        # Slots assigned on every path to each reachable block; a slot read
+        # without a check is one of these
+        ops = self.code.ops
+        args = self.code.args
+        result = {self.start: frozenset(entry)}
+        pending = [self.start]
+        while pending:
+            leader = pending.pop()
+            assigned = set(result[leader])
+            edges = []
+            stop = self.block_end(leader)
+            for pc in range(leader, stop):
+                op = ops[pc]
+                arg = args[pc]
+                if op == LOAD_LOAD_ADD:
+                    assigned.update((arg >> SLOT_PAIR_SHIFT, arg & SLOT_PAIR_MASK))
+                elif op == LOAD_SLOT or op in SLOT_WRITES:
+                    assigned.add(arg)
+                if op in JUMP_OPS:
+                    edges.append((arg, frozenset(assigned)))
+                if op in (JMP, RETURN):
+                    break
+            else:
+                edges.append((stop, frozenset(assigned)))
+            for target, assigned in edges:
+                if not self.start <= target < self.end:
+                    continue
+                old = result.get(target)
+                new = assigned if old is None else old & assigned
+                if new != old:
+                    result[target] = new
+                    pending.append(target)
+        return result
+
+    def build_function(self, name, parameter_count):
+        body = self.blocks()
+        parameters = [f'v{slot}' for slot in range(parameter_count)]
+        others = sorted((self.read | self.written) - set(range(parameter_count)))
+        lines = [f'def native({", ".join(parameters)}):']
+        lines += [f'    v{slot} = None' for slot in others]
+        lines += ['    ' + line for line in body]
+        return self.finish(name, lines)
+
+    def build_loop(self):
+        body = self.blocks()
+        slots = sorted(self.read | self.written)
+        lines = ['def native(local, depth):']
+        lines += [f'    v{slot} = local[{slot}]' for slot in slots]
+        guards = [f'v{slot} is None' for slot in sorted(self.entry_assigned)]
+        if self.callees:
+            # A call from here would go past the call depth limit
+            guards.append('depth > max_call_depth')
+        if guards:
+            lines.append(f'    if {" or ".join(guards)}:')
+            lines.append('        return -1')
+        lines.append('    try:')
+        lines += ['        ' + line for line in body]
+        lines.append('    finally:')
+        lines += [f'        local[{slot}] = v{slot}' for slot in sorted(self.written)] or ['        pass']
+        lines.append('    return pc')
+        return self.finish(f'loop at {self.start}', lines)
+
+    def finish(self, name, lines):
+        constants = [f'k{i}' for i in range(len(self.constants))]
+        callees = list(self.callees.values())
+        source = '\n'.join([f'def make({", ".join(["program_locals", "max_call_depth"] + constants + callees)}):']
+                           + ['    ' + line for line in lines] + ['    return native', ''])
+        namespace = {}
+        exec(compile(source, f'<jit {name}>', 'exec'), namespace)
+        natives = [self.compiler.functions[index] for index in self.callees]
+        self.compiler.sources[name] = source
+        return namespace['make'](self.compiler.program_locals, self.compiler.max_call_depth,
+                                 *self.constants, *natives)
+
+    def blocks(self):
+        # The body: blocks still jumped to by pc after splicing are chosen
+        # between on pc, and if that is only the first the body is a plain
+        # loop
+        self.translated = {leader: self.block(leader) for leader in self.leaders if leader in self.block_assigned}
+        self.single = False
+        rendered = {}
+        needed = {self.start}
+        while needed - rendered.keys():
+            leader = min(needed - rendered.keys())
+            rendered[leader] = self.render(leader, 0, needed)
+        if len(rendered) == 1:
+            self.single = True
+            return [f'pc = {self.start}', 'while True:'] + ['    ' + line for line in self.render(self.start, 0, needed)]
+        lines = [f'pc = {self.start}', 'while True:']
+        # Inner loops first, as they run most often
+        for leader in sorted(rendered, key=lambda leader: (self.headers.get(leader, self.end), leader)):
+            lines.append(f'    if pc == {leader}:')
+            lines += ['        ' + line for line in rendered[leader]]
+        return lines
+
+    def render(self, leader, depth, needed):
+        # A block's lines, with its jumps written out
+        lines = []
+        for item in self.translated[leader]:
+            if type(item) is str:
+                lines.append(item)
+            elif item[0] == 'branch':
+                lines.append(f'if {item[1]}:')
+                lines += ['    ' + line for line in self.render_goto(item[2], depth, needed)]
+            else:
+                lines += self.render_goto(item[1], depth, needed)
+        return lines
+
+    def render_goto(self, target, depth, needed):
+        # A small block is copied into the jump to it, so that taking a
+        # branch does not cost a trip through the pc tests. Loop headers are
+        # not, as that would unroll the loop.
+        block = self.translated.get(target)
+        if (block is not None and target not in self.headers and depth < SPLICE_DEPTH
+                and len(block) <= SPLICE_SIZE):
+            return self.render(target, depth + 1, needed)
+        return [self.goto(target, needed)]
+
+    def goto(self, target, needed):
+        if self.start <= target < self.end:
+            if self.single:
+                return 'continue'
+            needed.add(target)
+            return f'pc = {target}; continue'
+        if not self.loop:
+            # A function's code only leaves through RETURN
+            raise Unsupported(f'jump out of the function to {target}')
+        return f'pc = {target}; break'
+
+    def block(self, leader):
+        # Lines of Python, with the jumps as ('branch', condition, target)
+        # taken when condition holds, or ('goto', target), for render
+        ops = self.code.ops
+        args = self.code.args
+        consts = self.code.consts
+        self.lines = lines = []
+        self.stack = stack = []
+        self.assigned = set(self.block_assigned[leader])
+        for pc in range(leader, self.block_end(leader)):
+            op = ops[pc]
+            arg = args[pc]
+            if op == LOAD_SLOT:
+                self.load(arg)
+            elif op == PUSH or op == PUSH_STRING:
+                stack.append(self.constant(consts[arg]))
+            elif op == STORE_SLOT or op == STORE_LOAD:
+                value = stack.pop()
+                self.flush(slot=arg)
+                lines.append(f'v{arg} = {self.value(value)}')
+                self.assigned.add(arg)
+                if op == STORE_LOAD:
+                    stack.append((f'v{arg}', False, frozenset((arg,)), True))
+            elif op in BINARY_OPERATORS or op in COMPARISON_OPERATORS:
+                right = stack.pop()
+                left = stack.pop()
+                operator = BINARY_OPERATORS.get(op) or COMPARISON_OPERATORS[op]
+                stack.append((f'({self.value(left)} {operator} {self.value(right)})', op in COMPARISON_OPERATORS,
+                              left[2] | right[2], False))
+            elif op == LOAD_LOAD_ADD:
+                self.load(arg >> SLOT_PAIR_SHIFT)
+                self.load(arg & SLOT_PAIR_MASK)
+                right = stack.pop()
+                left = stack.pop()
+                stack.append((f'({left[0]} + {right[0]})', False, left[2] | right[2], False))
+            elif op == CMP_LT_JMP_IF_FALSE:
+                right = stack.pop()
+                left = stack.pop()
+                self.require_empty(pc)
+                lines.append(('branch', f'not ({self.value(left)} < {self.value(right)})', arg))
+            elif op == JMP_IF_FALSE:
+                condition = stack.pop()
+                self.require_empty(pc)
+                lines.append(('branch', f'not {condition[0]}', arg))
+            elif op == JMP:
+                self.require_empty(pc)
+                lines.append(('goto', arg))
+                return lines
+            elif op == LOAD_GLOBAL:
+                self.flush()
+                temporary = self.temporary()
+                lines.append(f'{temporary} = program_locals[{arg}]')
+                message = f"Variable '{self.code.names[arg]}' is not assigned"
+                lines.append(f'if {temporary} is None: raise NameError({message!r})')
+                stack.append((temporary, False, frozenset(), True))
+            elif op == PRINT:
+                value = stack.pop()
+                self.flush()
+                lines.append(f'print({self.value(value)})')
+            elif op == POP:
+                value = stack.pop()
+                self.flush()
+                if not value[3]:
+                    lines.append(self.value(value))
+            elif op == CALL and self.loop:
+                native = self.compiler.compile_function(arg)
+                if native is None:
+                    raise Unsupported(f'call at {pc} to a function that is not compiled')
+                parameter_count = self.code.functions[arg][2]
+                arguments = stack[len(stack) - parameter_count:]
+                del stack[len(stack) - parameter_count:]
+                self.flush()
+                if self.program_frame:
+                    # The callee reads globals from the frame, not from here
+                    for slot in sorted(self.globals_read(arg) & self.written):
+                        lines.append(f'local[{slot}] = v{slot}')
+                callee = self.callees.setdefault(arg, f'f{arg}')
+                temporary = self.temporary()
+                lines.append(f'{temporary} = {callee}({", ".join(self.value(argument) for argument in arguments)})')
+                stack.append((temporary, False, frozenset(), True))
+            elif op == RETURN and not self.loop:
+                value = stack.pop()
+                self.require_empty(pc)
+                lines.append(f'return {self.value(value)}')
+                return lines
+            else:
+                raise Unsupported(f'instruction {op} at {pc}')
+        self.require_empty(self.block_end(leader))
+        lines.append(('goto', self.block_end(leader)))
+        return lines
+
+    def globals_read(self, function):
+        entry = self.code.functions[function][1]
+        return {self.code.args[pc] for pc in range(entry, self.compiler.ends[entry])
+                if self.code.ops[pc] == LOAD_GLOBAL}
+
+    # Stack entries are (text, whether it is a comparison, slots it reads,
+    # whether it is a plain name or constant that cannot fail)
+    def value(self, entry):
+        # Comparisons push 0 or 1 in the interpreter
+        return f'int({entry[0]})' if entry[1] else entry[0]
+
+    def load(self, slot):
+        if slot not in self.assigned:
+            self.flush()
+            message = f"Variable '{self.names[slot]}' is not assigned"
+            self.lines.append(f'if v{slot} is None: raise NameError({message!r})')
+            self.assigned.add(slot)
+        self.stack.append((f'v{slot}', False, frozenset((slot,)), True))
+
+    def constant(self, value):
+        if (type(value) is int and abs(value) < 1 << 63) or (type(value) is float and math.isfinite(value)):
+            text = repr(value)
+            if text.startswith('-'):
+                text = f'({text})'
+        else:
+            # Strings, infinities and the like go in through the closure
+            text = f'k{len(self.constants)}'
+            self.constants.append(value)
+        return (text, False, frozenset(), True)
+
+    def temporary(self):
+        self.temporaries += 1
+        return f't{self.temporaries}'
+
+    def flush(self, slot=None):
+        # Compute the entries left on the stack now, before a statement that
+        # could fail, print or assign slot
+        for i, entry in enumerate(self.stack):
+            if not entry[3] or slot in entry[2]:
+                temporary = self.temporary()
+                self.lines.append(f'{temporary} = {self.value(entry)}')
+                self.stack[i] = (temporary, False, frozenset(), True)
+
+    def require_empty(self, pc):
+        # Values left over at a jump would have to live across blocks
+        if self.stack:
+            raise Unsupported(f'{len(self.stack)} values on the stack at {pc}')
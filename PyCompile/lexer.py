@@ -1,11 +1,22 @@
+import codecs
+import mmap
+import re
+from functools import partial
+
 import ply.lex as lex
+from grammar_tables import lextab_name, load_table
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Rest of a string literal after its opening quote
+STRING_TAIL = re.compile(r'(?:[^\"\\]|\\.)*\"')
 
 class Lexer:
     tokens = (
-        'NUMBER', 'IDENTIFIER', 'ASSIGN', 'PLUS', 'MINUS', 'MUL', 'DIV',
+        'NUMBER', 'IDENTIFIER', 'CALL_NAME', 'ASSIGN', 'PLUS', 'MINUS', 'MUL', 'DIV',
         'LPAREN', 'RPAREN', 'COLON', 'COMMA', 'LBRACE', 'RBRACE', 'END',
         'EQ', 'LT', 'GT', 'LE', 'GE', 'NE', 'AND', 'OR', 'NOT', 'STRING', 'DEF', 
-        'IF', 'PRINT', 'ELSE', 'WHILE'
+        'IF', 'PRINT', 'ELSE', 'WHILE', 'RETURN'
     )
     # Reserved words
     reserved = {
@@ -14,6 +25,7 @@ class Lexer:
         'while': 'WHILE',
         'print': 'PRINT',
         'def': 'DEF',
+        'return': 'RETURN',
     }
     # Regular expression rules for simple tokens
     t_ASSIGN = r'='
@@ -45,6 +57,15 @@ class Lexer:
 
 
 
+    # A name with an opening parenthesis after it on the same line names a
+    # call, so a parenthesised statement on the next line is never read as
+    # the arguments of a name ending the line before. Only spaces and tabs
+    # may come between, and the lookahead leaves the parenthesis to LPAREN.
+    def t_CALL_NAME(self, t):
+        r'[a-zA-Z_][a-zA-Z_0-9]*(?=[ \t]*\()'
+        t.type = self.reserved.get(t.value, 'CALL_NAME')  # print( and if ( stay keywords
+        return t
+
     # Define a rule to handle identifiers and reserved words
     def t_IDENTIFIER(self, t):
         r'[a-zA-Z_][a-zA-Z_0-9]*'
@@ -67,22 +88,160 @@ class Lexer:
         print(f"Illegal character '{t.value[0]}'")
         t.lexer.skip(1)
 
-    # Build the lexer
+    # Build the lexer, from the prebuilt lextab when one matches these rules
     def build(self, **kwargs):
+        if 'lextab' not in kwargs and 'optimize' not in kwargs:
+            lextab = load_table(lextab_name(type(self)))
+            if lextab is not None:
+                kwargs.update(optimize=True, lextab=lextab)
         self.lexer = lex.lex(module=self, **kwargs)
 
+    # Token stream over the input code, lexed on demand as the parser pulls
+    def stream(self, code, tap=None):
+        self.lexer.lineno = 1
+        self.lexer.input(code)
+        return TokenStream(self.lexer.token, tap)
+
+    # Token stream over text arriving in chunks, see iter_chunks
+    def stream_chunks(self, chunks, tap=None):
+        return TokenStream(partial(next, self.iter_chunks(chunks), None), tap)
+
     # Tokenize the input code
     def tokenize(self, code):
+        return list(self.iter_tokens(code))
+
+    # Lazily tokenize the input code
+    def iter_tokens(self, code):
+        self.lexer.lineno = 1
         self.lexer.input(code)
-        tokens = []
         while True:
             tok = self.lexer.token()
             if not tok:
-                break
-            tokens.append(tok)
-        return tokens
+                return
+            yield tok
+
+    # Incrementally tokenize source text given as an iterable of chunks.
+    # Only the text after the last complete line is buffered between chunks;
+    # lineno carries over and lexpos is made absolute.
+    def iter_chunks(self, chunks):
+        lexer = self.lexer
+        lexer.lineno = 1
+        for segment, base in split_segments(chunks):
+            lexer.input(segment)
+            while True:
+                tok = lexer.token()
+                if not tok:
+                    break
+                tok.lexpos += base
+                yield tok
+
+    # Incrementally tokenize an open file, text or binary (UTF-8)
+    def iter_file(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.iter_chunks(read_chunks(file, chunk_size))
+
+    # Incrementally tokenize a file on disk through a read-only memory map
+    def iter_path(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.iter_chunks(mapped_chunks(path, chunk_size))
     
 
+class TokenStream:
+    def __init__(self, next_token, tap=None):
+        self.next_token = next_token
+        self.tap = tap
+
+    # Called by the parser for each token; the tap sees every token on the way through
+    def token(self):
+        tok = self.next_token()
+        if tok is not None and self.tap is not None:
+            self.tap(tok)
+        return tok
+
+    def __iter__(self):
+        while True:
+            tok = self.token()
+            if tok is None:
+                return
+            yield tok
+
+
+def split_segments(chunks):
+    # Regroup chunks into segments that end right after a newline outside any
+    # string literal. No token spans such a cut, so each segment lexes exactly
+    # as it would inside the whole text.
+    pending = ''
+    base = 0
+    scan = 0
+    in_string = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += chunk
+        cut = 0
+        while True:
+            if in_string:
+                match = STRING_TAIL.match(pending, scan)
+                if match is None:
+                    # Literal continues into the next chunk, rescan it from here
+                    break
+                scan = match.end()
+                in_string = False
+            else:
+                quote = pending.find('"', scan)
+                end = len(pending) if quote < 0 else quote
+                newline = pending.rfind('\n', scan, end)
+                if newline >= 0:
+                    cut = newline + 1
+                if quote < 0:
+                    scan = len(pending)
+                    break
+                scan = quote + 1
+                in_string = True
+        if cut:
+            yield pending[:cut], base
+            pending = pending[cut:]
+            base += cut
+            scan -= cut
+    if pending:
+        yield pending, base
+
+
+def read_chunks(file, chunk_size=DEFAULT_CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def mapped_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as file:
+        # Empty files cannot be mapped
+        if not file.seek(0, 2):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for start in range(0, len(buffer), chunk_size):
+                yield decoder.decode(buffer[start:start + chunk_size])
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+_shared_lexer = None
+
+# Process-wide lexer, built once and reused across compilations
+def get_lexer():
+    global _shared_lexer
+    if _shared_lexer is None:
+        _shared_lexer = Lexer()
+        _shared_lexer.build()
+    return _shared_lexer
+
+
 # if __name__ == "__main__":
 #     Test the lexer
 #     lexer = Lexer()
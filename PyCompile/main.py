@@ -1,17 +1,95 @@
+import argparse
 import os
-import time
-from lexer import Lexer
-from parser import Parser
-from semantic_analyzer import SemanticAnalyzer
-from ir_generator import IRGenerator
-from code_generator import CodeGenerator
-from assembly_generator import AssemblyGenerator
-from vm import VM
+from optimizer import DEFAULT_OPT_LEVEL, MAX_OPT_LEVEL
+from pipeline import DumpHook, Pipeline, ProgressHook
+from compile_cache import CompileCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from module_file import MODULE_SUFFIX, ModuleFormatError, load_module, write_module
+from vm import DEFAULT_MAX_CALL_DEPTH, VM
+from jit import DEFAULT_JIT_THRESHOLD
+from profiler import ProfilingVM
+from register_vm import RegisterVM
+from batch import DIAGNOSTICS_FILE, SOURCE_SUFFIX, collect_sources, compile_batch
+
+# Machines a program can be compiled for and run on
+BACKENDS = ('stack', 'register')
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="Compile and run a PyCompile source file.")
+    arg_parser.add_argument('source_file', nargs='?', default='source.py')
+    arg_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="directory for cached compiled programs")
+    arg_parser.add_argument('--cache-max-bytes', type=int, default=DEFAULT_MAX_BYTES, help="size bound of the cache directory")
+    arg_parser.add_argument('--no-cache', action='store_true', help="always run the full compiler")
+    arg_parser.add_argument('--dump-tokens', action='store_true', help="print each token as it is lexed")
+    arg_parser.add_argument('--dump', action='store_true',
+                            help="print the AST, IR, control flow graph and code each stage produces")
+    arg_parser.add_argument('--report', help="write each stage's time and counts to this file as JSON")
+    arg_parser.add_argument('--trace-memory', action='store_true',
+                            help="add each stage's peak memory to the report, at several times the run time")
+    arg_parser.add_argument('-O', '--opt-level', type=int, default=DEFAULT_OPT_LEVEL, choices=range(MAX_OPT_LEVEL + 1),
+                            help=f"optimization level, 0 disables the IR optimizer (default {DEFAULT_OPT_LEVEL})")
+    arg_parser.add_argument('--max-call-depth', type=int, default=DEFAULT_MAX_CALL_DEPTH,
+                            help=f"calls that may be active at once (default {DEFAULT_MAX_CALL_DEPTH})")
+    arg_parser.add_argument('--jit-threshold', type=int, default=DEFAULT_JIT_THRESHOLD,
+                            help=f"calls or loop trips before the stack VM compiles code to Python, 0 disables "
+                                 f"(default {DEFAULT_JIT_THRESHOLD})")
+    arg_parser.add_argument('--profile', action='store_true',
+                            help="run under the profiler and print instruction, block and source line counts")
+    arg_parser.add_argument('--profile-output', help="profile, and write collapsed call stacks for a flame graph here")
+    arg_parser.add_argument('--backend', choices=BACKENDS, default='stack',
+                            help="run on the stack VM or the register VM (default stack)")
+    arg_parser.add_argument('-o', '--output', help=f"also write the compiled program as a {MODULE_SUFFIX} module")
+    arg_parser.add_argument('--batch', metavar='OUTPUT_DIR',
+                            help=f"compile every file under the source_file directory, or listed in the source_file "
+                                 f"manifest, to {MODULE_SUFFIX} modules in OUTPUT_DIR without running them")
+    arg_parser.add_argument('-j', '--jobs', type=int, help="worker processes for --batch (default one per core)")
+    arg_parser.add_argument('--suffix', default=SOURCE_SUFFIX,
+                            help=f"source files --batch picks up from a directory (default {SOURCE_SUFFIX})")
+    args = arg_parser.parse_args()
+    if args.output and args.backend != 'stack':
+        arg_parser.error("modules hold stack VM code, so --output needs --backend stack")
+    args.profile = args.profile or args.profile_output is not None
+    if args.profile and args.backend != 'stack':
+        arg_parser.error("the profiler runs stack VM code, so --profile needs --backend stack")
+    if args.batch and (args.backend != 'stack' or args.profile or args.output):
+        arg_parser.error("--batch writes stack VM modules without running them, so it takes no --backend, "
+                         "--profile or --output")
+    if args.jobs is not None and args.jobs < 1:
+        arg_parser.error("--jobs must be at least 1")
+    return args
 
 def main():
+    args = parse_args()
+    if args.batch:
+        run_batch(args)
+        return
     print("Starting compilation process...")
 
-    source_file = 'source.py'
+    source_file = args.source_file
+    hooks = [ProgressHook()]
+    if args.dump:
+        hooks.append(DumpHook())
+    pipeline = Pipeline(args.opt_level, args.backend, args.profile, args.dump_tokens, args.trace_memory, hooks)
+
+    # Precompiled modules are mapped and run directly
+    if source_file.endswith(MODULE_SUFFIX):
+        try:
+            module = load_module(source_file)
+        except ModuleFormatError as e:
+            print(f"Module error: {e}")
+            return
+        with module:
+            print(f"Loaded module '{source_file}' ({len(module.code)} instructions).")
+            if args.profile:
+                vm = ProfilingVM(max_call_depth=args.max_call_depth)
+            else:
+                vm = VM(max_call_depth=args.max_call_depth, jit_threshold=args.jit_threshold)
+            try:
+                pipeline.execute(vm, module.code)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+            finally:
+                report_run(vm, args, pipeline)
+        return
 
     # Check if the source file exists
     if not os.path.exists(source_file):
@@ -27,74 +105,34 @@ def main():
     print("Source code read successfully.")
 
     try:
-        # Step 1: Lexical Analysis
-        print("Starting lexical analysis...")
-        start_time = time.time()
-        lexer = Lexer()
-        lexer.build()
-        tokens = lexer.tokenize(source_code)
-        end_time = time.time()
-        print(f"Lexical analysis completed in {end_time - start_time:.4f} seconds. Tokens generated:")
-        for token in tokens:
-            print(token)
-        
-        # Step 2: Parsing
-        print("Starting parsing...")
-        start_time = time.time()
-        parser = Parser()
-        ast = parser.parse(source_code)
-        end_time = time.time()
-        print(f"Parsing completed in {end_time - start_time:.4f} seconds. AST generated:")
-        print(ast)
-
-        # Step 3: Semantic Analysis
-        print("Starting semantic analysis...")
-        start_time = time.time()
-        semantic_analyzer = SemanticAnalyzer()
-        semantic_analyzer.analyze(ast)
-        end_time = time.time()
-        print(f"Semantic analysis completed in {end_time - start_time:.4f} seconds.")
-
-        # Step 4: Intermediate Representation Generation
-        print("Starting IR generation...")
-        start_time = time.time()
-        ir_generator = IRGenerator()
-        ir = ir_generator.generate(ast)
-        end_time = time.time()
-        print(f"IR generation completed in {end_time - start_time:.4f} seconds. IR generated:")
-        print(ir)
-
-        # Print the AST for debugging purposes
-        print("AST:")
-        print(ast)
+        # The cache, like modules, holds stack VM code, and without the line
+        # numbers the profiler wants
+        use_cache = not args.no_cache and args.backend == 'stack' and not args.profile
+        cache = CompileCache(args.cache_dir, args.cache_max_bytes, f'O{args.opt_level}') if use_cache else None
+        program = cache.get(source_code) if cache else None
+        if program is not None:
+            print("Compiled program found in cache, skipping compilation.")
+        else:
+            program = pipeline.compile(source_code)
+            if cache:
+                cache.put(source_code, program)
+        if args.output:
+            write_module(args.output, program)
+            print(f"Module written to '{args.output}'.")
 
-        # Step 5: Code Generation
-        print("Starting code generation...")
-        start_time = time.time()
-        code_generator = CodeGenerator()
-        machine_code = code_generator.generate(ir)
-        end_time = time.time()
-        print(f"Code generation completed in {end_time - start_time:.4f} seconds. Machine code generated:")
-        print(machine_code)
-
-        # Step 6: Assembly Generation
-        print("Starting assembly generation...")
-        start_time = time.time()
-        assembly_generator = AssemblyGenerator()
-        assembly_code = assembly_generator.generate(ir)
-        end_time = time.time()
-        print(f"Assembly generation completed in {end_time - start_time:.4f} seconds. Assembly code generated:")
-        print(assembly_code)
-
-        # Step 7: Virtual Machine Execution
         print("Starting virtual machine execution...")
-        start_time = time.time()
-        vm = VM()
-        vm.load(assembly_code)
-        vm.run()
-        end_time = time.time()
-        print(f"Virtual machine execution completed in {end_time - start_time:.4f} seconds.")
-            
+        if args.backend == 'register':
+            vm = RegisterVM(max_call_depth=args.max_call_depth)
+        elif args.profile:
+            vm = ProfilingVM(max_call_depth=args.max_call_depth)
+        else:
+            vm = VM(max_call_depth=args.max_call_depth, jit_threshold=args.jit_threshold)
+        try:
+            pipeline.execute(vm, program)
+        finally:
+            # A failed run's profile shows where it got to
+            report_run(vm, args, pipeline, source_code)
+
 
     # except LexerError as e:
     #     print(f"Lexer error: {e}")
@@ -103,5 +141,32 @@ def main():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def run_batch(args):
+    if not os.path.exists(args.source_file):
+        print(f"Batch source '{args.source_file}' does not exist.")
+        return
+    sources = collect_sources(args.source_file, args.suffix)
+    print(f"Compiling {len(sources)} files into '{args.batch}'...")
+    report = compile_batch(sources, args.batch, args.opt_level, args.jobs)
+    report.write(args.batch)
+    for line in report.summary():
+        print(line)
+    if report.failed:
+        print(f"Diagnostics written to '{os.path.join(args.batch, DIAGNOSTICS_FILE)}'.")
+
+def report_run(vm, args, pipeline, source_code=None):
+    if args.report:
+        pipeline.write_report(args.report)
+        print(f"Stage report written to '{args.report}'.")
+    if args.profile:
+        print("Profile:")
+        for line in vm.profile.report(source_code):
+            print(f"  {line}")
+        if args.profile_output:
+            vm.profile.write_collapsed(args.profile_output)
+            print(f"Collapsed call stacks written to '{args.profile_output}'.")
+    elif args.backend == 'stack' and vm.jit:
+        print(f"JIT: {vm.jit.report()}.")
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,297 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from assembler import Program
+from bytecode import (CodeObject, encode, OPNAMES, CONST_OPS, NAME_OPS, SLOT_OPS, SLOT_PAIR_OPS, GLOBAL_OPS,
+                      JUMP_OPS, CALL_OPS, COUNT_OPS, SLOT_PAIR_SHIFT, SLOT_PAIR_MASK)
+from version import COMPILER_VERSION
+
+# On-disk layout, all sections 4-byte aligned:
+#   header          MAGIC, format version, byte order, section counts and offsets
+#   string table    u32 length + utf-8 bytes per string; names come first
+#   constant pool   u8 tag + 8 byte payload per constant; strings, and ints
+#                   too large for 64 bits as hex digits, are string indexes
+#   code section    i32 opcodes followed by i32 operands
+#   function table  u32 name string index, entry point, parameter count,
+#                   local count and string index of the first local name per
+#                   function; a function's local names are consecutive strings
+MAGIC = b'PYCM'
+FORMAT_VERSION = 4
+MODULE_SUFFIX = '.pcm'
+
+HEADER = struct.Struct('<4sHBx10I')
+CONST_ENTRY = struct.Struct('<Bq')
+FLOAT_ENTRY = struct.Struct('<Bd')
+FUNCTION_ENTRY = struct.Struct('<IIIII')
+STRING_LENGTH = struct.Struct('<I')
+
+CONST_INT = 0
+CONST_FLOAT = 1
+CONST_STRING = 2
+CONST_BIG_INT = 3
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+BYTE_ORDERS = {'little': 0, 'big': 1}
+
+
+class ModuleFormatError(Exception):
+    pass
+
+
+class MappedModule:
+    def __init__(self, path, buffer, code, functions, compiler_version):
+        self.path = path
+        self.buffer = buffer
+        self.code = code
+        self.functions = functions
+        self.compiler_version = compiler_version
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # The code arrays are views into the mapping and must be released first
+        if self.buffer is None:
+            return
+        for view in (self.code.ops, self.code.args):
+            if isinstance(view, memoryview):
+                view.release()
+        self.buffer.close()
+        self.buffer = None
+
+    def __repr__(self):
+        return f'MappedModule(path={self.path!r}, instructions={len(self.code)}, functions={self.functions})'
+
+
+def align(offset):
+    return (offset + 3) & ~3
+
+
+def write_module(path, program):
+    code = encode(program) if isinstance(program, Program) else program
+
+    strings = list(code.names)
+    string_index = {name: i for i, name in enumerate(strings)}
+
+    def intern(value):
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    const_section = bytearray()
+    for value in code.consts:
+        if isinstance(value, str):
+            const_section += CONST_ENTRY.pack(CONST_STRING, intern(value))
+        elif isinstance(value, float):
+            const_section += FLOAT_ENTRY.pack(CONST_FLOAT, value)
+        elif INT64_MIN <= value <= INT64_MAX:
+            const_section += CONST_ENTRY.pack(CONST_INT, value)
+        else:
+            # Hex, as converting to and from decimal is capped at a few
+            # thousand digits and folding can make longer ints
+            const_section += CONST_ENTRY.pack(CONST_BIG_INT, intern(format(value, 'x')))
+
+    function_section = bytearray()
+    for name, entry, parameter_count, local_names in code.functions:
+        name_index = intern(name)
+        # Appended, not interned, to keep them in a run
+        first_local = len(strings)
+        strings.extend(local_names)
+        function_section += FUNCTION_ENTRY.pack(name_index, entry, parameter_count, len(local_names), first_local)
+    version_index = intern(COMPILER_VERSION)
+
+    string_section = bytearray()
+    for value in strings:
+        data = value.encode('utf-8')
+        string_section += STRING_LENGTH.pack(len(data)) + data
+
+    ops = array('i', code.ops)
+    args = array('i', code.args)
+
+    strings_offset = HEADER.size
+    consts_offset = align(strings_offset + len(string_section))
+    code_offset = align(consts_offset + len(const_section))
+    functions_offset = code_offset + 2 * ops.itemsize * len(ops)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, BYTE_ORDERS[sys.byteorder],
+        len(ops), len(code.consts), len(code.names), len(strings), len(code.functions),
+        version_index, strings_offset, consts_offset, code_offset, functions_offset,
+    )
+
+    # Write next to the target and rename, so a reader never maps a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(header)
+            file.write(string_section)
+            file.write(bytes(consts_offset - strings_offset - len(string_section)))
+            file.write(const_section)
+            file.write(bytes(code_offset - consts_offset - len(const_section)))
+            ops.tofile(file)
+            args.tofile(file)
+            file.write(function_section)
+        # mkstemp makes the file private to its owner; give the module the
+        # mode open() would have, as the rename keeps it
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def check_section(path, name, offset, count, size, length):
+    # count entries of size bytes from offset must lie within the file
+    if offset < HEADER.size or offset + count * size > length:
+        raise ModuleFormatError(f"'{path}' is corrupt: the {name} section runs past the end of the file")
+
+
+def check_index(path, what, index, count):
+    if not 0 <= index < count:
+        raise ModuleFormatError(f"'{path}' is corrupt: {what} {index} is out of range")
+
+
+def check_code(path, code):
+    # Every opcode must exist and every operand index what its opcode reads,
+    # so a damaged module fails here rather than partway through a run.
+    # Slots are checked against the frame the instruction runs in.
+    count = len(code.ops)
+    limits = dict.fromkeys(CONST_OPS, len(code.consts))
+    limits.update(dict.fromkeys(NAME_OPS + GLOBAL_OPS, len(code.names)))
+    # A jump may go to the end, which halts
+    limits.update(dict.fromkeys(JUMP_OPS, count + 1))
+    limits.update(dict.fromkeys(CALL_OPS, len(code.functions)))
+    limits.update(dict.fromkeys(COUNT_OPS, count + 1))
+    frame_sizes = {entry: len(local_names) for _, entry, _, local_names in code.functions}
+    frame_size = len(code.names)
+    ops = code.ops
+    args = code.args
+    for pc in range(count):
+        frame_size = frame_sizes.get(pc, frame_size)
+        op = ops[pc]
+        arg = args[pc]
+        if op not in OPNAMES:
+            raise ModuleFormatError(f"'{path}' is corrupt: unknown opcode {op} at {pc}")
+        if op in SLOT_OPS:
+            operands, limit = (arg,), frame_size
+        elif op in SLOT_PAIR_OPS:
+            operands, limit = (arg >> SLOT_PAIR_SHIFT, arg & SLOT_PAIR_MASK), frame_size
+        else:
+            operands, limit = (arg,), limits.get(op)
+        if limit is not None:
+            for operand in operands:
+                check_index(path, f'{OPNAMES[op]} operand at {pc}', operand, limit)
+
+
+def load_module(path):
+    with open(path, 'rb') as file:
+        # Empty files cannot be mapped
+        if file.seek(0, 2) < HEADER.size:
+            raise ModuleFormatError(f"'{path}' is too short to be a module")
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    ops = args = None
+    try:
+        (magic, format_version, byte_order, code_count, const_count, name_count,
+         string_count, function_count, version_index, strings_offset,
+         consts_offset, code_offset, functions_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ModuleFormatError(f"'{path}' is not a PyCompile module")
+        if format_version != FORMAT_VERSION:
+            raise ModuleFormatError(f"'{path}' has format version {format_version}, expected {FORMAT_VERSION}")
+        if byte_order not in BYTE_ORDERS.values():
+            raise ModuleFormatError(f"'{path}' is corrupt: unknown byte order {byte_order}")
+
+        # Nothing in the file is trusted: every section must fit in it and
+        # every index point into the table it indexes
+        length = len(buffer)
+        check_section(path, 'strings', strings_offset, string_count, STRING_LENGTH.size, length)
+        check_section(path, 'constants', consts_offset, const_count, CONST_ENTRY.size, length)
+        check_section(path, 'code', code_offset, 2 * code_count, 4, length)
+        check_section(path, 'functions', functions_offset, function_count, FUNCTION_ENTRY.size, length)
+        check_index(path, 'compiler version string', version_index, string_count)
+        if name_count > string_count:
+            raise ModuleFormatError(f"'{path}' is corrupt: it has more names than strings")
+
+        strings = []
+        offset = strings_offset
+        for _ in range(string_count):
+            check_section(path, 'strings', offset, 1, STRING_LENGTH.size, length)
+            (size,) = STRING_LENGTH.unpack_from(buffer, offset)
+            offset += STRING_LENGTH.size
+            check_section(path, 'strings', offset, size, 1, length)
+            strings.append(str(buffer[offset:offset + size], 'utf-8'))
+            offset += size
+        # Bytecode is only meaningful to the compiler version that wrote it
+        if strings[version_index] != COMPILER_VERSION:
+            raise ModuleFormatError(f"'{path}' was compiled by PyCompile {strings[version_index]}, "
+                                    f"this is {COMPILER_VERSION}; recompile it from source")
+
+        consts = []
+        offset = consts_offset
+        for _ in range(const_count):
+            tag, value = CONST_ENTRY.unpack_from(buffer, offset)
+            if tag == CONST_FLOAT:
+                consts.append(FLOAT_ENTRY.unpack_from(buffer, offset)[1])
+            elif tag in (CONST_STRING, CONST_BIG_INT):
+                check_index(path, 'constant string', value, string_count)
+                consts.append(strings[value] if tag == CONST_STRING else int(strings[value], 16))
+            elif tag == CONST_INT:
+                consts.append(value)
+            else:
+                raise ModuleFormatError(f"'{path}' is corrupt: unknown constant tag {tag}")
+            offset += CONST_ENTRY.size
+
+        functions = []
+        offset = functions_offset
+        for _ in range(function_count):
+            name_index, entry, parameter_count, local_count, first_local = FUNCTION_ENTRY.unpack_from(buffer, offset)
+            check_index(path, 'function name string', name_index, string_count)
+            check_index(path, 'function entry', entry, code_count)
+            if parameter_count > local_count or first_local + local_count > string_count:
+                raise ModuleFormatError(f"'{path}' is corrupt: bad locals for function {strings[name_index]!r}")
+            local_names = strings[first_local:first_local + local_count]
+            functions.append((strings[name_index], entry, parameter_count, local_names))
+            offset += FUNCTION_ENTRY.size
+
+        # The code section is used in place, as typed views over the mapping
+        code_size = code_count * 4
+        if byte_order == BYTE_ORDERS[sys.byteorder]:
+            view = memoryview(buffer)
+            ops = view[code_offset:code_offset + code_size].cast('i')
+            args = view[code_offset + code_size:code_offset + 2 * code_size].cast('i')
+            view.release()
+        else:
+            ops = array('i', buffer[code_offset:code_offset + code_size])
+            args = array('i', buffer[code_offset + code_size:code_offset + 2 * code_size])
+            ops.byteswap()
+            args.byteswap()
+        code = CodeObject(ops, args, consts, strings[:name_count], functions)
+        check_code(path, code)
+    except BaseException as e:
+        # Views into the mapping must go before it can be closed
+        for view in (ops, args):
+            if isinstance(view, memoryview):
+                view.release()
+        buffer.close()
+        if isinstance(e, (ValueError, struct.error, IndexError, UnicodeDecodeError)):
+            raise ModuleFormatError(f"'{path}' is corrupt: {e}") from e
+        raise
+
+    entries = {function[0]: function[1] for function in functions}
+    return MappedModule(path, buffer, code, entries, strings[version_index])
@@ -1,9 +1,179 @@
+# Shared by every leaf node instead of allocating an empty list each
+NO_CHILDREN = ()
+
 class Node:
-    def __init__(self, type, value=None, children=None):
+    __slots__ = ('type', 'value', 'children', 'lineno', 'lexpos')
+    repr_name = 'Node'
+
+    def __init__(self, type, value=None, children=None, lineno=None, lexpos=None):
         self.type = type
         self.value = value
-        self.children = children if children is not None else []
-
+        self.children = children if children is not None else NO_CHILDREN
+        self.lineno = lineno
+        self.lexpos = lexpos
 
     def __repr__(self):
-        return f"Node(type={self.type}, value={self.value}, children={self.children})"
\ No newline at end of file
+        return format_node(self)
+
+
+def format_node(node):
+    # Same text as a recursive repr, built from an explicit stack so deeply
+    # nested trees can be printed. Strings on the stack are finished output.
+    parts = []
+    pending = [node]
+    while pending:
+        item = pending.pop()
+        if type(item) is str:
+            parts.append(item)
+        elif isinstance(item, Node):
+            parts.append(f'{item.repr_name}(type={item.type}, value={item.value}, children=')
+            pending.append(')')
+            pending.append(item.children)
+        else:
+            # A children list or tuple
+            open_bracket, close_bracket = ('[', ']') if isinstance(item, list) else ('(', ')')
+            if isinstance(item, tuple) and len(item) == 1:
+                close_bracket = ',)'
+            parts.append(open_bracket)
+            pending.append(close_bracket)
+            for i in range(len(item) - 1, -1, -1):
+                child = item[i]
+                pending.append(child if isinstance(child, (Node, list, tuple)) else repr(child))
+                if i:
+                    pending.append(', ')
+    return ''.join(parts)
+
+
+class Program(Node):
+    __slots__ = ()
+
+    def __init__(self, statements, lineno=None, lexpos=None):
+        super().__init__('program', None, statements, lineno, lexpos)
+
+
+class Block(Node):
+    __slots__ = ()
+
+    def __init__(self, statements, lineno=None, lexpos=None):
+        super().__init__('block', None, statements, lineno, lexpos)
+
+
+class Assignment(Node):
+    __slots__ = ()
+
+    def __init__(self, name, expression, lineno=None, lexpos=None):
+        super().__init__('assignment', name, [expression], lineno, lexpos)
+
+
+class Print(Node):
+    __slots__ = ()
+
+    def __init__(self, expression, lineno=None, lexpos=None):
+        super().__init__('print', None, [expression], lineno, lexpos)
+
+
+class Tuple(Node):
+    __slots__ = ()
+
+    def __init__(self, elements, lineno=None, lexpos=None):
+        super().__init__('tuple', None, elements, lineno, lexpos)
+
+
+class If(Node):
+    __slots__ = ()
+
+    # else_body is None when there is no else branch
+    def __init__(self, condition, then_body, else_body=None, lineno=None, lexpos=None):
+        super().__init__('if', None, [condition, then_body, else_body], lineno, lexpos)
+
+
+class While(Node):
+    __slots__ = ()
+
+    def __init__(self, condition, body, lineno=None, lexpos=None):
+        super().__init__('while', None, [condition, body], lineno, lexpos)
+
+
+class ParameterList(Node):
+    __slots__ = ()
+
+    def __init__(self, parameters, lineno=None, lexpos=None):
+        super().__init__('parameter_list', None, parameters, lineno, lexpos)
+
+
+class Parameter(Node):
+    __slots__ = ()
+
+    def __init__(self, name, lineno=None, lexpos=None):
+        super().__init__('parameter', name, None, lineno, lexpos)
+
+
+class FunctionDef(Node):
+    __slots__ = ()
+
+    def __init__(self, name, parameters, body, lineno=None, lexpos=None):
+        super().__init__('function_def', name, [parameters, body], lineno, lexpos)
+
+
+class FunctionCall(Node):
+    __slots__ = ()
+
+    def __init__(self, name, arguments, lineno=None, lexpos=None):
+        super().__init__('function_call', name, arguments, lineno, lexpos)
+
+
+class Return(Node):
+    __slots__ = ()
+
+    def __init__(self, expression, lineno=None, lexpos=None):
+        super().__init__('return', None, [expression], lineno, lexpos)
+
+
+# An expression evaluated for its effect, such as a call; its value is dropped
+class ExpressionStatement(Node):
+    __slots__ = ()
+
+    def __init__(self, expression, lineno=None, lexpos=None):
+        super().__init__('expression_statement', None, [expression], lineno, lexpos)
+
+
+class BinaryExpression(Node):
+    __slots__ = ()
+
+    def __init__(self, op, left, right, lineno=None, lexpos=None):
+        super().__init__('binary_expression', op, [left, right], lineno, lexpos)
+
+
+class Comparison(Node):
+    __slots__ = ()
+
+    def __init__(self, op, left, right, lineno=None, lexpos=None):
+        super().__init__('comparison', op, [left, right], lineno, lexpos)
+
+
+class UnaryExpression(Node):
+    __slots__ = ()
+
+    def __init__(self, op, operand, lineno=None, lexpos=None):
+        super().__init__('unary_expression', op, [operand], lineno, lexpos)
+
+
+class Number(Node):
+    __slots__ = ()
+
+    def __init__(self, value, lineno=None, lexpos=None):
+        super().__init__('number', value, None, lineno, lexpos)
+
+
+class String(Node):
+    __slots__ = ()
+
+    def __init__(self, value, lineno=None, lexpos=None):
+        super().__init__('string', value, None, lineno, lexpos)
+
+
+class Identifier(Node):
+    __slots__ = ()
+
+    def __init__(self, name, lineno=None, lexpos=None):
+        super().__init__('identifier', name, None, lineno, lexpos)
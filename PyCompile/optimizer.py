@@ -0,0 +1,637 @@
+import operator
+import sys
+
+from ir_generator import IRNode
+from tree import assigned_names, walk
+from visitor import Visitor
+
+# Optimization levels, as chosen with main.py -O:
+#   0  none, IR goes to the back ends as generated
+#   1  constant folding, algebraic simplification and constant propagation,
+#      and tail calls over the control flow graph
+#   2  as 1, with small leaf functions inlined first, then loop-invariant
+#      code motion
+DEFAULT_OPT_LEVEL = 2
+MAX_OPT_LEVEL = 2
+
+BINARY_FOLDS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+# Comparisons produce 0 or 1, as the VM's CMP_* instructions do
+COMPARISON_FOLDS = {
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+}
+
+
+def optimize(ir, opt_level=DEFAULT_OPT_LEVEL):
+    # Inlining comes first so folding can simplify the inlined bodies
+    if opt_level >= 2:
+        ir = Inliner().inline(ir)
+    if opt_level >= 1:
+        ir = ConstantFolder().fold(ir)
+    return ir
+
+
+def is_constant(node):
+    return node is not None and node.type == 'number'
+
+
+def fits_as_text(value):
+    # Constants reach the back ends as instruction text, and Python refuses
+    # to write ints past a few thousand digits as text. Three bits per digit
+    # undercounts the digits, so this errs on the side of not folding.
+    limit = getattr(sys, 'get_int_max_str_digits', lambda: 0)()
+    return type(value) is not int or not limit or value.bit_length() <= 3 * limit
+
+
+def is_int(node, value):
+    return is_constant(node) and type(node.value) is int and node.value == value
+
+
+def integer_names(roots, parameters=()):
+    # Names that only ever hold ints, whatever path runs: every assignment to
+    # them under roots is integer arithmetic over int literals and other such
+    # names. Anything touched by '/', a call or a parameter is left out.
+    assignments = {}
+    excluded = set(parameters)
+    for node in (node for root in roots for node in walk(root)):
+        if node.type == 'assignment':
+            assignments.setdefault(node.value, []).append(node.children[0])
+        elif node.type == 'parameter':
+            excluded.add(node.value)
+
+    depends = {}
+    for name, expressions in assignments.items():
+        uses = set()
+        for expression in expressions:
+            for child in walk(expression):
+                if child.type == 'identifier':
+                    uses.add(child.value)
+                elif child.type == 'number':
+                    if not isinstance(child.value, int):
+                        excluded.add(name)
+                elif child.type == 'binary_expression':
+                    if child.value == '/':
+                        excluded.add(name)
+                elif child.type not in ('unary_expression', 'comparison'):
+                    excluded.add(name)
+        depends[name] = uses
+
+    # Drop names fed by excluded ones until nothing changes
+    integers = set(assignments) - excluded
+    changed = True
+    while changed:
+        changed = False
+        for name in list(integers):
+            if not depends[name] <= integers:
+                integers.discard(name)
+                changed = True
+    return integers
+
+
+class ConstantFolder(Visitor):
+    def __init__(self):
+        super().__init__()
+        # Names whose value is known at this point of the walk
+        self.constants = {}
+        # Names assigned on every path to this point of the walk
+        self.assigned = set()
+        self.integers = set()
+
+    def fold(self, ir):
+        self.constants = {}
+        self.assigned = set()
+        self.integers = integer_names([ir])
+        return self.visit(ir)
+
+    def number(self, value, node):
+        return IRNode('number', value, None, node.lineno)
+
+    # Statements are walked in order, so self.constants always describes
+    # the program point being visited.
+    def visit_program(self, node):
+        statements = yield from self.collect(node.children)
+        return IRNode('program', None, statements, node.lineno)
+
+    def visit_block(self, node):
+        statements = yield from self.collect(node.children)
+        return IRNode('block', None, statements, node.lineno)
+
+    def visit_assignment(self, node, expression):
+        if is_constant(expression):
+            self.constants[node.value] = expression.value
+        else:
+            self.constants.pop(node.value, None)
+        self.assigned.add(node.value)
+        return IRNode('assignment', node.value, [expression], node.lineno)
+
+    def visit_if(self, node):
+        condition_node, then_node, else_node = node.children
+        condition = yield condition_node
+        if is_constant(condition):
+            # Only one branch can run, and it runs straight-line
+            if condition.value:
+                return (yield then_node)
+            if else_node is not None:
+                return (yield else_node)
+            return IRNode('block', None, [], node.lineno)
+
+        before = self.constants
+        assigned = self.assigned
+        self.constants = dict(before)
+        self.assigned = set(assigned)
+        then_ir = yield then_node
+        after_then = self.constants, self.assigned
+        self.constants = dict(before)
+        self.assigned = set(assigned)
+        else_ir = (yield else_node) if else_node is not None else None
+        # Keep what both branches agree on
+        self.constants = {name: value for name, value in self.constants.items()
+                          if name in after_then[0] and after_then[0][name] == value}
+        self.assigned &= after_then[1]
+        return IRNode('if', None, [condition, then_ir, else_ir], node.lineno)
+
+    def visit_while(self, node):
+        condition_node, body_node = node.children
+        # Anything the body assigns differs between iterations
+        names = assigned_names(node)
+        self.forget(names)
+        condition = yield condition_node
+        if is_constant(condition) and not condition.value:
+            return IRNode('block', None, [], node.lineno)
+        # The body may not run at all
+        assigned = set(self.assigned)
+        body = yield body_node
+        self.forget(names)
+        self.assigned = assigned
+        return IRNode('while', None, [condition, body], node.lineno)
+
+    def forget(self, names):
+        for name in names:
+            self.constants.pop(name, None)
+
+    def visit_function_def(self, node):
+        # The body runs whenever the function is called, when nothing about
+        # the caller's variables is known
+        outer = self.constants, self.assigned
+        self.constants = {}
+        self.assigned = {parameter.value for parameter in node.children[0].children}
+        parameters = yield node.children[0]
+        body = yield node.children[1]
+        self.constants, self.assigned = outer
+        return IRNode('function_def', node.value, [parameters, body], node.lineno)
+
+    def visit_parameter_list(self, node, *parameters):
+        return IRNode('parameter_list', None, list(parameters), node.lineno)
+
+    def visit_parameter(self, node):
+        return node
+
+    def visit_function_call(self, node, *arguments):
+        # The callee runs in its own frame, so the caller's constants hold
+        return IRNode('function_call', node.value, list(arguments), node.lineno)
+
+    def visit_return(self, node, value):
+        return IRNode('return', None, [value], node.lineno)
+
+    def visit_expression_statement(self, node, expression):
+        return IRNode('expression_statement', None, [expression], node.lineno)
+
+    def visit_sequence(self, node, *parts):
+        # An inlined call. Temporaries set to a constant that nothing reads
+        # any more, as every read was folded, need not be stored at all.
+        parts = list(parts)
+        read = {child.value for part in parts for child in walk(part) if child.type == 'identifier'}
+        statements = [part for part in parts[:-1]
+                      if not (part.type == 'assignment' and part.value.startswith(INLINE_PREFIX)
+                              and is_constant(part.children[0]) and part.value not in read)]
+        if not statements:
+            return parts[-1]
+        return IRNode('sequence', None, statements + parts[-1:], node.lineno)
+
+    def visit_print(self, node, expression):
+        return IRNode('print', None, [expression], node.lineno)
+
+    def visit_tuple(self, node, *elements):
+        return IRNode('tuple', None, list(elements), node.lineno)
+
+    def visit_string(self, node):
+        return node
+
+    def visit_number(self, node):
+        return node
+
+    def visit_identifier(self, node):
+        if node.value in self.constants:
+            return self.number(self.constants[node.value], node)
+        return node
+
+    def visit_unary_expression(self, node, operand):
+        if node.value == '-' and is_constant(operand):
+            # The back ends compute 0 - x, which differs from -x for 0.0
+            return self.number(0 - operand.value, node)
+        return IRNode('unary_expression', node.value, [operand], node.lineno)
+
+    def visit_binary_expression(self, node, left, right):
+        op = node.value
+        if is_constant(left) and is_constant(right) and op in BINARY_FOLDS:
+            # Division by zero, and results too large for a float, are left
+            # for the VM to report if the code ever runs
+            try:
+                value = BINARY_FOLDS[op](left.value, right.value)
+            except ArithmeticError:
+                value = None
+            if value is not None and fits_as_text(value):
+                return self.number(value, node)
+
+        # Identities, with int constants only: a float 0 or 1 would turn an
+        # int operand into a float
+        if op == '+':
+            # A float x is left alone, since -0.0 + 0 is 0.0
+            if is_int(right, 0) and self.is_integer_name(left):
+                return left
+            if is_int(left, 0) and self.is_integer_name(right):
+                return right
+        elif op == '-':
+            if is_int(right, 0):
+                return left
+        elif op == '*':
+            if is_int(right, 1):
+                return left
+            if is_int(left, 1):
+                return right
+            # x * 0 is 0 only for an int x; a float x gives 0.0. Folding
+            # drops the read of x, so x must also be assigned by now, or the
+            # error reading it would be lost.
+            if is_int(right, 0) and self.is_assigned_integer(left):
+                return self.number(0, node)
+            if is_int(left, 0) and self.is_assigned_integer(right):
+                return self.number(0, node)
+        return IRNode('binary_expression', op, [left, right], node.lineno)
+
+    def is_integer_name(self, node):
+        return node.type == 'identifier' and node.value in self.integers
+
+    def is_assigned_integer(self, node):
+        return self.is_integer_name(node) and node.value in self.assigned
+
+    def visit_comparison(self, node, left, right):
+        if is_constant(left) and is_constant(right) and node.value in COMPARISON_FOLDS:
+            return self.number(int(COMPARISON_FOLDS[node.value](left.value, right.value)), node)
+        return IRNode('comparison', node.value, [left, right], node.lineno)
+
+
+# Largest function body, in IR nodes, that is inlined at its call sites
+INLINE_SIZE_LIMIT = 24
+# Temporaries holding an inlined call's arguments and locals
+INLINE_PREFIX = '$inl'
+# Statements an inlined body may run before its return
+INLINE_STATEMENTS = ('assignment', 'print')
+
+
+class Inliner:
+    # Replaces calls to small leaf functions, straight-line bodies that call
+    # nothing, with a 'sequence' expression holding the body: the arguments
+    # are assigned to temporaries in order, the body's statements run with
+    # its names renamed to temporaries, and the returned value comes last.
+    # That is the order the call runs in, so output and errors are the same.
+    # The function itself stays, for any call left alone.
+    def __init__(self, size_limit=INLINE_SIZE_LIMIT):
+        self.size_limit = size_limit
+        self.inlined = 0
+        # Function name -> (parameters, statements, result, local names,
+        # names read from globals) for each function that can be inlined
+        self.bodies = {}
+        # id of a function_def -> the same with its body rewritten
+        self.functions = {}
+
+    def inline(self, ir):
+        functions = [node for node in walk(ir) if node.type == 'function_def']
+        self.functions = {id(function): function for function in functions}
+        self.bodies = {}
+        # A function calling only inlinable ones becomes a leaf once they are
+        # inlined into it, so go round until no more functions qualify
+        while True:
+            bodies = {}
+            for function in self.functions.values():
+                body = self.inlinable(function)
+                if body is not None:
+                    bodies[function.value] = body
+            if bodies.keys() == self.bodies.keys():
+                break
+            self.bodies = bodies
+            for key, function in self.functions.items():
+                parameters, body = function.children
+                names = {parameter.value for parameter in parameters.children} | assigned_names(body)
+                self.functions[key] = IRNode('function_def', function.value,
+                                             [parameters, self.rewrite(body, names)], function.lineno)
+        if not self.bodies:
+            return ir
+        return self.rewrite(ir, None)
+
+    def inlinable(self, function):
+        # The parts of function's body to inline, or None if it is too big
+        # or does anything but straight-line work
+        parameters = [parameter.value for parameter in function.children[0].children]
+        statements = []
+        result = None
+        for statement in function.children[1].children:
+            if statement.type == 'return':
+                result = statement.children[0]
+                break
+            if statement.type not in INLINE_STATEMENTS:
+                return None
+            statements.append(statement)
+        if result is None:
+            # Falling off the end returns 0
+            result = IRNode('number', 0, None, function.lineno)
+
+        names = set(parameters)
+        for statement in statements + [result]:
+            names |= assigned_names(statement)
+        assigned = set(parameters)
+        free = set()
+        size = 0
+        for statement in statements + [result]:
+            for node in walk(statement):
+                size += 1
+                if node.type == 'function_call':
+                    return None
+                if node.type == 'identifier':
+                    if node.value not in names:
+                        free.add(node.value)
+                    elif node.value not in assigned and not node.value.startswith(INLINE_PREFIX):
+                        # Read before it is assigned: the error would name
+                        # the temporary instead. Temporaries from calls
+                        # inlined here are always assigned first.
+                        return None
+            if statement.type == 'assignment':
+                assigned.add(statement.value)
+        if size > self.size_limit:
+            return None
+        return parameters, statements, result, names, free
+
+    def rewrite(self, root, names):
+        # root with the calls in it inlined; names are the locals of the
+        # function root belongs to, None for the program's own code
+        order = []
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node is not None:
+                order.append(node)
+                # Function bodies are rewritten on their own, with their locals
+                if node.type != 'function_def':
+                    pending.extend(node.children)
+        order.reverse()
+
+        replaced = {}
+        for node in order:
+            if node.type == 'function_def':
+                replaced[id(node)] = self.functions[id(node)]
+                continue
+            new = node
+            if node.children:
+                children = [None if child is None else replaced.get(id(child), child) for child in node.children]
+                if any(child is not old for child, old in zip(children, node.children)):
+                    new = IRNode(node.type, node.value, children, node.lineno)
+            if node.type == 'function_call' and node.value in self.bodies:
+                # A global the body reads must not be shadowed by a caller's local
+                if names is None or not self.bodies[node.value][4] & names:
+                    new = self.expand(new)
+            if new is not node:
+                replaced[id(node)] = new
+        return replaced.get(id(root), root)
+
+    def expand(self, call):
+        parameters, statements, result, names, free = self.bodies[call.value]
+        self.inlined += 1
+        renames = {name: f'{INLINE_PREFIX}{self.inlined}_{name}' for name in names}
+        parts = [IRNode('assignment', renames[parameter], [argument], call.lineno)
+                 for parameter, argument in zip(parameters, call.children)]
+        parts.extend(self.renamed(statement, renames) for statement in statements)
+        parts.append(self.renamed(result, renames))
+        if len(parts) == 1:
+            return parts[0]
+        return IRNode('sequence', None, parts, call.lineno)
+
+    def renamed(self, root, renames):
+        # A fresh copy of root, with the names in renames replaced
+        copies = {}
+        for node in postorder(root):
+            value = node.value
+            if node.type in ('identifier', 'assignment'):
+                value = renames.get(value, value)
+            children = [None if child is None else copies[id(child)] for child in node.children]
+            copies[id(node)] = IRNode(node.type, value, children or None, node.lineno)
+        return copies[id(root)]
+
+
+# Expressions that can be computed ahead of time, as long as their operands
+# can. Leaves are not worth a temporary.
+HOISTABLE_TYPES = ('binary_expression', 'comparison', 'unary_expression')
+# Temporaries holding hoisted values; '$' cannot start a source identifier
+TEMPORARY_PREFIX = '$inv'
+
+
+def postorder(node):
+    # Every node under node, children before their parents, without recursion
+    order = list(walk(node))
+    order.reverse()
+    return order
+
+
+def expression_key(node):
+    # Equal keys mean the same computation; repr keeps 1 and 1.0 apart
+    keys = {}
+    for child in postorder(node):
+        keys[id(child)] = (child.type, repr(child.value),
+                           tuple(keys[id(grandchild)] for grandchild in child.children if grandchild is not None))
+    return keys[id(node)]
+
+
+class LoopInvariantCodeMotion:
+    # Computes expressions whose operands cannot change inside a loop once,
+    # in a preheader, into temporaries the loop then loads instead.
+    def __init__(self):
+        self.hoisted = 0
+        self.loops = 0
+        self.temporary_count = 0
+        self.integers = set()
+
+    def optimize(self, cfg):
+        # The program and each function body are separate graphs
+        graphs = [cfg] + list(cfg.functions.values())
+        roots = []
+        for graph in graphs:
+            for block in graph.blocks:
+                roots.extend(block.statements)
+                if block.terminator[0] in ('branch', 'return'):
+                    roots.append(block.terminator[1])
+        self.integers = integer_names(roots, [name for graph in graphs for name in graph.parameters])
+        for graph in graphs:
+            self.optimize_graph(graph)
+        return cfg
+
+    def optimize_graph(self, cfg):
+        # Outer loops first, so an expression leaves every loop it can. The
+        # loops and reaching definitions are found once, and the preheaders
+        # inserted after the last loop: a preheader only joins the loops
+        # around its own, all handled before it, and assigns nothing but
+        # temporaries, which are only read in its loop.
+        loops = cfg.loops()
+        if not loops:
+            return
+        definitions, self.masks, self.reach_in = cfg.reaching_definitions()
+        self.layout = {block: i for i, block in enumerate(cfg.blocks)}
+        self.bits = {}
+        self.block_bits = {}
+        # The definitions standing for no assignment at all
+        self.undefined = 0
+        for i, (name, block, index) in enumerate(definitions):
+            self.bits[block, index] = 1 << i
+            if block is None:
+                self.undefined |= 1 << i
+            else:
+                self.block_bits[block] = self.block_bits.get(block, 0) | 1 << i
+        self.preheader_names = set()
+
+        # (loop, statements of its preheader) for each loop hoisted from
+        self.entered = []
+        for loop in loops:
+            self.hoist(loop)
+        if self.entered:
+            preheaders = cfg.insert_preheaders([loop for loop, _ in self.entered])
+            for preheader, (_, statements) in zip(preheaders, self.entered):
+                preheader.statements = statements
+
+    def hoist(self, loop):
+        # Calls can stay in the loop: a callee cannot assign the caller's
+        # variables, and a call is never hoisted itself
+        blocks = sorted(loop.blocks, key=self.layout.__getitem__)
+        masks = self.masks
+        bits = self.bits
+        # Definitions that make a name vary within the loop: those inside it,
+        # and none at all, as the value would not exist before the loop
+        varying = self.undefined
+        for block in blocks:
+            varying |= self.block_bits.get(block, 0)
+
+        self.temporaries = {}
+        self.preheader_statements = []
+        for block in blocks:
+            reach = self.reach_in[block]
+            statements = []
+            for index, statement in enumerate(block.statements):
+                statements.append(self.rewrite(statement, reach, masks, varying))
+                if statement.type == 'assignment':
+                    reach = (reach & ~masks[statement.value]) | bits[block, index]
+            block.statements = statements
+            if block.terminator[0] == 'branch':
+                condition = self.rewrite(block.terminator[1], reach, masks, varying)
+                block.terminator = ('branch', condition) + block.terminator[2:]
+
+        if self.preheader_statements:
+            self.entered.append((loop, self.preheader_statements))
+            self.hoisted += len(self.preheader_statements)
+            self.loops += 1
+
+    def rewrite(self, root, reach, masks, varying):
+        # root with each largest invariant expression in it replaced by a
+        # temporary; reach is the set of definitions reaching root
+        order = postorder(root)
+        invariant = {}
+        # Hoisted code runs even when the loop body would not, so it must not
+        # be able to fail. Only int arithmetic is hoisted: ints cannot
+        # overflow, while a float, or an int too large for one, can raise
+        # OverflowError, and strings raise TypeError. '/' makes a float.
+        for node in order:
+            node_type = node.type
+            if node_type == 'number':
+                result = type(node.value) is int
+            elif node_type == 'identifier':
+                if node.value in self.preheader_names:
+                    # Assigned in the preheader of a loop around this one
+                    result = True
+                else:
+                    mask = masks.get(node.value, 0)
+                    result = mask != 0 and not reach & mask & varying and node.value in self.integers
+            elif node_type in HOISTABLE_TYPES:
+                result = node.value != '/' and all(invariant[id(child)] for child in node.children)
+            else:
+                result = False
+            invariant[id(node)] = result
+
+        replaced = {}
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node is None:
+                continue
+            if invariant[id(node)] and node.type in HOISTABLE_TYPES:
+                replaced[id(node)] = IRNode('identifier', self.temporary(node), None, node.lineno)
+            else:
+                pending.extend(node.children)
+        if not replaced:
+            return root
+
+        # Rebuild the nodes above each replacement
+        for node in order:
+            if id(node) in replaced or not node.children:
+                continue
+            children = [None if child is None else replaced.get(id(child), child) for child in node.children]
+            if any(new is not old for new, old in zip(children, node.children)):
+                replaced[id(node)] = IRNode(node.type, node.value, children, node.lineno)
+        return replaced.get(id(root), root)
+
+    def temporary(self, node):
+        key = expression_key(node)
+        name = self.temporaries.get(key)
+        if name is None:
+            name = self.temporaries[key] = f'{TEMPORARY_PREFIX}{self.temporary_count}'
+            self.temporary_count += 1
+            self.integers.add(name)
+            self.preheader_names.add(name)
+            self.preheader_statements.append(IRNode('assignment', name, [node], node.lineno))
+        return name
+
+
+class TailCallEliminator:
+    # Makes each `return f(...)` in a function body a tail call, which runs
+    # the callee in the caller's frame instead of a new one: recursion
+    # through tail calls runs in constant space and allocates no frames.
+    def __init__(self):
+        # Function name -> (callee, line, whether it is a tail call) per call
+        # in its body, in layout order
+        self.calls = {}
+        self.eliminated = 0
+
+    def optimize(self, cfg):
+        for graph in cfg.functions.values():
+            calls = self.calls[graph.name] = []
+            for block in graph.blocks:
+                terminator = block.terminator
+                tail = None
+                if terminator[0] == 'return' and terminator[1].type == 'function_call':
+                    tail = terminator[1]
+                    block.terminator = ('tail_call', tail)
+                    self.eliminated += 1
+                roots = list(block.statements)
+                if terminator[0] in ('branch', 'return'):
+                    roots.append(terminator[1])
+                for root in roots:
+                    for node in postorder(root):
+                        if node.type == 'function_call':
+                            calls.append((node.value, node.lineno, node is tail))
+        return cfg
+
+    def report(self):
+        # Function name -> what became of the calls in its body
+        report = {}
+        for name, calls in self.calls.items():
+            tail_calls = [f'{callee} at line {line}' for callee, line, tail in calls if tail]
+            if tail_calls:
+                report[name] = f'{len(tail_calls)} of {len(calls)} calls are tail calls ({", ".join(tail_calls)})'
+            else:
+                report[name] = f'none of {len(calls)} calls are tail calls'
+        return report
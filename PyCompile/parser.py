@@ -1,12 +1,11 @@
 import ply.yacc as yacc
-from lexer import Lexer
-from node import Node
+from grammar_tables import load_table, parsetab_name
+from lexer import Lexer, get_lexer, mapped_chunks
+from node import (Program, Block, Assignment, Print, Tuple, String, If, While, FunctionDef, ParameterList,
+                  Parameter, FunctionCall, Return, ExpressionStatement, BinaryExpression, Comparison,
+                  UnaryExpression, Number, Identifier)
 
-class IfElseNode(Node):
-    def __init__(self, condition, then_body, else_body):
-        self.condition = condition
-        self.then_body = then_body
-        self.else_body = else_body
+COMPARISON_OPS = ('<', '<=', '>', '>=', '==', '!=')
 
 class Parser:
     tokens = Lexer.tokens
@@ -19,20 +18,29 @@ class Parser:
         ('right', 'UMINUS'),  # Unary minus operator
     )
 
-    def __init__(self):
-        self.lexer = Lexer()
-        self.lexer.build()
-        self.parser = yacc.yacc(module=self, debug=True, errorlog=yacc.NullLogger())
+    def __init__(self, lexer=None):
+        if lexer is None:
+            lexer = Lexer()
+            lexer.build()
+        self.lexer = lexer
+        # Load the prebuilt LR tables; if they are missing or stale, PLY
+        # regenerates them in memory without writing anything to disk
+        parsetab = load_table(parsetab_name(type(self)))
+        self.parser = yacc.yacc(module=self, debug=False, write_tables=False,
+                                tabmodule=parsetab or parsetab_name(type(self)),
+                                errorlog=yacc.NullLogger())
 
     def p_program(self, p):
         '''program : statement_list'''
-        p[0] = ('program', p[1])
+        p[0] = Program(p[1], lineno=1, lexpos=0)
 
     def p_statement_list(self, p):
         '''statement_list : statement_list statement
                           | statement'''
+        # Append in place; copying the list at every statement is quadratic
         if len(p) == 3:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
         else:
             p[0] = [p[1]]
 
@@ -42,53 +50,90 @@ class Parser:
                      | if_statement
                      | while_statement
                      | function_definition
+                     | return_statement
+                     | call_statement
                      | tuple_statement
                      | string_statement'''
         p[0] = p[1]
 
     def p_assignment_statement(self, p):
         '''assignment_statement : IDENTIFIER ASSIGN expression'''
-        p[0] = ('assign', p[1], p[3])
+        p[0] = Assignment(p[1], p[3], p.lineno(1), p.lexpos(1))
 
     def p_print_statement(self, p):
         '''print_statement : PRINT LPAREN expression RPAREN'''
-        p[0] = ('print', p[3])
+        p[0] = Print(p[3], p.lineno(1), p.lexpos(1))
+
+    def p_return_statement(self, p):
+        '''return_statement : RETURN expression'''
+        p[0] = Return(p[2], p.lineno(1), p.lexpos(1))
+
+    def p_call_statement(self, p):
+        '''call_statement : call'''
+        p[0] = ExpressionStatement(p[1], p[1].lineno, p[1].lexpos)
 
     def p_tuple_statement(self, p):
         '''tuple_statement : LPAREN expression_list RPAREN'''
-        p[0] = ('tuple', p[2])
+        p[0] = Tuple(p[2], p.lineno(1), p.lexpos(1))
 
     def p_string_statement(self, p):
         '''string_statement : STRING'''
-        p[0] = ('string', p[1])
+        p[0] = String(p[1], p.lineno(1), p.lexpos(1))
 
     def p_expression_list(self, p):
         '''expression_list : expression_list COMMA expression
                            | expression'''
         if len(p) == 4:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
         else:
             p[0] = [p[1]]
 
+    # A body runs to the end of the input after a colon, or up to the matching
+    # brace in braces
+    def p_suite(self, p):
+        '''suite : COLON statement_list
+                 | LBRACE statement_list RBRACE
+                 | COLON LBRACE statement_list RBRACE'''
+        statements = p[2] if len(p) != 5 else p[3]
+        p[0] = Block(statements, p.lineno(1), p.lexpos(1))
+
     def p_if_statement(self, p):
-        '''if_statement : IF expression COLON statement_list else_statement
-                        | IF expression COLON statement_list'''
-        if len(p) == 6:
-            p[0] = ('if_else', p[2], p[4], p[5])
-        else:
-            p[0] = ('if', p[2], p[4])
+        '''if_statement : IF expression suite else_statement
+                        | IF expression suite'''
+        else_body = p[4] if len(p) == 5 else None
+        p[0] = If(p[2], p[3], else_body, p.lineno(1), p.lexpos(1))
 
     def p_else_statement(self, p):
-        '''else_statement : ELSE COLON statement_list'''
-        p[0] = ('else', p[3])
+        '''else_statement : ELSE suite'''
+        p[0] = p[2]
 
     def p_while_statement(self, p):
-        '''while_statement : WHILE expression COLON statement_list'''
-        p[0] = ('while', p[2], p[4])
+        '''while_statement : WHILE expression suite'''
+        p[0] = While(p[2], p[3], p.lineno(1), p.lexpos(1))
 
     def p_function_definition(self, p):
-        '''function_definition : DEF IDENTIFIER LPAREN RPAREN COLON statement_list'''
-        p[0] = ('function', p[2], p[6])
+        '''function_definition : DEF CALL_NAME LPAREN parameter_list RPAREN suite
+                               | DEF CALL_NAME LPAREN RPAREN suite'''
+        if len(p) == 7:
+            p[0] = FunctionDef(p[2], ParameterList(p[4], p.lineno(3), p.lexpos(3)), p[6], p.lineno(1), p.lexpos(1))
+        else:
+            p[0] = FunctionDef(p[2], ParameterList([], p.lineno(3), p.lexpos(3)), p[5], p.lineno(1), p.lexpos(1))
+
+    def p_parameter_list(self, p):
+        '''parameter_list : parameter_list COMMA IDENTIFIER
+                          | IDENTIFIER'''
+        if len(p) == 4:
+            p[1].append(Parameter(p[3], p.lineno(3), p.lexpos(3)))
+            p[0] = p[1]
+        else:
+            p[0] = [Parameter(p[1], p.lineno(1), p.lexpos(1))]
+
+    def p_call(self, p):
+        '''call : CALL_NAME LPAREN expression_list RPAREN
+                | CALL_NAME LPAREN RPAREN'''
+        arguments = p[3] if len(p) == 5 else []
+        p[0] = FunctionCall(p[1], arguments, p.lineno(1), p.lexpos(1))
 
     def p_expression(self, p):
         '''expression : term
@@ -102,8 +147,10 @@ class Parser:
                       | expression NE term'''
         if len(p) == 2:
             p[0] = p[1]
+        elif p[2] in COMPARISON_OPS:
+            p[0] = Comparison(p[2], p[1], p[3], p.lineno(2), p.lexpos(2))
         else:
-            p[0] = (p[2], p[1], p[3])
+            p[0] = BinaryExpression(p[2], p[1], p[3], p.lineno(2), p.lexpos(2))
 
     def p_term(self, p):
         '''term : factor
@@ -112,19 +159,25 @@ class Parser:
         if len(p) == 2:
             p[0] = p[1]
         else:
-            p[0] = (p[2], p[1], p[3])
+            p[0] = BinaryExpression(p[2], p[1], p[3], p.lineno(2), p.lexpos(2))
 
     def p_factor(self, p):
         '''factor : NUMBER
                   | IDENTIFIER
+                  | call
                   | LPAREN expression RPAREN
                   | MINUS factor %prec UMINUS'''
         if len(p) == 2:
-            p[0] = p[1]
+            if p.slice[1].type == 'NUMBER':
+                p[0] = Number(p[1], p.lineno(1), p.lexpos(1))
+            elif p.slice[1].type == 'call':
+                p[0] = p[1]
+            else:
+                p[0] = Identifier(p[1], p.lineno(1), p.lexpos(1))
         elif len(p) == 4:
             p[0] = p[2]
         else:
-            p[0] = ('uminus', p[2])
+            p[0] = UnaryExpression('-', p[2], p.lineno(1), p.lexpos(1))
 
     def p_error(self, p):
         if p:
@@ -132,8 +185,26 @@ class Parser:
         else:
             print("Syntax error at EOF")
 
-    def parse(self, code):
-        return self.parser.parse(code)
+    def parse(self, code, tap=None):
+        return self.parse_tokens(self.lexer.stream(code, tap))
+
+    # Parse from a TokenStream, so the source is lexed exactly once
+    def parse_tokens(self, stream):
+        return self.parser.parse(lexer=self.lexer.lexer, tokenfunc=stream.token)
+
+    # Parse a file on disk with bounded memory, lexing it chunk by chunk
+    def parse_file(self, path, tap=None):
+        return self.parse_tokens(self.lexer.stream_chunks(mapped_chunks(path), tap))
+
+
+_shared_parser = None
+
+# Process-wide parser sharing the process-wide lexer
+def get_parser():
+    global _shared_parser
+    if _shared_parser is None:
+        _shared_parser = Parser(get_lexer())
+    return _shared_parser
 
 # def main():
 #     parser = Parser()
@@ -0,0 +1,172 @@
+from collections import Counter
+
+from assembler import LABEL_OPERAND_OPS, is_directive
+
+# Runs over CodeGenerator output, before linking: instructions are text and
+# jump operands are still label names. .line directives are stepped over, so
+# they change neither what is matched nor what is removed.
+
+# Instructions control never falls through
+TERMINATORS = ('JMP', 'HALT', 'RETURN', 'TAIL_CALL')
+# Jumps whose target can be threaded through a chain of JMPs
+THREADABLE_JUMPS = ('JMP', 'JMP_IF_FALSE', 'CMP_LT_JMP_IF_FALSE')
+
+
+def fuse_store_load(store, load):
+    if store[1] == load[1]:
+        return [f'STORE_LOAD {store[1]}']
+    return None
+
+
+def fuse_load_load_add(first, second, add):
+    return [f'LOAD_LOAD_ADD {first[1]} {second[1]}']
+
+
+def fuse_cmp_lt_jmp_if_false(compare, jump):
+    return [f'CMP_LT_JMP_IF_FALSE {jump[1]}']
+
+
+# Superinstructions, tried in order at each position:
+#   (rule name, mnemonics to match, rewrite of the matched instructions' parts)
+# A rewrite returns the replacement instructions, or None to leave them be.
+FUSION_RULES = [
+    ('store_load', ('STORE_SLOT', 'LOAD_SLOT'), fuse_store_load),
+    ('load_load_add', ('LOAD_SLOT', 'LOAD_SLOT', 'ADD'), fuse_load_load_add),
+    ('cmp_lt_jmp_if_false', ('CMP_LT', 'JMP_IF_FALSE'), fuse_cmp_lt_jmp_if_false),
+]
+
+
+def is_label(instruction):
+    return instruction.endswith(':')
+
+
+class PeepholeOptimizer:
+    def __init__(self, rules=FUSION_RULES):
+        # Index the rules by the first mnemonic they match
+        self.rules = {}
+        for rule in rules:
+            self.rules.setdefault(rule[1][0], []).append(rule)
+        self.hits = Counter()
+
+    def optimize(self, instructions, entry_labels=()):
+        # entry_labels are reached from outside the code, e.g. function names
+        code = list(instructions)
+        # Each cleanup can expose work for the others, so repeat until stable
+        while True:
+            before = len(code), sum(self.hits.values())
+            code = self.thread_jumps(code)
+            code = self.remove_jumps_to_next(code)
+            code = self.remove_dead_code(code, entry_labels)
+            if (len(code), sum(self.hits.values())) == before:
+                break
+        return self.fuse(code)
+
+    def report(self):
+        # Rule -> times applied, most applied first
+        return dict(self.hits.most_common())
+
+    def thread_jumps(self, code):
+        # Where each label leads: the first real instruction after it
+        targets = {}
+        pending = []
+        for instruction in code:
+            if is_label(instruction):
+                pending.append(instruction[:-1])
+            elif not is_directive(instruction):
+                for label in pending:
+                    targets[label] = instruction
+                pending = []
+
+        def final_target(label):
+            seen = set()
+            while label not in seen:
+                seen.add(label)
+                parts = targets.get(label, '').split()
+                if len(parts) != 2 or parts[0] != 'JMP':
+                    break
+                label = parts[1]
+            return label
+
+        threaded = []
+        for instruction in code:
+            parts = instruction.split()
+            if len(parts) == 2 and parts[0] in THREADABLE_JUMPS:
+                target = final_target(parts[1])
+                if target != parts[1]:
+                    self.hits['thread_jump'] += 1
+                    instruction = f'{parts[0]} {target}'
+            threaded.append(instruction)
+        return threaded
+
+    def remove_jumps_to_next(self, code):
+        kept = []
+        for i, instruction in enumerate(code):
+            parts = instruction.split()
+            if len(parts) == 2 and parts[0] == 'JMP':
+                # Only labels between the jump and its target
+                j = i + 1
+                while j < len(code) and (is_directive(code[j]) or is_label(code[j]) and code[j][:-1] != parts[1]):
+                    j += 1
+                if j < len(code) and code[j] == parts[1] + ':':
+                    self.hits['jump_to_next'] += 1
+                    continue
+            kept.append(instruction)
+        return kept
+
+    def remove_dead_code(self, code, entry_labels):
+        used = set(entry_labels)
+        for instruction in code:
+            parts = instruction.split()
+            if len(parts) >= 2 and parts[0] in LABEL_OPERAND_OPS:
+                used.add(parts[1])
+
+        kept = []
+        reachable = True
+        for instruction in code:
+            if is_directive(instruction):
+                pass
+            elif is_label(instruction):
+                if instruction[:-1] not in used:
+                    self.hits['unused_label'] += 1
+                    continue
+                reachable = True
+            elif not reachable:
+                self.hits['dead_code'] += 1
+                continue
+            elif instruction.split(None, 1)[0] in TERMINATORS:
+                reachable = False
+            kept.append(instruction)
+        return kept
+
+    def fuse(self, code):
+        rules = self.rules
+        fused = []
+        i = 0
+        while i < len(code):
+            instruction = code[i]
+            for name, mnemonics, rewrite in rules.get(instruction.split(None, 1)[0], ()):
+                # The next instructions, and the directives between them,
+                # which go after the replacement
+                window = []
+                directives = []
+                j = i
+                while j < len(code) and len(window) < len(mnemonics):
+                    (directives if is_directive(code[j]) else window).append(code[j])
+                    j += 1
+                if len(window) < len(mnemonics):
+                    continue
+                parts = [item.split() for item in window]
+                if any(not part or part[0] != mnemonic for part, mnemonic in zip(parts, mnemonics)):
+                    continue
+                replacement = rewrite(*parts)
+                if replacement is not None:
+                    self.hits[name] += 1
+                    fused.extend(replacement)
+                    fused.extend(directives)
+                    i = j
+                    break
+            else:
+                fused.append(instruction)
+                i += 1
+        return fused
+
@@ -0,0 +1,250 @@
+import gc
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from assembler import Assembler, is_directive
+from assembly_generator import AssemblyGenerator
+from cfg import build_cfg
+from code_generator import CodeGenerator
+from ir_generator import IRGenerator
+from node import Node
+from optimizer import DEFAULT_OPT_LEVEL, LoopInvariantCodeMotion, TailCallEliminator, optimize
+from parser import get_parser
+from peephole import PeepholeOptimizer, is_label
+from register_generator import RegisterGenerator
+from semantic_analyzer import SemanticAnalyzer
+from version import COMPILER_VERSION
+
+
+@contextmanager
+def paused_gc():
+    # The compiler builds large acyclic trees, so cyclic collections during a
+    # compile only rescan an ever growing heap; refcounting frees everything
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def count_nodes(root):
+    # Nodes in an AST or IR tree, walked with an explicit stack
+    count = 0
+    pending = [root]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, Node):
+            count += 1
+            pending.extend(item.children)
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+    return count
+
+
+def count_instructions(instructions):
+    # Instructions in CodeGenerator output, without labels and directives
+    return sum(1 for instruction in instructions if not is_label(instruction) and not is_directive(instruction))
+
+
+class PipelineHook:
+    # Called around every stage a Pipeline runs; subclasses override either.
+    # record is the stage's entry in the report, see Pipeline.stage. Nothing
+    # but a hook uses the assembly listing, so its stage only runs when a
+    # hook sets wants_assembly.
+    wants_assembly = False
+
+    def before_stage(self, pipeline, name):
+        pass
+
+    def after_stage(self, pipeline, name, result, record):
+        pass
+
+
+class ProgressHook(PipelineHook):
+    # A line per finished stage, with its time and counts, then a line per
+    # entry of any breakdown in the record, such as the peephole rules applied
+    def __init__(self, out=print):
+        self.out = out
+
+    def after_stage(self, pipeline, name, result, record):
+        details = [f'{key} {value}' for key, value in record.items()
+                   if key not in ('stage', 'ns') and not isinstance(value, dict)]
+        suffix = f' ({", ".join(details)})' if details else ''
+        self.out(f"{name}: {record['ns'] / 1e6:.3f} ms{suffix}")
+        for value in record.values():
+            if isinstance(value, dict):
+                for key, detail in value.items():
+                    self.out(f'  {key}: {detail}')
+
+
+class DumpHook(PipelineHook):
+    # Prints what each compiler stage produced. Off unless asked for: on big
+    # inputs printing the trees costs more than building them.
+    wants_assembly = True
+
+    def __init__(self, out=print):
+        self.out = out
+
+    def after_stage(self, pipeline, name, result, record):
+        if name in ('parse', 'ir', 'optimize'):
+            self.out(result)
+        elif name == 'cfg':
+            self.out(result.format())
+        elif name in ('codegen', 'peephole'):
+            for instruction in result:
+                self.out(instruction)
+        elif name == 'register_codegen':
+            self.out(result.disassemble())
+        elif name in ('link', 'assembly'):
+            self.out(result)
+
+
+class Pipeline:
+    # The compiler as a sequence of named stages: parse, semantic, ir,
+    # optimize, cfg, licm, tail_calls, then codegen, peephole and link for
+    # the stack VM or register_codegen for the register VM, then assembly
+    # when a hook wants it; execute runs the result. Lexing happens inside parse, as the parser
+    # pulls tokens from the lexer in one pass.
+    #
+    # Every stage is timed with perf_counter_ns and leaves a record of its
+    # time and counts of what it produced in records, which report() turns
+    # into the JSON report. With trace_memory each record also has the
+    # stage's tracemalloc peak; tracing slows everything down a few times,
+    # so its timings are not comparable with untraced ones.
+    def __init__(self, opt_level=DEFAULT_OPT_LEVEL, backend='stack', line_numbers=False, dump_tokens=False,
+                 trace_memory=False, hooks=()):
+        self.opt_level = opt_level
+        self.backend = backend
+        self.line_numbers = line_numbers
+        self.dump_tokens = dump_tokens
+        self.trace_memory = trace_memory
+        self.hooks = list(hooks)
+        self.records = []
+        self.tokens = 0
+        self.source_bytes = 0
+
+    def stage(self, name, function, counts=None):
+        # Run function() as the stage name; counts maps its result to the
+        # numbers to report
+        for hook in self.hooks:
+            hook.before_stage(self, name)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter_ns()
+        result = function()
+        record = {'stage': name, 'ns': time.perf_counter_ns() - start}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record['peak_bytes'] = peak - baseline
+            record['retained_bytes'] = current - baseline
+        if counts is not None:
+            record.update(counts(result))
+        self.records.append(record)
+        for hook in self.hooks:
+            hook.after_stage(self, name, result, record)
+        return result
+
+    @contextmanager
+    def tracing(self):
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    def compile(self, source_code):
+        self.source_bytes = len(source_code.encode())
+        with paused_gc(), self.tracing():
+            return self.run_stages(source_code)
+
+    def tap(self, token):
+        self.tokens += 1
+        if self.dump_tokens:
+            print(token)
+
+    def run_stages(self, source_code):
+        opt_level = self.opt_level
+        self.tokens = 0
+        ast = self.stage('parse', lambda: get_parser().parse(source_code, tap=self.tap),
+                         lambda ast: {'tokens': self.tokens, 'nodes': count_nodes(ast)})
+
+        semantic_analyzer = SemanticAnalyzer()
+        self.stage('semantic', lambda: semantic_analyzer.analyze(ast),
+                   lambda result: {'variables': len(semantic_analyzer.variable_slots())})
+
+        ir = self.stage('ir', lambda: IRGenerator().generate(ast), lambda ir: {'nodes': count_nodes(ir)})
+        if opt_level > 0:
+            ir = self.stage('optimize', lambda: optimize(ir, opt_level), lambda ir: {'nodes': count_nodes(ir)})
+
+        # The one lowering of control flow both back ends share
+        cfg = self.stage('cfg', lambda: build_cfg(ir), lambda cfg: {'blocks': count_blocks(cfg)})
+        if opt_level >= 2:
+            licm = LoopInvariantCodeMotion()
+            self.stage('licm', lambda: licm.optimize(cfg), lambda result: {'hoisted': licm.hoisted, 'loops': licm.loops})
+        if opt_level >= 1:
+            tail_calls = TailCallEliminator()
+            self.stage('tail_calls', lambda: tail_calls.optimize(cfg),
+                       lambda result: {'eliminated': tail_calls.eliminated, 'functions': tail_calls.report()})
+
+        if self.backend == 'register':
+            # Three-address code over the same graph, in place of codegen,
+            # peephole and link
+            program = self.stage('register_codegen', lambda: RegisterGenerator().generate(cfg),
+                                 lambda program: {'instructions': len(program.code)})
+        else:
+            code_generator = CodeGenerator(semantic_analyzer.variable_slots(), self.line_numbers)
+
+            def generate():
+                code_generator.generate(cfg)
+                return code_generator.get_instructions()
+            instructions = self.stage('codegen', generate,
+                                      lambda instructions: {'instructions': count_instructions(instructions)})
+            if opt_level > 0:
+                peephole = PeepholeOptimizer()
+                instructions = self.stage('peephole',
+                                          lambda: peephole.optimize(instructions, code_generator.function_table),
+                                          lambda instructions: {'instructions': count_instructions(instructions),
+                                                                'rewrites': sum(peephole.hits.values()),
+                                                                'rules': peephole.report()})
+            program = self.stage('link', lambda: Assembler().assemble(instructions, code_generator.function_table,
+                                                                      code_generator.local_names(),
+                                                                      code_generator.frames),
+                                 lambda program: {'instructions': len(program)})
+
+        if any(hook.wants_assembly for hook in self.hooks):
+            self.stage('assembly', lambda: AssemblyGenerator().generate(cfg),
+                       lambda assembly_code: {'lines': assembly_code.count('\n') + 1 if assembly_code else 0})
+        return program
+
+    def execute(self, vm, program):
+        with self.tracing():
+            return self.stage('execute', lambda: vm.run(program))
+
+    def report(self):
+        # Everything recorded, as plain data for json
+        return {
+            'compiler_version': COMPILER_VERSION,
+            'opt_level': self.opt_level,
+            'backend': self.backend,
+            'source_bytes': self.source_bytes,
+            'trace_memory': self.trace_memory,
+            'total_ns': sum(record['ns'] for record in self.records),
+            'stages': self.records,
+        }
+
+    def write_report(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+            file.write('\n')
+
+
+def count_blocks(cfg):
+    return len(cfg.blocks) + sum(len(graph.blocks) for graph in cfg.functions.values())
@@ -0,0 +1,385 @@
+import time
+from collections import Counter
+
+from assembler import Program, link
+from bytecode import (OPNAMES, encode, PUSH, PUSH_STRING, LOAD, STORE, ADD, SUB, MUL, DIV, PRINT, JMP_IF_FALSE, JMP,
+                      HALT, CMP_GT, CMP_LT, CMP_EQ, CMP_NE, CMP_LE, CMP_GE, CREATE_TUPLE, STORE_LOAD, LOAD_LOAD_ADD,
+                      CMP_LT_JMP_IF_FALSE, LOAD_SLOT, STORE_SLOT, LOAD_GLOBAL, POP, CALL, RETURN, TAIL_CALL,
+                      JUMP_OPS, SLOT_PAIR_SHIFT, SLOT_PAIR_MASK)
+from interpreter import Interpreter
+from vm import DEFAULT_MAX_CALL_DEPTH, VM, Frame, unassigned
+
+# Profiling runs a copy of a machine's dispatch loop with the counters in it,
+# in place of the machine's own, so an ordinary run pays nothing for it. The
+# loops here must be kept in step with VM.run and Interpreter.run.
+
+# Opcode families, for time per kind of work
+OPCODE_FAMILIES = {
+    'PUSH': 'constant', 'PUSH_STRING': 'constant',
+    'LOAD_SLOT': 'variable', 'STORE_SLOT': 'variable', 'STORE_LOAD': 'variable', 'LOAD_GLOBAL': 'variable',
+    'LOAD': 'variable', 'STORE': 'variable',
+    'ADD': 'arithmetic', 'SUB': 'arithmetic', 'MUL': 'arithmetic', 'DIV': 'arithmetic',
+    'LOAD_LOAD_ADD': 'arithmetic',
+    'CMP_GT': 'comparison', 'CMP_LT': 'comparison', 'CMP_EQ': 'comparison', 'CMP_NE': 'comparison',
+    'CMP_LE': 'comparison', 'CMP_GE': 'comparison',
+    'JMP': 'branch', 'JMP_IF_FALSE': 'branch', 'CMP_LT_JMP_IF_FALSE': 'branch',
+    'CALL': 'call', 'RETURN': 'call', 'TAIL_CALL': 'call',
+    'PRINT': 'output',
+    'POP': 'stack', 'CREATE_TUPLE': 'stack', 'HALT': 'stack',
+}
+
+# Rows shown per table of the flat report
+REPORT_ROWS = 20
+
+
+class Profile:
+    # What a profiled run recorded for each instruction of the code it ran:
+    # how often it ran and the nanoseconds spent on it, with the time spent
+    # under each call stack for the collapsed-stack output. mnemonics, lines
+    # and labels describe the code: the mnemonic and source line of each
+    # instruction (lines may be None) and the label of each block start.
+    def __init__(self, mnemonics, lines, labels):
+        self.mnemonics = mnemonics
+        self.lines = lines
+        self.labels = labels
+        self.counts = [0] * len(mnemonics)
+        self.times = [0] * len(mnemonics)
+        # 'program;caller;callee' -> nanoseconds
+        self.stacks = Counter()
+
+    @classmethod
+    def for_program(cls, program):
+        mnemonics = [instruction.split(None, 1)[0] for instruction in program.instructions]
+        return cls(mnemonics, program.lines, block_labels(program.symbols))
+
+    @classmethod
+    def for_code(cls, code, symbols=None):
+        mnemonics = [OPNAMES[op] for op in code.ops]
+        if symbols is None:
+            # A module keeps no labels: blocks start at function entries and
+            # jump targets
+            symbols = {function[0]: function[1] for function in code.functions}
+            for op, arg in zip(code.ops, code.args):
+                if op in JUMP_OPS:
+                    symbols.setdefault(f'@{arg}', arg)
+        return cls(mnemonics, code.lines, block_labels(symbols))
+
+    def total_time(self):
+        return sum(self.times)
+
+    def opcodes(self):
+        # mnemonic -> (count, nanoseconds)
+        result = {}
+        for mnemonic, count, elapsed in zip(self.mnemonics, self.counts, self.times):
+            if count:
+                old = result.get(mnemonic, (0, 0))
+                result[mnemonic] = (old[0] + count, old[1] + elapsed)
+        return result
+
+    def families(self):
+        result = Counter()
+        for mnemonic, (count, elapsed) in self.opcodes().items():
+            result[OPCODE_FAMILIES.get(mnemonic, 'other')] += elapsed
+        return result
+
+    def blocks(self):
+        # label -> times control reached the block
+        return {label: self.counts[pc] for pc, label in self.labels.items() if pc < len(self.counts)}
+
+    def source_lines(self):
+        # line -> (instructions run, nanoseconds), None without line numbers
+        if self.lines is None:
+            return None
+        result = {}
+        for line, count, elapsed in zip(self.lines, self.counts, self.times):
+            if count:
+                old = result.get(line, (0, 0))
+                result[line] = (old[0] + count, old[1] + elapsed)
+        return result
+
+    def report(self, source_code=None):
+        # The flat report, as lines of text; with the source, line rows show
+        # the line itself
+        total = self.total_time() or 1
+        executed = sum(self.counts)
+        lines = [f'{executed} instructions in {self.total_time() / 1e6:.3f} ms']
+
+        lines.append('')
+        lines.append(f'{"opcode":<22} {"count":>12} {"ms":>10} {"time":>7}')
+        opcodes = sorted(self.opcodes().items(), key=lambda item: item[1][1], reverse=True)
+        for mnemonic, (count, elapsed) in opcodes[:REPORT_ROWS]:
+            lines.append(f'{mnemonic:<22} {count:>12} {elapsed / 1e6:>10.3f} {elapsed / total:>7.1%}')
+
+        lines.append('')
+        lines.append(f'{"family":<22} {"ms":>10} {"time":>7}')
+        for family, elapsed in self.families().most_common():
+            lines.append(f'{family:<22} {elapsed / 1e6:>10.3f} {elapsed / total:>7.1%}')
+
+        lines.append('')
+        lines.append(f'{"block":<22} {"hits":>12}')
+        blocks = sorted(self.blocks().items(), key=lambda item: item[1], reverse=True)
+        for label, hits in blocks[:REPORT_ROWS]:
+            lines.append(f'{label:<22} {hits:>12}')
+
+        lines.append('')
+        source_lines = self.source_lines()
+        if source_lines is None:
+            lines.append('No source line information.')
+        else:
+            text = source_code.splitlines() if source_code else []
+            lines.append(f'{"line":<6} {"count":>12} {"ms":>10} {"time":>7}')
+            rows = sorted(source_lines.items(), key=lambda item: item[1][1], reverse=True)
+            for line, (count, elapsed) in rows[:REPORT_ROWS]:
+                row = f'{line or "?":<6} {count:>12} {elapsed / 1e6:>10.3f} {elapsed / total:>7.1%}'
+                if 0 < line <= len(text):
+                    row += f'  {text[line - 1].strip()}'
+                lines.append(row)
+        return lines
+
+    def collapsed(self):
+        # One 'frame;frame;... microseconds' line per call stack, the input
+        # flamegraph.pl and speedscope take
+        return [f'{stack} {elapsed // 1000}' for stack, elapsed in sorted(self.stacks.items())
+                if elapsed >= 1000]
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as file:
+            for line in self.collapsed():
+                file.write(line + '\n')
+
+
+def block_labels(symbols):
+    # Block start -> its labels, joined where several name one instruction
+    labels = {}
+    for label, pc in symbols.items():
+        labels[pc] = f'{labels[pc]}/{label}' if pc in labels else label
+    return labels
+
+
+class ProfilingVM(VM):
+    # VM.run with counters; the profile of the last run is left in profile.
+    # The JIT is left out, as compiled code would hide the instructions it
+    # replaced.
+    def __init__(self, assembly_code=None, max_call_depth=DEFAULT_MAX_CALL_DEPTH):
+        super().__init__(assembly_code, max_call_depth, jit_threshold=0)
+        self.profile = None
+
+    def run(self, bytecode):
+        symbols = None
+        if isinstance(bytecode, list):
+            bytecode = link(bytecode, self.function_table, list(self.slots), self.frames)
+        if isinstance(bytecode, Program):
+            symbols = bytecode.symbols
+            bytecode = encode(bytecode)
+        self.bytecode = bytecode
+        profile = self.profile = Profile.for_code(bytecode, symbols)
+
+        ops = bytecode.ops
+        args = bytecode.args
+        consts = bytecode.consts
+        names = bytecode.names
+        variables = self.variables
+        functions = bytecode.functions
+        targets = [(entry, parameter_count, [None] * (len(local_names) - parameter_count))
+                   for _, entry, parameter_count, local_names in functions]
+        max_call_depth = self.max_call_depth
+        local = program_locals = [None] * len(names)
+        frame = Frame(None, local, 0)
+        frames = [frame]
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        end = len(ops)
+        pc = 0
+
+        # Each instruction is charged the time up to the next one starting;
+        # a call stack is charged the time up to the next call or return
+        clock = time.perf_counter_ns
+        counts = profile.counts
+        times = profile.times
+        stacks = profile.stacks
+        stack_names = ['program']
+        started = stack_started = clock()
+        previous = 0
+        try:
+            while pc < end:
+                now = clock()
+                times[previous] += now - started
+                started = now
+                previous = pc
+                counts[pc] += 1
+                op = ops[pc]
+                arg = args[pc]
+                pc += 1
+                if op == LOAD_SLOT:
+                    value = local[arg]
+                    if value is None:
+                        raise unassigned(bytecode, frame, arg)
+                    push(value)
+                elif op == PUSH:
+                    push(consts[arg])
+                elif op == STORE_SLOT:
+                    local[arg] = pop()
+                elif op == STORE_LOAD:
+                    local[arg] = stack[-1]
+                elif op == LOAD_LOAD_ADD:
+                    value = local[arg >> SLOT_PAIR_SHIFT]
+                    other = local[arg & SLOT_PAIR_MASK]
+                    if value is None or other is None:
+                        raise unassigned(bytecode, frame,
+                                         arg >> SLOT_PAIR_SHIFT if value is None else arg & SLOT_PAIR_MASK)
+                    push(value + other)
+                elif op == CMP_LT_JMP_IF_FALSE:
+                    b = pop()
+                    if not pop() < b:
+                        pc = arg
+                elif op == JMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == JMP:
+                    pc = arg
+                elif op == CALL:
+                    if len(frames) > max_call_depth:
+                        raise RecursionError(
+                            f"Maximum call depth of {max_call_depth} exceeded calling '{functions[arg][0]}'")
+                    entry, parameter_count, padding = targets[arg]
+                    base = len(stack) - parameter_count
+                    local = stack[base:]
+                    del stack[base:]
+                    local += padding
+                    frame = Frame(pc, local, base, arg)
+                    frames.append(frame)
+                    pc = entry
+                    stack_started = charge(stacks, stack_names, stack_started, clock)
+                    stack_names.append(f'{stack_names[-1]};{functions[arg][0]}')
+                elif op == RETURN:
+                    if frame.function is None:
+                        raise RuntimeError(f'RETURN outside a function at {pc - 1}')
+                    value = pop()
+                    del stack[frame.stack_base:]
+                    pc = frame.return_pc
+                    frames.pop()
+                    frame = frames[-1]
+                    local = frame.locals
+                    push(value)
+                    stack_started = charge(stacks, stack_names, stack_started, clock)
+                    stack_names.pop()
+                elif op == TAIL_CALL:
+                    entry, parameter_count, padding = targets[arg]
+                    base = len(stack) - parameter_count
+                    local = stack[base:]
+                    local += padding
+                    del stack[frame.stack_base:]
+                    frame.locals = local
+                    frame.function = arg
+                    pc = entry
+                    stack_started = charge(stacks, stack_names, stack_started, clock)
+                    stack_names[-1] = f'{stack_names[-2]};{functions[arg][0]}'
+                elif op == LOAD_GLOBAL:
+                    value = program_locals[arg]
+                    if value is None:
+                        raise NameError(f"Variable '{names[arg]}' is not assigned")
+                    push(value)
+                elif op == POP:
+                    pop()
+                elif op == LOAD:
+                    push(variables[names[arg]])
+                elif op == STORE:
+                    variables[names[arg]] = pop()
+                elif op == ADD:
+                    b = pop()
+                    push(pop() + b)
+                elif op == SUB:
+                    b = pop()
+                    push(pop() - b)
+                elif op == MUL:
+                    b = pop()
+                    push(pop() * b)
+                elif op == DIV:
+                    b = pop()
+                    push(pop() / b)
+                elif op == CMP_LT:
+                    b = pop()
+                    push(int(pop() < b))
+                elif op == CMP_GT:
+                    b = pop()
+                    push(int(pop() > b))
+                elif op == CMP_EQ:
+                    b = pop()
+                    push(int(pop() == b))
+                elif op == CMP_NE:
+                    b = pop()
+                    push(int(pop() != b))
+                elif op == CMP_LE:
+                    b = pop()
+                    push(int(pop() <= b))
+                elif op == CMP_GE:
+                    b = pop()
+                    push(int(pop() >= b))
+                elif op == CREATE_TUPLE:
+                    items = tuple(stack[len(stack) - arg:])
+                    del stack[len(stack) - arg:]
+                    push(items)
+                elif op == PUSH_STRING:
+                    push(consts[arg])
+                elif op == PRINT:
+                    print(pop())
+                elif op == HALT:
+                    break
+        finally:
+            # Charged even when the program fails, so its profile shows where
+            times[previous] += clock() - started
+            charge(stacks, stack_names, stack_started, clock)
+        self.pc = pc
+        for name, value in zip(names, program_locals):
+            if value is not None:
+                variables[name] = value
+        return self.variables
+
+
+class ProfilingInterpreter(Interpreter):
+    # Interpreter.run with counters, as ProfilingVM
+    def __init__(self, instructions, max_call_depth=DEFAULT_MAX_CALL_DEPTH):
+        super().__init__(instructions, max_call_depth)
+        self.profile = None
+
+    def run(self):
+        profile = self.profile = Profile.for_program(self.program)
+        instructions = self.instructions
+        clock = time.perf_counter_ns
+        counts = profile.counts
+        times = profile.times
+        stacks = profile.stacks
+        stack_names = ['program']
+        started = stack_started = clock()
+        previous = 0
+        try:
+            while self.instruction_pointer < len(instructions):
+                now = clock()
+                times[previous] += now - started
+                started = now
+                previous = pc = self.instruction_pointer
+                counts[pc] += 1
+                depth = len(self.frames)
+                function = self.frame.function
+                self.instruction_pointer += 1
+                self.execute(instructions[pc])
+                # Calls and returns show as a change of frame
+                if len(self.frames) != depth or self.frame.function != function:
+                    stack_started = charge(stacks, stack_names, stack_started, clock)
+                    if len(self.frames) < depth:
+                        stack_names.pop()
+                    else:
+                        if len(self.frames) == depth:
+                            stack_names.pop()
+                        stack_names.append(f'{stack_names[-1]};{self.targets[self.frame.function][0]}')
+        finally:
+            times[previous] += clock() - started
+            charge(stacks, stack_names, stack_started, clock)
+
+
+def charge(stacks, stack_names, started, clock):
+    # Charge the time since started to the running call stack, returning now
+    now = clock()
+    stacks[stack_names[-1]] += now - started
+    return now
@@ -0,0 +1,127 @@
+# Instruction set of the register machine, see register_vm.py. Every
+# instruction is a tuple (op, a, b, c) of three-address form: operands name
+# registers of the running frame directly, so there is no operand stack and
+# no push/pop pair around each operation. Constants are registers as well,
+# filled in when a frame is created, so every operand is an index.
+MOVE = 0
+ADD = 1
+SUB = 2
+MUL = 3
+DIV = 4
+LT = 5
+LE = 6
+GT = 7
+GE = 8
+EQ = 9
+NE = 10
+JUMP = 11
+JUMP_IF_FALSE = 12
+# Compare and branch in one: jump to c unless the comparison of a and b holds
+JUMP_IF_NOT_LT = 13
+JUMP_IF_NOT_LE = 14
+JUMP_IF_NOT_GT = 15
+JUMP_IF_NOT_GE = 16
+JUMP_IF_NOT_EQ = 17
+JUMP_IF_NOT_NE = 18
+LOAD_GLOBAL = 19
+CHECK = 20
+CALL = 21
+TAIL_CALL = 22
+RETURN = 23
+PRINT = 24
+TUPLE = 25
+HALT = 26
+
+OPCODES = {
+    'MOVE': MOVE, 'ADD': ADD, 'SUB': SUB, 'MUL': MUL, 'DIV': DIV,
+    'LT': LT, 'LE': LE, 'GT': GT, 'GE': GE, 'EQ': EQ, 'NE': NE,
+    'JUMP': JUMP, 'JUMP_IF_FALSE': JUMP_IF_FALSE,
+    'JUMP_IF_NOT_LT': JUMP_IF_NOT_LT, 'JUMP_IF_NOT_LE': JUMP_IF_NOT_LE,
+    'JUMP_IF_NOT_GT': JUMP_IF_NOT_GT, 'JUMP_IF_NOT_GE': JUMP_IF_NOT_GE,
+    'JUMP_IF_NOT_EQ': JUMP_IF_NOT_EQ, 'JUMP_IF_NOT_NE': JUMP_IF_NOT_NE,
+    'LOAD_GLOBAL': LOAD_GLOBAL, 'CHECK': CHECK,
+    'CALL': CALL, 'TAIL_CALL': TAIL_CALL, 'RETURN': RETURN,
+    'PRINT': PRINT, 'TUPLE': TUPLE, 'HALT': HALT,
+}
+OPNAMES = {code: name for name, code in OPCODES.items()}
+
+# What each of a, b and c holds:
+#   'r'  a register              'R'  a tuple of registers
+#   'l'  a jump target           'f'  a function, indexing the call table
+#   'g'  a register of the program's frame, for LOAD_GLOBAL
+#   'n'  a variable name, for error messages
+#   None unused
+BINARY_FORMAT = ('r', 'r', 'r')
+BRANCH_FORMAT = ('r', 'r', 'l')
+FORMATS = {
+    MOVE: ('r', 'r', None),
+    ADD: BINARY_FORMAT, SUB: BINARY_FORMAT, MUL: BINARY_FORMAT, DIV: BINARY_FORMAT,
+    LT: BINARY_FORMAT, LE: BINARY_FORMAT, GT: BINARY_FORMAT, GE: BINARY_FORMAT, EQ: BINARY_FORMAT, NE: BINARY_FORMAT,
+    JUMP: ('l', None, None),
+    JUMP_IF_FALSE: ('r', 'l', None),
+    JUMP_IF_NOT_LT: BRANCH_FORMAT, JUMP_IF_NOT_LE: BRANCH_FORMAT, JUMP_IF_NOT_GT: BRANCH_FORMAT,
+    JUMP_IF_NOT_GE: BRANCH_FORMAT, JUMP_IF_NOT_EQ: BRANCH_FORMAT, JUMP_IF_NOT_NE: BRANCH_FORMAT,
+    LOAD_GLOBAL: ('r', 'g', 'n'),
+    CHECK: ('r', 'n', None),
+    CALL: ('r', 'f', 'R'),
+    TAIL_CALL: (None, 'f', 'R'),
+    RETURN: ('r', None, None),
+    PRINT: ('r', None, None),
+    TUPLE: ('r', None, 'R'),
+    HALT: (None, None, None),
+}
+
+
+class RegisterProgram:
+    # code is a list of (op, a, b, c). functions is the call table, one
+    # (name, entry, parameter count, registers, variable names) per function,
+    # where registers is the list a new frame starts as: parameters, other
+    # variables and temporaries as None, then the constants. registers and
+    # names are the same for the program's own frame, whose variables, the
+    # globals, come first.
+    def __init__(self, code, functions, registers, names):
+        self.code = code
+        self.functions = functions
+        self.registers = registers
+        self.names = names
+
+    def __len__(self):
+        return len(self.code)
+
+    def __repr__(self):
+        return (f'RegisterProgram(instructions={len(self.code)}, registers={len(self.registers)}, '
+                f'names={self.names}, functions={[function[0] for function in self.functions]})')
+
+    def disassemble(self):
+        # Constant registers are shown as #value, the rest as rN
+        frames = {function[1]: function for function in self.functions}
+        registers = self.registers
+        lines = [frame_header('program', 0, registers, self.names)]
+        for pc, instruction in enumerate(self.code):
+            if pc in frames:
+                name, _, parameter_count, registers, names = frames[pc]
+                lines.append(frame_header(name, parameter_count, registers, names))
+            operands = []
+            for kind, operand in zip(FORMATS[instruction[0]], instruction[1:]):
+                if kind == 'r':
+                    operands.append(register_name(operand, registers))
+                elif kind == 'R':
+                    operands.append('(' + ', '.join(register_name(register, registers) for register in operand) + ')')
+                elif kind == 'f':
+                    operands.append(self.functions[operand][0])
+                elif kind == 'g':
+                    operands.append(f'g{operand}')
+                elif kind is not None:
+                    operands.append(str(operand))
+            lines.append(f'{pc:6}  {OPNAMES[instruction[0]]:<15} {", ".join(operands)}'.rstrip())
+        return '\n'.join(lines)
+
+
+def frame_header(name, parameter_count, registers, names):
+    return (f'{name}: {len(registers)} registers, {parameter_count} parameters, '
+            f'variables [{", ".join(names)}]')
+
+
+def register_name(register, registers):
+    value = registers[register]
+    return f'r{register}' if value is None else f'#{value!r}'
@@ -0,0 +1,351 @@
+import heapq
+
+from cfg import ControlFlowGraph, build_cfg, lower
+from optimizer import INLINE_PREFIX
+from register_code import (RegisterProgram, FORMATS, MOVE, ADD, SUB, MUL, DIV, LT, LE, GT, GE, EQ, NE, JUMP,
+                           JUMP_IF_FALSE, JUMP_IF_NOT_LT, JUMP_IF_NOT_LE, JUMP_IF_NOT_GT, JUMP_IF_NOT_GE,
+                           JUMP_IF_NOT_EQ, JUMP_IF_NOT_NE, LOAD_GLOBAL, CHECK, CALL, TAIL_CALL, RETURN, PRINT,
+                           TUPLE, HALT)
+
+BINARY_OPS = {'+': ADD, '-': SUB, '*': MUL, '/': DIV}
+COMPARISON_OPS = {'<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE}
+# A branch on a comparison tests it and jumps in one instruction
+BRANCH_OPS = {
+    '<': JUMP_IF_NOT_LT, '<=': JUMP_IF_NOT_LE,
+    '>': JUMP_IF_NOT_GT, '>=': JUMP_IF_NOT_GE,
+    '==': JUMP_IF_NOT_EQ, '!=': JUMP_IF_NOT_NE,
+}
+
+
+class FrameLayout:
+    # The virtual registers of one frame while its code is generated:
+    # variables, constants and temporaries, each numbered from a count
+    # shared by the whole program.
+    def __init__(self, graph, start):
+        self.name = graph.name
+        self.parameter_count = len(graph.parameters)
+        self.start = start
+        self.end = start
+        # Name -> virtual register, parameters first
+        self.variables = {}
+        # (type, repr) of a constant -> (virtual register, value)
+        self.constants = {}
+        self.temporaries = []
+        # (block, definitions reaching it) of each statement and terminator
+        # expression, by id, and the definition standing for no assignment
+        # of each name
+        self.reach = {}
+        self.unassigned = {}
+        self.locals = None
+
+
+class RegisterGenerator:
+    # Lowers the CFG to three-address code for the register machine. Code is
+    # generated over unlimited virtual registers, one per variable, constant
+    # and intermediate value; once all of it is there, each frame's
+    # intermediate values are packed into as few registers as linear scan
+    # manages, after its variables.
+    def __init__(self):
+        # [op, a, b, c] over virtual registers; jumps name their block's label
+        self.code = []
+        self.labels = {}
+        # Function name -> index of its first instruction
+        self.entries = {}
+        self.layouts = []
+        self.layout = None
+        self.register_count = 0
+        # Definitions reaching the statement being generated, the block it is
+        # in, and the variables CHECKed so far in that block
+        self.reach = 0
+        self.block = None
+        self.checked = set()
+        self.allocator = LinearScanAllocator()
+
+    def generate(self, node):
+        # node is IR, or a ControlFlowGraph already built from it
+        cfg = node if isinstance(node, ControlFlowGraph) else build_cfg(node)
+        self.code = []
+        self.labels = {}
+        self.entries = {}
+        self.layouts = []
+        self.layout = None
+        self.register_count = 0
+        self.begin_frame(cfg)
+        lower(cfg, self)
+        return self.finish()
+
+    def begin_frame(self, graph):
+        if self.layout is not None:
+            self.layout.end = len(self.code)
+        layout = self.layout = FrameLayout(graph, len(self.code))
+        self.layouts.append(layout)
+        for name in graph.local_names():
+            self.variable(name)
+        if graph.name is not None:
+            layout.locals = set(layout.variables)
+
+        # Reads of a variable that may not be assigned yet need a CHECK
+        definitions, masks, reach_in = graph.reaching_definitions()
+        bits = {}
+        for i, (name, block, index) in enumerate(definitions):
+            if block is None:
+                layout.unassigned[name] = 1 << i
+            else:
+                bits[block, index] = 1 << i
+        for block in graph.blocks:
+            reach = reach_in[block]
+            if block is graph.entry:
+                for i, name in enumerate(graph.parameters):
+                    reach = (reach & ~masks[name]) | bits[block, -1 - i]
+            for index, statement in enumerate(block.statements):
+                layout.reach[id(statement)] = (block, reach)
+                if statement.type == 'assignment':
+                    reach = (reach & ~masks[statement.value]) | bits[block, index]
+            if block.terminator[0] in ('branch', 'return', 'tail_call'):
+                layout.reach[id(block.terminator[1])] = (block, reach)
+
+    # The lower_* hooks, called by cfg.lower for each block in layout order
+    def lower_function(self, graph):
+        self.begin_frame(graph)
+
+    def lower_label(self, block):
+        if block.function is not None:
+            self.entries[block.function] = len(self.code)
+        self.labels[block.label] = len(self.code)
+
+    def lower_statement(self, node):
+        self.start(node)
+        self.evaluate(node)
+
+    def lower_jump(self, block):
+        self.emit(JUMP, block.label)
+
+    def lower_branch(self, condition, block):
+        self.start(condition)
+        if condition.type == 'comparison' and condition.value in BRANCH_OPS:
+            left = self.evaluate(condition.children[0])
+            right = self.evaluate(condition.children[1])
+            self.emit(BRANCH_OPS[condition.value], left, right, block.label)
+        else:
+            self.emit(JUMP_IF_FALSE, self.evaluate(condition), block.label)
+
+    def lower_return(self, value):
+        self.start(value)
+        self.emit(RETURN, self.evaluate(value))
+
+    def lower_tail_call(self, call):
+        self.start(call)
+        arguments = tuple(self.evaluate(argument) for argument in call.children)
+        self.emit(TAIL_CALL, None, call.value, arguments)
+
+    def lower_halt(self):
+        self.emit(HALT)
+
+    def start(self, root):
+        # Before generating a statement or terminator expression
+        block, self.reach = self.layout.reach[id(root)]
+        if block is not self.block:
+            self.block = block
+            self.checked = set()
+
+    def emit(self, op, a=None, b=None, c=None):
+        self.code.append([op, a, b, c])
+
+    def new_register(self):
+        self.register_count += 1
+        return self.register_count - 1
+
+    def variable(self, name):
+        register = self.layout.variables.get(name)
+        if register is None:
+            register = self.layout.variables[name] = self.new_register()
+        return register
+
+    def constant(self, value):
+        key = (type(value), repr(value))
+        entry = self.layout.constants.get(key)
+        if entry is None:
+            entry = self.layout.constants[key] = (self.new_register(), value)
+        return entry[0]
+
+    def temporary(self):
+        register = self.new_register()
+        self.layout.temporaries.append(register)
+        return register
+
+    def load(self, name):
+        # Register holding the variable name, checked first if it may not
+        # have been assigned; functions read globals into a temporary
+        layout = self.layout
+        if layout.locals is not None and name not in layout.locals:
+            register = self.temporary()
+            self.emit(LOAD_GLOBAL, register, name, name)
+            return register
+        register = self.variable(name)
+        # Inlined calls assign their temporaries before any read, and a
+        # variable that passed a CHECK stays assigned
+        if not name.startswith(INLINE_PREFIX) and name not in self.checked:
+            bit = layout.unassigned.get(name)
+            if bit is None or self.reach & bit:
+                self.emit(CHECK, register, name)
+                self.checked.add(name)
+        return register
+
+    def evaluate(self, root, target=None):
+        # Generates root, a statement or an expression, and returns the
+        # register holding an expression's value. Operations leave their
+        # result in target when given, which saves assignments a MOVE.
+        # Walks with an explicit stack of (node, target, children done);
+        # values holds the registers of finished subexpressions.
+        values = []
+        pending = [(root, target, False)]
+        while pending:
+            node, target, done = pending.pop()
+            node_type = node.type
+            if done:
+                if node_type == 'assignment':
+                    source = values.pop()
+                    if source != target:
+                        self.emit(MOVE, target, source)
+                    continue
+                if node_type == 'print':
+                    self.emit(PRINT, values.pop())
+                    continue
+                if node_type == 'expression_statement':
+                    values.pop()
+                    continue
+                count = len(node.children)
+                operands = values[len(values) - count:]
+                del values[len(values) - count:]
+                destination = self.temporary() if target is None else target
+                if node_type == 'binary_expression':
+                    self.emit(BINARY_OPS[node.value], destination, operands[0], operands[1])
+                elif node_type == 'comparison':
+                    self.emit(COMPARISON_OPS[node.value], destination, operands[0], operands[1])
+                elif node_type == 'unary_expression':
+                    # Negation is 0 - operand, as on the stack machine
+                    self.emit(SUB, destination, self.constant(0), operands[0])
+                elif node_type == 'function_call':
+                    self.emit(CALL, destination, node.value, tuple(operands))
+                else:
+                    self.emit(TUPLE, destination, None, tuple(operands))
+                values.append(destination)
+            elif node_type == 'number' or node_type == 'string':
+                values.append(self.constant(node.value))
+            elif node_type == 'identifier':
+                values.append(self.load(node.value))
+            elif node_type == 'assignment':
+                register = self.variable(node.value)
+                pending.append((node, register, True))
+                pending.append((node.children[0], register, False))
+            elif node_type == 'sequence':
+                # An inlined call: its statements, then its value
+                parts = node.children
+                pending.append((parts[-1], target, False))
+                pending.extend((part, None, False) for part in reversed(parts[:-1]))
+            elif node_type in ('binary_expression', 'comparison', 'unary_expression', 'function_call', 'tuple',
+                               'print', 'expression_statement'):
+                pending.append((node, target, True))
+                pending.extend((child, None, False) for child in reversed(node.children))
+            else:
+                raise ValueError(f"Unknown IR node type: {node_type}")
+        return values.pop() if values else None
+
+    def finish(self):
+        # Give every virtual register its place in a frame and resolve
+        # labels, functions and globals
+        self.layout.end = len(self.code)
+        program_layout = self.layouts[0]
+        functions = {layout.name: i for i, layout in enumerate(self.layouts[1:])}
+        # Globals only functions read still need a register in the program's
+        # frame, to hold None and fail the read
+        for layout in self.layouts[1:]:
+            for instruction in self.code[layout.start:layout.end]:
+                if instruction[0] == LOAD_GLOBAL:
+                    program_layout.variables.setdefault(instruction[2], self.new_register())
+
+        frames = [self.allocate(layout) for layout in self.layouts]
+        globals = {name: i for i, name in enumerate(program_layout.variables)}
+        code = []
+        for layout, (registers, template) in zip(self.layouts, frames):
+            for op, a, b, c in self.code[layout.start:layout.end]:
+                operands = [a, b, c]
+                for i, kind in enumerate(FORMATS[op]):
+                    operand = operands[i]
+                    if kind == 'r':
+                        operands[i] = registers[operand]
+                    elif kind == 'R':
+                        operands[i] = tuple(registers[register] for register in operand)
+                    elif kind == 'l':
+                        operands[i] = self.labels[operand]
+                    elif kind == 'f':
+                        if operand not in functions:
+                            raise ValueError(f'Call to undefined function {operand!r}')
+                        operands[i] = functions[operand]
+                    elif kind == 'g':
+                        operands[i] = globals[operand]
+                code.append((op, operands[0], operands[1], operands[2]))
+
+        call_table = [(layout.name, self.entries[layout.name], layout.parameter_count, template,
+                       list(layout.variables))
+                      for layout, (_, template) in zip(self.layouts[1:], frames[1:])]
+        return RegisterProgram(code, call_table, frames[0][1], list(program_layout.variables))
+
+    def allocate(self, layout):
+        # Virtual register -> register of the frame, and the list a new
+        # frame starts as: variables, temporaries, then constants
+        registers = {register: i for i, register in enumerate(layout.variables.values())}
+        base = len(registers)
+        intervals = {register: [None, None] for register in layout.temporaries}
+        for index in range(layout.start, layout.end):
+            op, a, b, c = self.code[index]
+            for kind, operand in zip(FORMATS[op], (a, b, c)):
+                if kind == 'R':
+                    used = operand
+                elif kind == 'r':
+                    used = (operand,)
+                else:
+                    continue
+                for register in used:
+                    interval = intervals.get(register)
+                    if interval is not None:
+                        if interval[0] is None:
+                            interval[0] = index
+                        interval[1] = index
+        assignment, count = self.allocator.allocate(intervals, base)
+        registers.update(assignment)
+        template = [None] * (base + count)
+        for register, value in layout.constants.values():
+            registers[register] = len(template)
+            template.append(value)
+        return registers, template
+
+
+class LinearScanAllocator:
+    # Gives each temporary a register, taking those of temporaries whose
+    # live interval is over before new ones. Registers are frame slots, so
+    # there is no fixed number of them to run out of and nothing is ever
+    # spilled: what the scan saves is frame size, and with it the work of
+    # creating a frame on every call.
+    def allocate(self, intervals, base):
+        # intervals maps each virtual register to its first and last
+        # instruction; returns virtual -> real register, numbered from base,
+        # and how many were used
+        assignment = {}
+        # (end, register) of the intervals still live, soonest ending first
+        active = []
+        free = []
+        count = 0
+        for register, (start, end) in sorted(intervals.items(), key=lambda item: (item[1][0], item[0])):
+            # An interval ending where this one starts is free to reuse: an
+            # instruction reads its operands before writing its result
+            while active and active[0][0] <= start:
+                free.append(heapq.heappop(active)[1])
+            if free:
+                real = free.pop()
+            else:
+                real = base + count
+                count += 1
+            assignment[register] = real
+            heapq.heappush(active, (end, real))
+        return assignment, count
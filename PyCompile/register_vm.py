@@ -0,0 +1,120 @@
+from register_code import (MOVE, ADD, SUB, MUL, DIV, LT, LE, GT, GE, EQ, NE, JUMP, JUMP_IF_FALSE, JUMP_IF_NOT_LT,
+                           JUMP_IF_NOT_LE, JUMP_IF_NOT_GT, JUMP_IF_NOT_GE, JUMP_IF_NOT_EQ, JUMP_IF_NOT_NE,
+                           LOAD_GLOBAL, CHECK, CALL, TAIL_CALL, RETURN, PRINT, TUPLE, HALT)
+from vm import DEFAULT_MAX_CALL_DEPTH
+
+
+class RegisterVM:
+    # Runs a RegisterProgram, from register_generator.py. Each frame is a
+    # list of registers, copied from the function's starting list on a call;
+    # callers wait on a stack of (return pc, registers, result register).
+    def __init__(self, max_call_depth=DEFAULT_MAX_CALL_DEPTH):
+        self.max_call_depth = max_call_depth
+        self.pc = 0
+        self.variables = {}
+
+    def run(self, program):
+        code = program.code
+        functions = program.functions
+        targets = [(entry, parameter_count, registers)
+                   for _, entry, parameter_count, registers, _ in functions]
+        max_call_depth = self.max_call_depth
+        registers = program_registers = list(program.registers)
+        frames = []
+        push_frame = frames.append
+        pop_frame = frames.pop
+        pc = 0
+
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            if op == ADD:
+                registers[a] = registers[b] + registers[c]
+            elif op == JUMP_IF_NOT_LT:
+                if not registers[a] < registers[b]:
+                    pc = c
+            elif op == MOVE:
+                registers[a] = registers[b]
+            elif op == SUB:
+                registers[a] = registers[b] - registers[c]
+            elif op == MUL:
+                registers[a] = registers[b] * registers[c]
+            elif op == JUMP:
+                pc = a
+            elif op == CALL:
+                # The frame count leaves out the program's own frame
+                if len(frames) >= max_call_depth:
+                    raise RecursionError(f"Maximum call depth of {max_call_depth} exceeded calling '{functions[b][0]}'")
+                entry, parameter_count, start = targets[b]
+                callee = start[:]
+                callee[:parameter_count] = [registers[register] for register in c]
+                push_frame((pc, registers, a))
+                registers = callee
+                pc = entry
+            elif op == RETURN:
+                if not frames:
+                    raise RuntimeError(f'RETURN outside a function at {pc - 1}')
+                value = registers[a]
+                pc, registers, result = pop_frame()
+                registers[result] = value
+            elif op == TAIL_CALL:
+                # The callee takes over the running frame's place on the call
+                # stack, so it does not grow
+                entry, parameter_count, start = targets[b]
+                callee = start[:]
+                callee[:parameter_count] = [registers[register] for register in c]
+                registers = callee
+                pc = entry
+            elif op == CHECK:
+                if registers[a] is None:
+                    raise NameError(f"Variable '{b}' is not assigned")
+            elif op == LOAD_GLOBAL:
+                value = program_registers[b]
+                if value is None:
+                    raise NameError(f"Variable '{c}' is not assigned")
+                registers[a] = value
+            elif op == JUMP_IF_NOT_LE:
+                if not registers[a] <= registers[b]:
+                    pc = c
+            elif op == JUMP_IF_NOT_GT:
+                if not registers[a] > registers[b]:
+                    pc = c
+            elif op == JUMP_IF_NOT_GE:
+                if not registers[a] >= registers[b]:
+                    pc = c
+            elif op == JUMP_IF_NOT_EQ:
+                if not registers[a] == registers[b]:
+                    pc = c
+            elif op == JUMP_IF_NOT_NE:
+                if not registers[a] != registers[b]:
+                    pc = c
+            elif op == JUMP_IF_FALSE:
+                if not registers[a]:
+                    pc = b
+            elif op == DIV:
+                registers[a] = registers[b] / registers[c]
+            elif op == LT:
+                registers[a] = int(registers[b] < registers[c])
+            elif op == LE:
+                registers[a] = int(registers[b] <= registers[c])
+            elif op == GT:
+                registers[a] = int(registers[b] > registers[c])
+            elif op == GE:
+                registers[a] = int(registers[b] >= registers[c])
+            elif op == EQ:
+                registers[a] = int(registers[b] == registers[c])
+            elif op == NE:
+                registers[a] = int(registers[b] != registers[c])
+            elif op == PRINT:
+                print(registers[a])
+            elif op == TUPLE:
+                registers[a] = tuple(registers[register] for register in c)
+            elif op == HALT:
+                break
+            else:
+                raise ValueError(f'Unknown opcode {op} at {pc - 1}')
+        self.pc = pc
+        for name, value in zip(program.names, program_registers):
+            if value is not None:
+                self.variables[name] = value
+        return self.variables
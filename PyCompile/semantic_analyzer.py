@@ -1,10 +1,19 @@
-class SemanticAnalyzer:
+from tree import assigned_names
+from visitor import Visitor
+
+class SemanticAnalyzer(Visitor):
     def __init__(self):
+        super().__init__()
         self.symbol_table = {}
         self.current_scope = "global"
         self.error = False
         self.error_message = ""
         self.current_function = None
+        # Parameters and names assigned in the current function's body
+        self.local_names = set()
+        # Calls, and global reads in function bodies, are checked once every
+        # definition is known: a function may call one defined after it
+        self.deferred = []
         self.current_function_params = []
         self.current_function_return_type = None
         self.current_function_return_value = None
@@ -18,150 +27,112 @@ class SemanticAnalyzer:
             self.symbol_table[scope][symbol] = value
     
     def analyze(self, ast):
+        self.deferred = []
         self.visit(ast)
-
-    def visit(self, node):
-        if isinstance(node, tuple):
-            node_type = node[0]
-            if hasattr(self, f'visit_{node_type}'):
-                method = getattr(self, f'visit_{node_type}')
-                method(node)
-            elif node_type in ('==', '!=', '<', '>', '<=', '>='):
-                self.visit_comparison(node)
+        for node in self.deferred:
+            if node.type == 'function_call':
+                self.check_call(node)
             else:
-                raise Exception(f'No visit_{node_type} method')
-        elif isinstance(node, list):
-            for subnode in node:
-                self.visit(subnode)
-        elif isinstance(node, dict):
-            for key, value in node.items():
-                self.visit(value)
-        else:
-            # Handle other types of nodes if necessary
-            pass
+                self.check_variable(node)
 
-    def visit_program(self, node):
-        _, statements = node
-        self.visit(statements)
+    def variable_slots(self):
+        # Frame slot of each global variable, in order of first assignment
+        variables = [name for name, entry in self.symbol_table.items()
+                     if type(entry) is tuple and entry[0] == 'variable']
+        return {name: slot for slot, name in enumerate(variables)}
 
-    def visit_assign(self, node):
-        _, name, value = node
-        self.visit(value)
-        self.symbol_table[name] = value
+    # Children are checked before their parent's handler runs
+    def visit_program(self, node, *statements):
+        pass
 
-    def visit_print(self, node):
-        _, value = node
-        self.visit(value)
+    def visit_block(self, node, *statements):
+        pass
+
+    def visit_assignment(self, node, expression):
+        if self.current_function is None:
+            self.symbol_table[node.value] = ('variable', node.children[0])
 
-    def visit_tuple(self, node):
-        _, elements = node
-        for element in elements:
-            self.visit(element)
+    def visit_print(self, node, expression):
+        pass
+
+    def visit_tuple(self, node, *elements):
+        pass
 
     def visit_string(self, node):
         # Strings are considered valid as-is in this context
         pass
   
-    def visit_if(self, node):
-        _, condition, then_body = node
-        self.visit(condition)
-        self.visit(then_body)
-
-    def visit_else(self, node):
-        _, else_body = node
-        self.visit(else_body)
-
-    def visit_if_else(self, node):
-        _, condition, then_body, else_body = node
-        self.visit(condition)
-        self.visit(then_body)
-        self.visit(else_body)
-
-    def visit_while(self, node):
-        _, condition, body = node
-        self.visit(condition)
-        self.visit(body)
-
-    def visit_function(self, node):
-        _, name, body = node
-        self.symbol_table[name] = ('function', body)
-
-    def visit_call(self, node):
-        _, name, args = node
-        if name not in self.symbol_table:
-            raise ValueError(f"Undefined function '{name}'")
-        _, body = self.symbol_table[name]
-        if len(args) != len(body[1]):
-            raise ValueError(f"Function '{name}' expects {len(body[1])} arguments, but got {len(args)}")
-        for arg in args:
-            self.visit(arg)
-
-    def visit_bin_op(self, node):
-        _, left, right = node
-        self.visit(left)
-        self.visit(right)
-
-    def visit_cmp(self, node):
-        _, left, right = node
-        self.visit(left)
-        self.visit(right)
+    def visit_if(self, node, condition, then_body, else_body):
+        pass
+
+    def visit_while(self, node, condition, body):
+        pass
+
+    def visit_function_def(self, node):
+        name = node.value
+        if self.current_function is not None:
+            raise ValueError(f"Function '{name}' at line {node.lineno} is defined inside '{self.current_function.value}'")
+        entry = self.symbol_table.get(name)
+        if entry is not None and entry[0] == 'function':
+            raise ValueError(f"Function '{name}' at line {node.lineno} is already defined")
+        parameters = [parameter.value for parameter in node.children[0].children]
+        if len(set(parameters)) != len(parameters):
+            raise ValueError(f"Function '{name}' at line {node.lineno} repeats a parameter name")
+        self.symbol_table[name] = ('function', node)
+
+        # As in Python, the parameters and every name the body assigns are the
+        # function's locals; any other name it reads is a global
+        self.current_function = node
+        self.local_names = set(parameters) | assigned_names(node.children[1])
+        yield node.children[1]
+        self.current_function = None
+        self.local_names = set()
+
+    def visit_binary_expression(self, node, left, right):
+        pass
+
+    def visit_unary_expression(self, node, operand):
+        pass
 
     def visit_number(self, node):
         # Numbers are considered valid as-is in this context
         pass
 
     def visit_identifier(self, node):
-        if node not in self.symbol_table:
-            raise ValueError(f"Undefined identifier '{node}'")
-        _, value = self.symbol_table[node]
+        if self.current_function is not None:
+            if node.value not in self.local_names:
+                self.deferred.append(node)
+            return None
+        return self.check_variable(node)
+
+    def check_variable(self, node):
+        entry = self.symbol_table.get(node.value)
+        if entry is None or entry[0] != 'variable':
+            raise ValueError(f"Undefined identifier '{node.value}' at line {node.lineno}")
+        _, value = entry
         return value
 
-    def visit_function_definition(self, node):
-        _, name, params, return_type, body = node
-        self.current_function = name
-        self.current_function_params = params
-        self.current_function_return_type = return_type
-        self.visit(body)
-    
-    def visit_return(self, node):
-        _, value = node
-        self.current_function_return_value = value
-        self.visit(value)
+    def visit_return(self, node, value):
+        if self.current_function is None:
+            raise ValueError(f"'return' outside a function at line {node.lineno}")
+        self.current_function_return_value = node.children[0]
+
+    def visit_expression_statement(self, node, expression):
+        pass
     
-    def visit_function_call(self, node):
-        _, name, args = node
-        if name not in self.symbol_table:
-            raise ValueError(f"Undefined function '{name}'")
-        _, params, return_type, body = self.symbol_table[name]
-        if len(args) != len(params):
-            raise ValueError(f"Function '{name}' expects {len(params)} arguments, but got {len(args)}")
-        for arg in args:
-            self.visit(arg)
-        if return_type != 'VOID':
-            if self.current_function_return_value is None:
-                raise ValueError(f"Function '{name}' must return a value of type '{return_type}'")
-            if self.current_function_return_value[0] != return_type:
-                raise ValueError(f"Function '{name}' must return a value of type '{return_type}', but got '{self.current_function_return_value[0]}'")
-        self.current_function_return_value = None
+    def visit_function_call(self, node, *args):
+        self.deferred.append(node)
 
-    def visit_comparison(self, node):
-        # Check if the node has the correct number of elements
-        if len(node) < 3:
-            raise ValueError(f"Comparison node is malformed: {node}")
-
-        _, left, right = node if len(node) == 3 else (None, None, None)
-
-        # Node should be in the form (op, left, right)
-        op = node[0]
-        self.visit(left)
-        self.visit(right)
-        if op not in ('==', '!=', '<', '>', '<=', '>='):
-            raise ValueError(f"Unsupported comparison operator '{op}'")
-        
-    def generic_visit(self, node):
-        if hasattr(node, 'children'):
-            for child in node.children:
-                self.visit(child)
-        elif isinstance(node, dict):
-            for key, value in node.items():
-                self.visit(value)
+    def check_call(self, node):
+        name = node.value
+        entry = self.symbol_table.get(name)
+        if entry is None or entry[0] != 'function':
+            raise ValueError(f"Undefined function '{name}'")
+        _, function = entry
+        params = function.children[0].children
+        if len(node.children) != len(params):
+            raise ValueError(f"Function '{name}' expects {len(params)} arguments, but got {len(node.children)}")
+
+    def visit_comparison(self, node, left, right):
+        if node.value not in ('==', '!=', '<', '>', '<=', '>='):
+            raise ValueError(f"Unsupported comparison operator '{node.value}'")
@@ -0,0 +1,10 @@
+# lextab_edb5573c0769b893.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('AND', 'ASSIGN', 'CALL_NAME', 'COLON', 'COMMA', 'DEF', 'DIV', 'ELSE', 'END', 'EQ', 'GE', 'GT', 'IDENTIFIER', 'IF', 'LBRACE', 'LE', 'LPAREN', 'LT', 'MINUS', 'MUL', 'NE', 'NOT', 'NUMBER', 'OR', 'PLUS', 'PRINT', 'RBRACE', 'RETURN', 'RPAREN', 'STRING', 'WHILE'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_CALL_NAME>[a-zA-Z_][a-zA-Z_0-9]*(?=[ \\t]*\\())|(?P<t_IDENTIFIER>[a-zA-Z_][a-zA-Z_0-9]*)|(?P<t_NUMBER>\\d+)|(?P<t_newline>\\n+)|(?P<t_STRING>\\"(?:[^\\"\\\\]|\\\\.)*\\")|(?P<t_AND>and)|(?P<t_NOT>not)|(?P<t_EQ>==)|(?P<t_GE>>=)|(?P<t_LBRACE>\\{)|(?P<t_LE><=)|(?P<t_LPAREN>\\()|(?P<t_MUL>\\*)|(?P<t_NE>!=)|(?P<t_OR>or)|(?P<t_PLUS>\\+)|(?P<t_RBRACE>\\})|(?P<t_RPAREN>\\))|(?P<t_ASSIGN>=)|(?P<t_COLON>:)|(?P<t_COMMA>,)|(?P<t_DIV>/)|(?P<t_GT>>)|(?P<t_LT><)|(?P<t_MINUS>-)', [None, ('t_CALL_NAME', 'CALL_NAME'), ('t_IDENTIFIER', 'IDENTIFIER'), ('t_NUMBER', 'NUMBER'), ('t_newline', 'newline'), (None, 'STRING'), (None, 'AND'), (None, 'NOT'), (None, 'EQ'), (None, 'GE'), (None, 'LBRACE'), (None, 'LE'), (None, 'LPAREN'), (None, 'MUL'), (None, 'NE'), (None, 'OR'), (None, 'PLUS'), (None, 'RBRACE'), (None, 'RPAREN'), (None, 'ASSIGN'), (None, 'COLON'), (None, 'COMMA'), (None, 'DIV'), (None, 'GT'), (None, 'LT'), (None, 'MINUS')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
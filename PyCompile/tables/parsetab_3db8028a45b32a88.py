@@ -0,0 +1,80 @@
+
+# parsetab_3db8028a45b32a88.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'leftANDORleftEQNELTLEGTGEleftPLUSMINUSleftMULDIVrightUMINUSAND ASSIGN CALL_NAME COLON COMMA DEF DIV ELSE END EQ GE GT IDENTIFIER IF LBRACE LE LPAREN LT MINUS MUL NE NOT NUMBER OR PLUS PRINT RBRACE RETURN RPAREN STRING WHILEprogram : statement_liststatement_list : statement_list statement\n                          | statementstatement : assignment_statement\n                     | print_statement\n                     | if_statement\n                     | while_statement\n                     | function_definition\n                     | return_statement\n                     | call_statement\n                     | tuple_statement\n                     | string_statementassignment_statement : IDENTIFIER ASSIGN expressionprint_statement : PRINT LPAREN expression RPARENreturn_statement : RETURN expressioncall_statement : calltuple_statement : LPAREN expression_list RPARENstring_statement : STRINGexpression_list : expression_list COMMA expression\n                           | expressionsuite : COLON statement_list\n                 | LBRACE statement_list RBRACE\n                 | COLON LBRACE statement_list RBRACEif_statement : IF expression suite else_statement\n                        | IF expression suiteelse_statement : ELSE suitewhile_statement : WHILE expression suitefunction_definition : DEF CALL_NAME LPAREN parameter_list RPAREN suite\n                               | DEF CALL_NAME LPAREN RPAREN suiteparameter_list : parameter_list COMMA IDENTIFIER\n                          | IDENTIFIERcall : CALL_NAME LPAREN expression_list RPAREN\n                | CALL_NAME LPAREN RPARENexpression : term\n                      | expression PLUS term\n                      | expression MINUS term\n                      | expression LT term\n                      | expression LE term\n                      | expression GT term\n                      | expression GE term\n                      | expression EQ term\n                      | expression NE termterm : factor\n                | term MUL factor\n                | term DIV factorfactor : NUMBER\n                  | IDENTIFIER\n                  | call\n                  | LPAREN expression RPAREN\n                  | MINUS factor %prec UMINUS'
+    
+_lr_action_items = {'IDENTIFIER':([0,2,3,4,5,6,7,8,9,10,11,12,15,16,17,20,21,22,23,24,25,26,29,30,31,32,33,34,38,39,40,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,60,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,89,90,91,92,],[13,13,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,33,33,33,33,-16,-18,-2,33,33,33,-34,33,-43,-46,-47,-48,33,-15,-13,-17,33,33,33,33,33,33,33,33,33,33,33,-50,-25,13,13,-27,83,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,13,13,13,-32,-26,13,-22,93,-29,-23,-28,]),'PRINT':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[14,14,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,14,14,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,14,14,14,-32,-26,14,-22,-29,-23,-28,]),'IF':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[16,16,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,16,16,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,16,16,16,-32,-26,16,-22,-29,-23,-28,]),'WHILE':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[17,17,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,17,17,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,17,17,17,-32,-26,17,-22,-29,-23,-28,]),'DEF':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[18,18,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,18,18,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,18,18,18,-32,-26,18,-22,-29,-23,-28,]),'RETURN':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[20,20,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,20,20,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,20,20,20,-32,-26,20,-22,-29,-23,-28,]),'LPAREN':([0,2,3,4,5,6,7,8,9,10,11,12,14,15,16,17,19,20,21,22,23,24,25,26,29,30,31,32,33,34,37,38,39,40,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[15,15,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,25,26,26,26,38,26,-16,-18,-2,26,26,26,-34,26,-43,-46,-47,-48,60,26,-15,-13,-17,26,26,26,26,26,26,26,26,26,26,26,-50,-25,15,15,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,15,15,15,-32,-26,15,-22,-29,-23,-28,]),'STRING':([0,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[22,22,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,22,22,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,22,22,22,-32,-26,22,-22,-29,-23,-28,]),'CALL_NAME':([0,2,3,4,5,6,7,8,9,10,11,12,15,16,17,18,20,21,22,23,24,25,26,29,30,31,32,33,34,38,39,40,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,79,80,84,85,86,87,90,91,92,],[19,19,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,19,19,19,37,19,-16,-18,-2,19,19,19,-34,19,-43,-46,-47,-48,19,-15,-13,-17,19,19,19,19,19,19,19,19,19,19,19,-50,-25,19,19,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,19,19,19,-32,-26,19,-22,-29,-23,-28,]),'$end':([1,2,3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,84,85,87,90,91,92,],[0,-1,-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,-21,-32,-26,-22,-29,-23,-28,]),'ELSE':([3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,84,85,87,90,91,92,],[-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,77,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,-21,-32,-26,-22,-29,-23,-28,]),'RBRACE':([3,4,5,6,7,8,9,10,11,12,21,22,23,29,31,32,33,34,39,40,43,55,56,59,62,63,64,66,67,68,69,70,71,72,73,74,75,76,78,80,84,85,86,87,90,91,92,],[-3,-4,-5,-6,-7,-8,-9,-10,-11,-12,-16,-18,-2,-34,-43,-46,-47,-48,-15,-13,-17,-50,-25,-27,-33,-14,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-24,-21,87,-32,-26,91,-22,-29,-23,-28,]),'ASSIGN':([13,],[24,]),'NUMBER':([15,16,17,20,24,25,26,30,38,44,45,46,47,48,49,50,51,52,53,54,],[32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,]),'MINUS':([15,16,17,20,24,25,26,28,29,30,31,32,33,34,35,36,38,39,40,41,42,44,45,46,47,48,49,50,51,52,53,54,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[30,30,30,30,30,30,30,46,-34,30,-43,-46,-47,-48,46,46,30,46,46,46,46,30,30,30,30,30,30,30,30,30,30,30,-50,-33,-49,46,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'RPAREN':([27,28,29,31,32,33,34,38,41,42,55,60,61,62,64,65,66,67,68,69,70,71,72,73,74,75,81,83,84,93,],[43,-20,-34,-43,-46,-47,-48,62,63,64,-50,82,84,-33,-49,-19,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,88,-31,-32,-30,]),'COMMA':([27,28,29,31,32,33,34,55,61,62,64,65,66,67,68,69,70,71,72,73,74,75,81,83,84,93,],[44,-20,-34,-43,-46,-47,-48,-50,44,-33,-49,-19,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,89,-31,-32,-30,]),'PLUS':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[45,-34,-43,-46,-47,-48,45,45,45,45,45,45,-50,-33,-49,45,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'LT':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[47,-34,-43,-46,-47,-48,47,47,47,47,47,47,-50,-33,-49,47,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'LE':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[48,-34,-43,-46,-47,-48,48,48,48,48,48,48,-50,-33,-49,48,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'GT':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[49,-34,-43,-46,-47,-48,49,49,49,49,49,49,-50,-33,-49,49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'GE':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[50,-34,-43,-46,-47,-48,50,50,50,50,50,50,-50,-33,-49,50,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'EQ':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[51,-34,-43,-46,-47,-48,51,51,51,51,51,51,-50,-33,-49,51,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'NE':([28,29,31,32,33,34,35,36,39,40,41,42,55,62,64,65,66,67,68,69,70,71,72,73,74,75,84,],[52,-34,-43,-46,-47,-48,52,52,52,52,52,52,-50,-33,-49,52,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,-32,]),'COLON':([29,31,32,33,34,35,36,55,62,64,66,67,68,69,70,71,72,73,74,75,77,82,84,88,],[-34,-43,-46,-47,-48,57,57,-50,-33,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,57,57,-32,57,]),'LBRACE':([29,31,32,33,34,35,36,55,57,62,64,66,67,68,69,70,71,72,73,74,75,77,82,84,88,],[-34,-43,-46,-47,-48,58,58,-50,79,-33,-49,-35,-36,-37,-38,-39,-40,-41,-42,-44,-45,58,58,-32,58,]),'MUL':([29,31,32,33,34,55,62,64,66,67,68,69,70,71,72,73,74,75,84,],[53,-43,-46,-47,-48,-50,-33,-49,53,53,53,53,53,53,53,53,-44,-45,-32,]),'DIV':([29,31,32,33,34,55,62,64,66,67,68,69,70,71,72,73,74,75,84,],[54,-43,-46,-47,-48,-50,-33,-49,54,54,54,54,54,54,54,54,-44,-45,-32,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'program':([0,],[1,]),'statement_list':([0,57,58,79,],[2,78,80,86,]),'statement':([0,2,57,58,78,79,80,86,],[3,23,3,3,23,3,23,23,]),'assignment_statement':([0,2,57,58,78,79,80,86,],[4,4,4,4,4,4,4,4,]),'print_statement':([0,2,57,58,78,79,80,86,],[5,5,5,5,5,5,5,5,]),'if_statement':([0,2,57,58,78,79,80,86,],[6,6,6,6,6,6,6,6,]),'while_statement':([0,2,57,58,78,79,80,86,],[7,7,7,7,7,7,7,7,]),'function_definition':([0,2,57,58,78,79,80,86,],[8,8,8,8,8,8,8,8,]),'return_statement':([0,2,57,58,78,79,80,86,],[9,9,9,9,9,9,9,9,]),'call_statement':([0,2,57,58,78,79,80,86,],[10,10,10,10,10,10,10,10,]),'tuple_statement':([0,2,57,58,78,79,80,86,],[11,11,11,11,11,11,11,11,]),'string_statement':([0,2,57,58,78,79,80,86,],[12,12,12,12,12,12,12,12,]),'call':([0,2,15,16,17,20,24,25,26,30,38,44,45,46,47,48,49,50,51,52,53,54,57,58,78,79,80,86,],[21,21,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,21,21,21,21,21,21,]),'expression_list':([15,38,],[27,61,]),'expression':([15,16,17,20,24,25,26,38,44,],[28,35,36,39,40,41,42,28,65,]),'term':([15,16,17,20,24,25,26,38,44,45,46,47,48,49,50,51,52,],[29,29,29,29,29,29,29,29,29,66,67,68,69,70,71,72,73,]),'factor':([15,16,17,20,24,25,26,30,38,44,45,46,47,48,49,50,51,52,53,54,],[31,31,31,31,31,31,31,55,31,31,31,31,31,31,31,31,31,31,74,75,]),'suite':([35,36,77,82,88,],[56,59,85,90,92,]),'else_statement':([56,],[76,]),'parameter_list':([60,],[81,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('program -> statement_list','program',1,'p_program','parser.py',34),
+  ('statement_list -> statement_list statement','statement_list',2,'p_statement_list','parser.py',38),
+  ('statement_list -> statement','statement_list',1,'p_statement_list','parser.py',39),
+  ('statement -> assignment_statement','statement',1,'p_statement','parser.py',48),
+  ('statement -> print_statement','statement',1,'p_statement','parser.py',49),
+  ('statement -> if_statement','statement',1,'p_statement','parser.py',50),
+  ('statement -> while_statement','statement',1,'p_statement','parser.py',51),
+  ('statement -> function_definition','statement',1,'p_statement','parser.py',52),
+  ('statement -> return_statement','statement',1,'p_statement','parser.py',53),
+  ('statement -> call_statement','statement',1,'p_statement','parser.py',54),
+  ('statement -> tuple_statement','statement',1,'p_statement','parser.py',55),
+  ('statement -> string_statement','statement',1,'p_statement','parser.py',56),
+  ('assignment_statement -> IDENTIFIER ASSIGN expression','assignment_statement',3,'p_assignment_statement','parser.py',60),
+  ('print_statement -> PRINT LPAREN expression RPAREN','print_statement',4,'p_print_statement','parser.py',64),
+  ('return_statement -> RETURN expression','return_statement',2,'p_return_statement','parser.py',68),
+  ('call_statement -> call','call_statement',1,'p_call_statement','parser.py',72),
+  ('tuple_statement -> LPAREN expression_list RPAREN','tuple_statement',3,'p_tuple_statement','parser.py',76),
+  ('string_statement -> STRING','string_statement',1,'p_string_statement','parser.py',80),
+  ('expression_list -> expression_list COMMA expression','expression_list',3,'p_expression_list','parser.py',84),
+  ('expression_list -> expression','expression_list',1,'p_expression_list','parser.py',85),
+  ('suite -> COLON statement_list','suite',2,'p_suite','parser.py',95),
+  ('suite -> LBRACE statement_list RBRACE','suite',3,'p_suite','parser.py',96),
+  ('suite -> COLON LBRACE statement_list RBRACE','suite',4,'p_suite','parser.py',97),
+  ('if_statement -> IF expression suite else_statement','if_statement',4,'p_if_statement','parser.py',102),
+  ('if_statement -> IF expression suite','if_statement',3,'p_if_statement','parser.py',103),
+  ('else_statement -> ELSE suite','else_statement',2,'p_else_statement','parser.py',108),
+  ('while_statement -> WHILE expression suite','while_statement',3,'p_while_statement','parser.py',112),
+  ('function_definition -> DEF CALL_NAME LPAREN parameter_list RPAREN suite','function_definition',6,'p_function_definition','parser.py',116),
+  ('function_definition -> DEF CALL_NAME LPAREN RPAREN suite','function_definition',5,'p_function_definition','parser.py',117),
+  ('parameter_list -> parameter_list COMMA IDENTIFIER','parameter_list',3,'p_parameter_list','parser.py',124),
+  ('parameter_list -> IDENTIFIER','parameter_list',1,'p_parameter_list','parser.py',125),
+  ('call -> CALL_NAME LPAREN expression_list RPAREN','call',4,'p_call','parser.py',133),
+  ('call -> CALL_NAME LPAREN RPAREN','call',3,'p_call','parser.py',134),
+  ('expression -> term','expression',1,'p_expression','parser.py',139),
+  ('expression -> expression PLUS term','expression',3,'p_expression','parser.py',140),
+  ('expression -> expression MINUS term','expression',3,'p_expression','parser.py',141),
+  ('expression -> expression LT term','expression',3,'p_expression','parser.py',142),
+  ('expression -> expression LE term','expression',3,'p_expression','parser.py',143),
+  ('expression -> expression GT term','expression',3,'p_expression','parser.py',144),
+  ('expression -> expression GE term','expression',3,'p_expression','parser.py',145),
+  ('expression -> expression EQ term','expression',3,'p_expression','parser.py',146),
+  ('expression -> expression NE term','expression',3,'p_expression','parser.py',147),
+  ('term -> factor','term',1,'p_term','parser.py',156),
+  ('term -> term MUL factor','term',3,'p_term','parser.py',157),
+  ('term -> term DIV factor','term',3,'p_term','parser.py',158),
+  ('factor -> NUMBER','factor',1,'p_factor','parser.py',165),
+  ('factor -> IDENTIFIER','factor',1,'p_factor','parser.py',166),
+  ('factor -> call','factor',1,'p_factor','parser.py',167),
+  ('factor -> LPAREN expression RPAREN','factor',3,'p_factor','parser.py',168),
+  ('factor -> MINUS factor','factor',2,'p_factor','parser.py',169),
+]
@@ -0,0 +1,272 @@
+# Differential tests of the optimizer: every program must print the same
+# output, end with the same variables and fail with the same error at -O1
+# and -O2 as at -O0, where the IR goes to the back ends unoptimized.
+#   python -m unittest discover tests
+import io
+import os
+import random
+import sys
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import Pipeline
+from vm import VM
+
+HUGE = '1' + '0' * 400
+
+# Loops whose bodies never run, holding code that raises if it does: moving
+# it out of the loop, or folding it at compile time, must not make it run
+ZERO_TRIP_PROGRAMS = {
+    'overflowing int times float': f'''
+x = {HUGE}
+y = 1 / 2
+j = 0
+while j < 0 {{
+    z = x * y
+    j = j + 1
+}}
+print(1)
+''',
+    'overflowing int division': f'''
+x = {HUGE}
+n = 0
+while n > 5 {{
+    z = x / 3
+    n = n + 1
+}}
+print(n)
+''',
+    'overflowing constant division': f'''
+i = 0
+while i < 1 {{
+    i = i + 1
+}}
+if i > 1 {{
+    y = {HUGE} / 3
+}}
+print(7)
+''',
+    'division by zero': '''
+a = 0
+i = 5
+while i < 0 {
+    t = 10 / a
+    i = i + 1
+}
+print(i)
+''',
+    'name assigned on one path only': '''
+i = 0
+while i < 2 {
+    i = i + 1
+}
+if i > 5 {
+    q = 3
+}
+k = 0
+while k < 0 {
+    t = q * 2
+    k = k + 1
+}
+print(k)
+''',
+    'function parameter': f'''
+def f(v, n) {{
+    i = 0
+    while i < n {{
+        t = v * 2 + 1
+        i = i + 1
+    }}
+    return i
+}}
+print(f(1 / 2, 0))
+print(f({HUGE}, 0))
+''',
+}
+
+# Loops that run, with invariant arithmetic to hoist
+RUNNING_PROGRAMS = {
+    'nested loops': '''
+t = 0
+a = 0
+while a < 4 {
+    a = a + 1
+    b = a * 2 + 1
+    i = 0
+    while i < 10 {
+        t = t + (a * b + a) * (b - a) - i
+        i = i + 1
+    }
+}
+print(t)
+''',
+    'invariant float': '''
+h = 1 / 3
+t = 0
+i = 0
+while i < 5 {
+    t = t + h * 3 - i
+    i = i + 1
+}
+print(t)
+''',
+    'error inside a running loop': '''
+a = 0
+i = 0
+while i < 3 {
+    print(i)
+    if i == 2 {
+        t = 10 / a
+    }
+    i = i + 1
+}
+''',
+}
+
+# Reads of names not assigned on every path, which must fail at every level
+# when the name turns out unassigned, even where the value read cannot matter
+UNASSIGNED_PROGRAMS = {
+    'times zero after an if': '''
+i = 0
+if i > 1 {
+    x = 3
+}
+y = x * 0
+print(y)
+''',
+    'zero times after a loop': '''
+k = 0
+while k < 0 {
+    x = 1
+    k = k + 1
+}
+print(0 * x)
+''',
+    'times zero in a function': '''
+def f(n) {
+    if n > 0 {
+        x = 5
+    }
+    return x * 0
+}
+print(f(1))
+print(f(0))
+''',
+}
+
+
+def run(source, opt_level):
+    # (output, error, variables) of source compiled at opt_level; error is
+    # the exception type compiling or running raised, or None
+    output = io.StringIO()
+    variables = {}
+    error = None
+    with redirect_stdout(output):
+        try:
+            program = Pipeline(opt_level).compile(source)
+            variables = VM(jit_threshold=0).run(program)
+        except Exception as e:
+            error = type(e).__name__
+    # Temporaries of the inliner and of code motion start with '$'
+    variables = {name: value for name, value in variables.items() if not name.startswith('$')}
+    return output.getvalue(), error, variables
+
+
+class RandomProgram:
+    # Loops of 0 to 3 trips, ifs and assignments over ints, floats and the
+    # odd huge int, so operations overflow, divide by zero and mix types.
+    # e and f start out assigned on one path only, so reading them can fail.
+    NAMES = ('a', 'b', 'c')
+    MAYBE_UNASSIGNED = ('e', 'f')
+    OPERATORS = ('+', '-', '*', '/')
+    COMPARISONS = ('<', '>', '==', '!=')
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.loops = 0
+        self.lines = ['a = 3', 'b = 1 / 4', 'c = 100000000000000000000']
+        for name in self.MAYBE_UNASSIGNED:
+            self.lines.append(f'if a > {self.random.choice((1, 5))} {{ {name} = {self.random.choice((0, 2))} }}')
+
+    def expression(self, depth=0):
+        choice = self.random.random()
+        if depth > 2 or choice < 0.3:
+            if self.random.random() < 0.05:
+                return self.random.choice(self.MAYBE_UNASSIGNED)
+            return self.random.choice(self.NAMES)
+        if choice < 0.45:
+            return self.random.choice(('0', '1', '2', '7', '1000', '1000', HUGE))
+        if choice < 0.55:
+            return f'-{self.expression(depth + 1)}'
+        operator = self.random.choice(self.OPERATORS)
+        return f'({self.expression(depth + 1)} {operator} {self.expression(depth + 1)})'
+
+    def condition(self):
+        return f'{self.expression(1)} {self.random.choice(self.COMPARISONS)} {self.expression(1)}'
+
+    def block(self, indent, depth):
+        for _ in range(self.random.randint(1, 3)):
+            self.statement(indent, depth)
+
+    def statement(self, indent, depth):
+        pad = '    ' * indent
+        choice = self.random.random()
+        if depth < 2 and choice < 0.3:
+            counter = f'k{self.loops}'
+            self.loops += 1
+            self.lines.append(f'{pad}{counter} = 0')
+            self.lines.append(f'{pad}while {counter} < {self.random.choice((0, 0, 1, 3))} {{')
+            self.block(indent + 1, depth + 1)
+            self.lines.append(f'{pad}    {counter} = {counter} + 1')
+            self.lines.append(f'{pad}}}')
+        elif depth < 2 and choice < 0.45:
+            self.lines.append(f'{pad}if {self.condition()} {{')
+            self.block(indent + 1, depth + 1)
+            self.lines.append(f'{pad}}} else {{')
+            self.block(indent + 1, depth + 1)
+            self.lines.append(f'{pad}}}')
+        elif choice < 0.6:
+            self.lines.append(f'{pad}print({self.expression()})')
+        else:
+            name = self.random.choice(self.NAMES[:2] + self.MAYBE_UNASSIGNED)
+            self.lines.append(f'{pad}{name} = {self.expression()}')
+
+    def source(self):
+        self.block(0, 0)
+        self.block(0, 0)
+        return '\n'.join(self.lines) + '\n'
+
+
+class OptimizerDifferentialTest(unittest.TestCase):
+    def assert_same_as_unoptimized(self, source):
+        expected = run(source, 0)
+        for opt_level in (1, 2):
+            self.assertEqual(run(source, opt_level), expected, f'-O{opt_level} differs from -O0 on:\n{source}')
+
+    def test_zero_trip_loops(self):
+        for name, source in ZERO_TRIP_PROGRAMS.items():
+            with self.subTest(name):
+                self.assert_same_as_unoptimized(source)
+                self.assertIsNone(run(source, 2)[1])
+
+    def test_running_loops(self):
+        for name, source in RUNNING_PROGRAMS.items():
+            with self.subTest(name):
+                self.assert_same_as_unoptimized(source)
+
+    def test_unassigned_reads(self):
+        for name, source in UNASSIGNED_PROGRAMS.items():
+            with self.subTest(name):
+                self.assert_same_as_unoptimized(source)
+                self.assertIsNotNone(run(source, 0)[1])
+
+    def test_random_programs(self):
+        for seed in range(300):
+            with self.subTest(seed=seed):
+                self.assert_same_as_unoptimized(RandomProgram(seed).source())
+
+
+if __name__ == '__main__':
+    unittest.main()
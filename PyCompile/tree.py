@@ -0,0 +1,18 @@
+# Traversals shared by the passes over syntax trees and IR: both are made of
+# nodes with a type, a value and children, so these work on either.
+
+
+def walk(node):
+    # Every node under node, without recursion
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node is not None:
+            yield node
+            pending.extend(node.children)
+
+
+def assigned_names(node):
+    # Names assigned anywhere under node. A call assigns none of the caller's:
+    # whatever the callee assigns is local to its own frame.
+    return {child.value for child in walk(node) if child.type == 'assignment'}
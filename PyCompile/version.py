@@ -0,0 +1,2 @@
+# Bump whenever the generated code changes, so cached artifacts are rebuilt
+COMPILER_VERSION = '0.4.1'
@@ -0,0 +1,134 @@
+from inspect import isgeneratorfunction
+from types import GeneratorType
+
+class Visitor:
+    # Handlers are methods named method_prefix + node type, e.g. visit_assignment.
+    # A plain handler runs after its children and gets their results:
+    #     def visit_assignment(self, node, expression): ...
+    # A generator handler runs first and drives its own children instead,
+    # yielding each one it wants visited and receiving its result back:
+    #     def visit_if(self, node):
+    #         condition = yield node.children[0]
+    # Shallow trees are walked recursively, which is cheapest per node; any
+    # subtree nested deeper than recursion_budget is walked off explicit
+    # stacks instead, so depth is bounded by memory, not the recursion limit.
+    method_prefix = 'visit_'
+    recursion_budget = 100
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # A class may spell out its node type -> handler name table itself
+        if 'handler_names' not in cls.__dict__:
+            # Otherwise build it once per class from the method names
+            prefix = cls.method_prefix
+            cls.handler_names = {
+                name[len(prefix):]: name
+                for name in dir(cls)
+                if name.startswith(prefix) and callable(getattr(cls, name))
+            }
+        cls.driver_types = frozenset(node_type for node_type, name in cls.handler_names.items()
+                                     if isgeneratorfunction(getattr(cls, name)))
+
+    def __init__(self):
+        # Bind every handler once per instance, so dispatch is one dict lookup
+        self.dispatch = {node_type: getattr(self, name) for node_type, name in self.handler_names.items()
+                         if node_type not in self.driver_types}
+        self.drivers = {node_type: getattr(self, self.handler_names[node_type]) for node_type in self.driver_types}
+
+    def visit(self, node):
+        return self._walk(node, self.recursion_budget)
+
+    def _walk(self, node, budget):
+        handler = self.dispatch.get(node.type)
+        if handler is None:
+            return self._drive(node, budget)
+        children = node.children
+        if not children:
+            return handler(node)
+        if not budget:
+            return self._walk_iterative(node)
+        budget -= 1
+        walk = self._walk
+        # Unary and binary nodes dominate, so they skip building an argument list
+        if len(children) == 2:
+            return handler(node, walk(children[0], budget), walk(children[1], budget))
+        if len(children) == 1:
+            return handler(node, walk(children[0], budget))
+        # Only optional children, such as an if without an else, are None
+        return handler(node, *[None if child is None else walk(child, budget) for child in children])
+
+    def _drive(self, node, budget):
+        # Run a generator handler, visiting each child it yields
+        driver = self.drivers.get(node.type)
+        if driver is None:
+            return self.generic_visit(node)
+        if not budget:
+            return self._walk_iterative(node)
+        generator = driver(node)
+        send = generator.send
+        result = None
+        while True:
+            try:
+                child = send(result)
+            except StopIteration as stop:
+                return stop.value
+            result = self._walk(child, budget - 1)
+
+    def _walk_iterative(self, node):
+        dispatch = self.dispatch
+        drivers = self.drivers
+        # work holds nodes still to enter, (handler, node, child count) entries
+        # waiting on their children, and suspended generator handlers;
+        # results holds the values produced so far, innermost last
+        work = [node]
+        push = work.append
+        pop = work.pop
+        results = []
+        result = results.append
+        while work:
+            item = pop()
+            kind = type(item)
+            if kind is tuple:
+                handler, node, count = item
+                args = results[-count:]
+                del results[-count:]
+                result(handler(node, *args))
+            elif kind is GeneratorType:
+                # Resume it with the result it was waiting for
+                try:
+                    child = item.send(results.pop())
+                except StopIteration as stop:
+                    result(stop.value)
+                    continue
+                push(item)
+                push(child)
+            elif item is None:
+                # Missing optional children, such as an if without an else
+                result(None)
+            else:
+                handler = dispatch.get(item.type)
+                if handler is None:
+                    handler = drivers.get(item.type)
+                    if handler is None:
+                        result(self.generic_visit(item))
+                    else:
+                        push(handler(item))
+                        result(None)
+                    continue
+                children = item.children
+                if children:
+                    push((handler, item, len(children)))
+                    work.extend(reversed(children))
+                else:
+                    result(handler(item))
+        return results.pop()
+
+    def collect(self, nodes):
+        # For generator handlers: results = yield from self.collect(node.children)
+        results = []
+        for node in nodes:
+            results.append((yield node))
+        return results
+
+    def generic_visit(self, node):
+        raise Exception(f'No {self.method_prefix}{node.type} method')
@@ -1,7 +1,65 @@
+from assembler import Program, link
+from cfg import build_cfg, lower
+from bytecode import (encode, PUSH, PUSH_STRING, LOAD, STORE, ADD, SUB, MUL, DIV, PRINT, JMP_IF_FALSE, JMP,
+                      HALT, CMP_GT, CMP_LT, CMP_EQ, CMP_NE, CMP_LE, CMP_GE, CREATE_TUPLE, STORE_LOAD, LOAD_LOAD_ADD,
+                      CMP_LT_JMP_IF_FALSE, LOAD_SLOT, STORE_SLOT, LOAD_GLOBAL, POP, CALL, RETURN, TAIL_CALL,
+                      SLOT_PAIR_SHIFT, SLOT_PAIR_MASK)
+from jit import DEFAULT_JIT_THRESHOLD, JitCompiler
+
+# Calls that may be active at once before RecursionError; frames live on the
+# heap, so this bounds memory rather than Python's own stack
+DEFAULT_MAX_CALL_DEPTH = 10000
+
+# Binary operators as they appear on IR nodes, mapped to VM mnemonics
+BINARY_OPS = {
+    '+': 'ADD', 'PLUS': 'ADD',
+    '-': 'SUB', 'MINUS': 'SUB',
+    '*': 'MUL', 'MUL': 'MUL',
+    '/': 'DIV', 'DIV': 'DIV',
+}
+
+COMPARISON_OPS = {
+    '<': 'CMP_LT', '<=': 'CMP_LE',
+    '>': 'CMP_GT', '>=': 'CMP_GE',
+    '==': 'CMP_EQ', '!=': 'CMP_NE',
+}
+
+
+class Frame:
+    # One activation: where to go back to, the slots of its locals and the
+    # stack height under its arguments. function indexes the call-target
+    # table, and is None for the program's own frame.
+    __slots__ = ('return_pc', 'locals', 'stack_base', 'function')
+
+    def __init__(self, return_pc, locals, stack_base, function=None):
+        self.return_pc = return_pc
+        self.locals = locals
+        self.stack_base = stack_base
+        self.function = function
+
+
+def unassigned(code, frame, slot):
+    # The error for reading a slot nothing was stored in yet
+    names = code.names if frame.function is None else code.functions[frame.function][3]
+    return NameError(f"Variable '{names[slot]}' is not assigned")
+
+
 class VM:
-    def __init__(self, assembly_code):
+    def __init__(self, assembly_code=None, max_call_depth=DEFAULT_MAX_CALL_DEPTH, jit_threshold=DEFAULT_JIT_THRESHOLD):
         self.assembly_code = assembly_code
+        self.max_call_depth = max_call_depth
+        # Calls or loop trips before code is compiled to Python; 0 or None
+        # keeps everything in the interpreter
+        self.jit_threshold = jit_threshold
+        self.jit = None
         self.bytecode = []
+        self.function_table = {}
+        # Variable name -> frame slot, for code compiled by this VM
+        self.slots = {}
+        # Function name -> (parameter count, local names), and the local
+        # name -> slot map of the function being compiled, as in CodeGenerator
+        self.frames = {}
+        self.frame_slots = None
         self.pc = 0
         self.stack = []
         self.variables = {}
@@ -11,86 +69,290 @@ class VM:
         return self.bytecode
 
     def _compile_node(self, node):
-        if node.type == 'program':
-            bytecode = []
-            for child in node.children:
-                bytecode.extend(self._compile_node(child))
-            return bytecode
-        elif node.type == 'assignment':
-            bytecode = self._compile_node(node.children[0])
-            bytecode.append(f'STORE {node.value}')
-            return bytecode
-        elif node.type == 'identifier':
-            return [f'LOAD {node.value}']
-        elif node.type == 'number':
-            return [f'PUSH {node.value}']
-        elif node.type == 'binary_expression':
-            left_bytecode = self._compile_node(node.children[0])
-            right_bytecode = self._compile_node(node.children[1])
-            op_bytecode = [f'{node.value}']
-            return left_bytecode + right_bytecode + op_bytecode
-        elif node.type == 'if':
-            condition_bytecode = self._compile_node(node.children[0])
-            then_bytecode = self._compile_node(node.children[1])
-            else_bytecode = self._compile_node(node.children[2]) if len(node.children) > 2 else []
-            return condition_bytecode + [f'JMP_IF_FALSE {len(then_bytecode) + 1}'] + then_bytecode + [f'JMP {len(else_bytecode)}'] + else_bytecode
-        elif node.type == 'while':
-            condition_bytecode = self._compile_node(node.children[0])
-            body_bytecode = self._compile_node(node.children[1])
-            return condition_bytecode + [f'JMP_IF_FALSE {len(body_bytecode) + 1}'] + body_bytecode + ['JMP -' + str(len(condition_bytecode) + len(body_bytecode) + 1)]
-        elif node.type == 'print':
-            bytecode = self._compile_node(node.children[0])
-            bytecode.append('PRINT')
-            return bytecode
-        elif node.type == 'function_def':
-            func_bytecode = []
-            for stmt in node.children[1].children:
-                func_bytecode.extend(self._compile_node(stmt))
-            return [f'FUNC {node.value}'] + func_bytecode + ['ENDFUNC']
-        elif node.type == 'function_call':
-            arg_bytecode = []
-            for arg in node.children:
-                arg_bytecode.extend(self._compile_node(arg))
-            return arg_bytecode + [f'CALL {node.value}']
-        elif node.type == 'expression_statement':
-            return self._compile_node(node.children[0])
-        else:
-            raise ValueError(f"Unknown AST node type: {node.type}")
+        # Control flow is lowered through the CFG, which calls back into the
+        # lower_* methods below for labels, jumps and each statement
+        self.compiled = []
+        self.frame_slots = None
+        lower(build_cfg(node), self)
+        return self.compiled
+
+    def lower_function(self, graph):
+        local_names = graph.local_names()
+        self.frames[graph.name] = (len(graph.parameters), local_names)
+        self.frame_slots = {name: slot for slot, name in enumerate(local_names)}
+
+    def lower_label(self, block):
+        if block.function is not None:
+            self.function_table[block.function] = block.function
+        self.compiled.append(f'{block.label}:')
+
+    def lower_statement(self, node):
+        self._compile_straight_line(node)
+
+    def lower_jump(self, block):
+        self.compiled.append(f'JMP {block.label}')
+
+    def lower_branch(self, condition, block):
+        self._compile_straight_line(condition)
+        self.compiled.append(f'JMP_IF_FALSE {block.label}')
+
+    def lower_return(self, value):
+        self._compile_straight_line(value)
+        self.compiled.append('RETURN')
+
+    def lower_tail_call(self, call):
+        for argument in call.children:
+            self._compile_straight_line(argument)
+        self.compiled.append(f'TAIL_CALL {call.value}')
+
+    def lower_halt(self):
+        self.compiled.append('HALT')
+
+    def _compile_straight_line(self, node):
+        # Walk with an explicit stack holding nodes still to compile and
+        # instructions ready to emit, pushed in reverse so they pop in order
+        emit = self.compiled.append
+        pending = [node]
+        push = pending.append
+        while pending:
+            node = pending.pop()
+            if type(node) is str:
+                emit(node)
+                continue
+            node_type = node.type
+            if node_type == 'assignment':
+                push(f'STORE_SLOT {self.local_slot(node.value)}')
+                push(node.children[0])
+            elif node_type == 'identifier':
+                if self.frame_slots is not None and node.value not in self.frame_slots:
+                    emit(f'LOAD_GLOBAL {self.slot(node.value)}')
+                else:
+                    emit(f'LOAD_SLOT {self.local_slot(node.value)}')
+            elif node_type == 'number':
+                emit(f'PUSH {node.value}')
+            elif node_type == 'binary_expression':
+                push(BINARY_OPS.get(node.value, node.value))
+                push(node.children[1])
+                push(node.children[0])
+            elif node_type == 'comparison':
+                push(COMPARISON_OPS[node.value])
+                push(node.children[1])
+                push(node.children[0])
+            elif node_type == 'unary_expression':
+                emit('PUSH 0')
+                push('SUB')
+                push(node.children[0])
+            elif node_type == 'string':
+                emit(f'PUSH_STRING "{node.value}"')
+            elif node_type == 'tuple':
+                push(f'CREATE_TUPLE {len(node.children)}')
+                pending.extend(reversed(node.children))
+            elif node_type == 'print':
+                push('PRINT')
+                push(node.children[0])
+            elif node_type == 'function_call':
+                push(f'CALL {node.value}')
+                pending.extend(reversed(node.children))
+            elif node_type == 'expression_statement':
+                push('POP')
+                push(node.children[0])
+            elif node_type == 'sequence':
+                pending.extend(reversed(node.children))
+            else:
+                raise ValueError(f"Unknown AST node type: {node.type}")
+
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.slots)
+        return slot
+
+    def local_slot(self, name):
+        if self.frame_slots is None:
+            return self.slot(name)
+        return self.frame_slots[name]
 
     def run(self, bytecode):
+        if isinstance(bytecode, list):
+            bytecode = link(bytecode, self.function_table, list(self.slots), self.frames)
+        if isinstance(bytecode, Program):
+            bytecode = encode(bytecode)
         self.bytecode = bytecode
-        self.pc = 0
-        while self.pc < len(self.bytecode):
-            instruction = self.bytecode[self.pc].split()
-            opcode = instruction[0]
-            if opcode == 'PUSH':
-                self.stack.append(int(instruction[1]))
-            elif opcode == 'LOAD':
-                self.stack.append(self.variables[instruction[1]])
-            elif opcode == 'STORE':
-                self.variables[instruction[1]] = self.stack.pop()
-            elif opcode == 'ADD':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a + b)
-            elif opcode == 'SUB':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a - b)
-            elif opcode == 'MUL':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a * b)
-            elif opcode == 'DIV':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a / b)
-            elif opcode == 'PRINT':
-                print(self.stack.pop())
-            elif opcode == 'JMP_IF_FALSE':
-                if not self.stack.pop():
-                    self.pc += int(instruction[1])
-            elif opcode == 'JMP':
-                self.pc += int(instruction[1])
-            self.pc += 1
+
+        # Hoist everything the loop touches into locals
+        ops = bytecode.ops
+        args = bytecode.args
+        consts = bytecode.consts
+        names = bytecode.names
+        variables = self.variables
+        functions = bytecode.functions
+        # Per call target: entry, parameter count, and the None padding for
+        # its other locals, so a call does one lookup
+        targets = [(entry, parameter_count, [None] * (len(local_names) - parameter_count))
+                   for _, entry, parameter_count, local_names in functions]
+        max_call_depth = self.max_call_depth
+        # Locals of the running frame, one per slot; None until assigned. The
+        # program's frame also holds the globals functions read.
+        local = program_locals = [None] * len(names)
+        frame = Frame(None, local, 0)
+        frames = [frame]
+        # Second tier, see jit.py: calls per function and trips per loop
+        # header are counted, and at the threshold the code is compiled; a
+        # threshold of -1 is never reached
+        jit = self.jit = JitCompiler(bytecode, program_locals, max_call_depth) if self.jit_threshold else None
+        threshold = self.jit_threshold or -1
+        calls = [0] * len(functions)
+        natives = [None] * len(functions)
+        heat = [0] * len(ops)
+        loops = [None] * len(ops)
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        end = len(ops)
+        pc = 0
+
+        while pc < end:
+            op = ops[pc]
+            arg = args[pc]
+            pc += 1
+            if op == LOAD_SLOT:
+                value = local[arg]
+                if value is None:
+                    raise unassigned(bytecode, frame, arg)
+                push(value)
+            elif op == PUSH:
+                push(consts[arg])
+            elif op == STORE_SLOT:
+                local[arg] = pop()
+            elif op == STORE_LOAD:
+                # Store and leave the value on the stack
+                local[arg] = stack[-1]
+            elif op == LOAD_LOAD_ADD:
+                value = local[arg >> SLOT_PAIR_SHIFT]
+                other = local[arg & SLOT_PAIR_MASK]
+                if value is None or other is None:
+                    raise unassigned(bytecode, frame, arg >> SLOT_PAIR_SHIFT if value is None else arg & SLOT_PAIR_MASK)
+                push(value + other)
+            elif op == CMP_LT_JMP_IF_FALSE:
+                b = pop()
+                if not pop() < b:
+                    pc = arg
+            elif op == JMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JMP:
+                if arg < pc:
+                    # A backward jump closes a loop; once hot, the loop runs
+                    # compiled until it exits, unless the native declines
+                    native = loops[arg]
+                    if native is None:
+                        heat[arg] += 1
+                        if heat[arg] == threshold:
+                            native = loops[arg] = jit.compile_loop(arg, pc, frame.function, local)
+                    if native is not None:
+                        exit_pc = native(local, len(frames))
+                        if exit_pc >= 0:
+                            arg = exit_pc
+                pc = arg
+            elif op == CALL:
+                if len(frames) > max_call_depth:
+                    raise RecursionError(f"Maximum call depth of {max_call_depth} exceeded calling '{functions[arg][0]}'")
+                native = natives[arg]
+                if native is None:
+                    calls[arg] += 1
+                    if calls[arg] == threshold:
+                        native = natives[arg] = jit.compile_function(arg)
+                entry, parameter_count, padding = targets[arg]
+                base = len(stack) - parameter_count
+                if native is not None:
+                    # A compiled leaf function needs no frame
+                    value = native(*stack[base:])
+                    del stack[base:]
+                    push(value)
+                    continue
+                # The arguments become the first locals of the new frame
+                local = stack[base:]
+                del stack[base:]
+                local += padding
+                frame = Frame(pc, local, base, arg)
+                frames.append(frame)
+                pc = entry
+            elif op == RETURN:
+                if frame.function is None:
+                    raise RuntimeError(f'RETURN outside a function at {pc - 1}')
+                value = pop()
+                # Drop anything the body left on the stack
+                del stack[frame.stack_base:]
+                pc = frame.return_pc
+                frames.pop()
+                frame = frames[-1]
+                local = frame.locals
+                push(value)
+            elif op == TAIL_CALL:
+                # The callee takes over the running frame, keeping its return
+                # address and stack base, so the call stack does not grow
+                entry, parameter_count, padding = targets[arg]
+                base = len(stack) - parameter_count
+                local = stack[base:]
+                local += padding
+                del stack[frame.stack_base:]
+                frame.locals = local
+                frame.function = arg
+                pc = entry
+            elif op == LOAD_GLOBAL:
+                value = program_locals[arg]
+                if value is None:
+                    raise NameError(f"Variable '{names[arg]}' is not assigned")
+                push(value)
+            elif op == POP:
+                pop()
+            elif op == LOAD:
+                push(variables[names[arg]])
+            elif op == STORE:
+                variables[names[arg]] = pop()
+            elif op == ADD:
+                b = pop()
+                push(pop() + b)
+            elif op == SUB:
+                b = pop()
+                push(pop() - b)
+            elif op == MUL:
+                b = pop()
+                push(pop() * b)
+            elif op == DIV:
+                b = pop()
+                push(pop() / b)
+            elif op == CMP_LT:
+                b = pop()
+                push(int(pop() < b))
+            elif op == CMP_GT:
+                b = pop()
+                push(int(pop() > b))
+            elif op == CMP_EQ:
+                b = pop()
+                push(int(pop() == b))
+            elif op == CMP_NE:
+                b = pop()
+                push(int(pop() != b))
+            elif op == CMP_LE:
+                b = pop()
+                push(int(pop() <= b))
+            elif op == CMP_GE:
+                b = pop()
+                push(int(pop() >= b))
+            elif op == CREATE_TUPLE:
+                items = tuple(stack[len(stack) - arg:])
+                del stack[len(stack) - arg:]
+                push(items)
+            elif op == PUSH_STRING:
+                push(consts[arg])
+            elif op == PRINT:
+                print(pop())
+            elif op == HALT:
+                break
+        self.pc = pc
+        # Report the frame's variables by name, next to any name-keyed ones
+        for name, value in zip(names, program_locals):
+            if value is not None:
+                variables[name] = value
         return self.variables